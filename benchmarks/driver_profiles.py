@@ -0,0 +1,55 @@
+"""
+Compares page load times of Chrome with each driver profile.
+Run from the project root: python -m benchmarks.driver_profiles [pages] [url ...]
+Pages default to elivros' RandomBook, so each load is a different book page.
+"""
+import statistics
+import sys
+import time
+
+from config.driver_config import driver_setup
+from models.settings_models import DriverProfiles
+
+DEFAULT_URLS = ["http://elivros.love/page/RandomBook"]
+
+
+def run(profile: DriverProfiles, urls: list[str], pages: int) -> list[float]:
+    """
+    Loads pages through a fresh headless Chrome with the given profile.
+    :return: seconds each page took to load
+    """
+    driver = driver_setup(headless=True, profile=profile)
+    load_times = []
+    try:
+        # The first load also warms up Chrome, it's left out.
+        driver.get(urls[0])
+        for page in range(pages):
+            start_time = time.perf_counter()
+            driver.get(urls[page % len(urls)])
+            load_times.append(time.perf_counter() - start_time)
+    finally:
+        driver.quit()
+
+    return load_times
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    urls = sys.argv[2:] or DEFAULT_URLS
+    results = {profile: run(profile, urls, pages) for profile in DriverProfiles}
+    for profile, load_times in results.items():
+        load_times.sort()
+        print(
+            f"{profile.value}: mean {statistics.mean(load_times):.2f}s, "
+            f"median {statistics.median(load_times):.2f}s, "
+            f"p90 {load_times[int(len(load_times) * 0.9) - 1]:.2f}s over {len(load_times)} pages"
+        )
+
+    speedup = statistics.mean(results[DriverProfiles.default]) / statistics.mean(
+        results[DriverProfiles.performance]
+    )
+    print(f"Speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
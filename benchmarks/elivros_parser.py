@@ -0,0 +1,56 @@
+"""
+Compares the BeautifulSoup and lxml paths of ELivrosParser over the saved elivros pages.
+Run from the project root: python -m benchmarks.elivros_parser [rounds]
+"""
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from exceptions import ScraperError
+from scrapers.elivros_parser import ELivrosParser
+
+FIXTURES_PATH = os.path.join("tests", "fixtures", "elivros")
+
+
+def load_pages() -> list[bytes]:
+    pages = []
+    for file_path in sorted(glob.glob(os.path.join(FIXTURES_PATH, "*.html"))):
+        with open(file_path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(parse, pages: list[bytes], rounds: int) -> float:
+    """
+    Parses every page rounds times.
+    :return: pages per second
+    """
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            try:
+                parse(page)
+            except ScraperError:
+                pass
+    return rounds * len(pages) / (time.perf_counter() - start_time)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pages = load_pages()
+    parser = ELivrosParser()
+    paths = {
+        "BeautifulSoup": lambda page: parser.get_book_info(BeautifulSoup(page, "lxml")),
+        "lxml": parser.parse_book_page,
+    }
+    results = {name: run(parse, pages, rounds) for name, parse in paths.items()}
+    for name, pages_per_second in results.items():
+        print(f"{name}: {pages_per_second:.0f} pages/second")
+    print(f"Speedup: {results['lxml'] / results['BeautifulSoup']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
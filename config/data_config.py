@@ -1,33 +1,128 @@
 import json
+import logging
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
 
+from config.migrations import SCHEMA_MIGRATIONS
+from exceptions.exceptions import HistoryError
 from models.settings_models import SPPSettingsModel
 
 
-def _sqlite_conn():
+SETTINGS_FILE_NAME = "spp_settings.json"
+
+# Applied to every new connection. WAL lets readers and a writer work at the same time, which is
+# what happens when a scraper and an uploader share the same history.db.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class SQLiteConnectionManager:
     """
-    Use this as a context manager.
+    Hands out one connection per thread and per process to the history database.
+    Use connection() as a context manager, it commits or rolls back just like sqlite3.Connection.
     """
-    user_settings = load_user_settings()
-    db_path = user_settings.history_db_path
-    conn = sqlite3.connect(db_path, timeout=60)
 
-    return conn
+    def __init__(self, db_path: str | None = None):
+        if db_path is None:
+            db_path = load_user_settings().history_db_path
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Each connection is only used by the thread that created it,
+        # check_same_thread is disabled just so close_all() can run from any thread.
+        conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Connections must not be shared with forked processes, start a new pool.
+            with self._lock:
+                self._local = threading.local()
+                self._connections = []
+                self._pid = os.getpid()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.get_connection()
+        with conn:
+            yield conn
+
+    def release_current(self):
+        """
+        Closes the connection of the calling thread. Threads that are about to end call it, or their
+        connection stays open until close_all().
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
 
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
 
-def sqlite_conn_setup():
-    conn = _sqlite_conn()
-    with conn as conn_ctx:
-        cursor = conn_ctx.cursor()
-        cursor.execute(
-            """CREATE TABLE IF NOT EXISTS spp(id INTEGER PRIMARY KEY,
-                                                         metadata TEXT, 
-                                                         filepath TEXT,
-                                                         uploaded INTEGER DEFAULT 0,
-                                                         uploaded_at TEXT DEFAULT NULL)"""
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection):
+    """
+    Upgrades the history database in place to the latest schema version.
+    Each migration handles its own transactions, the version is only bumped once it finishes,
+    so an interrupted migration runs again on the next start.
+    """
+    current_version = get_schema_version(conn)
+    latest_version = len(SCHEMA_MIGRATIONS)
+    if current_version > latest_version:
+        raise HistoryError(
+            f"History database schema version {current_version} is newer than this SPP version "
+            f"supports ({latest_version})."
         )
-    return conn
+
+    for version in range(current_version + 1, latest_version + 1):
+        migration = SCHEMA_MIGRATIONS[version - 1]
+        logging.info(f"Migrating history database to schema version {version}.")
+        migration(conn)
+        with conn:
+            conn.execute(f"PRAGMA user_version={version}")
+
+
+def sqlite_conn_setup() -> SQLiteConnectionManager:
+    manager = SQLiteConnectionManager()
+    run_migrations(manager.get_connection())
+    return manager
 
 
 def _validate_user_settings(settings: SPPSettingsModel):
@@ -40,9 +135,8 @@ def _validate_user_settings(settings: SPPSettingsModel):
         os.mkdir(os.path.abspath(temp_download_path))
 
 
-def load_user_settings() -> SPPSettingsModel:
+def _read_user_settings(settings_path: str) -> SPPSettingsModel:
     default_settings = SPPSettingsModel()
-    settings_path = os.path.abspath("spp_settings.json")
     if not os.path.isfile(settings_path):
         default_settings_json = default_settings.json()
         with open(settings_path, "w+") as f:
@@ -59,3 +153,43 @@ def load_user_settings() -> SPPSettingsModel:
         user_settings = SPPSettingsModel(**user_settings_json)
         _validate_user_settings(user_settings)
         return user_settings
+
+
+# Settings are cached for the whole process, along with the settings file mtime they were read at.
+_settings_cache: SPPSettingsModel | None = None
+_settings_mtime: int | None = None
+_settings_lock = threading.Lock()
+
+
+def _get_settings_mtime(settings_path: str) -> int | None:
+    try:
+        return os.stat(settings_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def reload_user_settings() -> SPPSettingsModel:
+    """
+    Reads the settings file again, even if it didn't change.
+    """
+    global _settings_cache, _settings_mtime
+    settings_path = os.path.abspath(SETTINGS_FILE_NAME)
+    with _settings_lock:
+        _settings_cache = _read_user_settings(settings_path)
+        _settings_mtime = _get_settings_mtime(settings_path)
+        return _settings_cache
+
+
+def load_user_settings() -> SPPSettingsModel:
+    """
+    Returns the user settings.
+    The settings file is only read again when its modification time changes, so this is cheap to
+    call often, and long-running routines pick up changes without a restart.
+    """
+    settings_path = os.path.abspath(SETTINGS_FILE_NAME)
+    mtime = _get_settings_mtime(settings_path)
+    with _settings_lock:
+        if _settings_cache is not None and mtime is not None and mtime == _settings_mtime:
+            return _settings_cache
+
+    return reload_user_settings()
@@ -1,16 +1,54 @@
 from fake_useragent import UserAgent
 from selenium import webdriver
 from dotenv import load_dotenv
+import logging
 import os
+import signal
+import time
+from typing import Callable, Iterable
 
+from selenium.common import WebDriverException
 from selenium.webdriver.chrome.webdriver import WebDriver
 
 from config.data_config import load_user_settings
+from models.driver_models import DriverStats
+from models.settings_models import DriverProfiles
 
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
 
-def driver_setup(headless: bool = False) -> WebDriver:
+# Fonts and media, blocked by the performance profile on top of driver_blocked_urls.
+# Images are turned off through content settings instead.
+HEAVY_RESOURCE_URLS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a",
+]
+
+
+def _apply_performance_profile(options: webdriver.ChromeOptions, prefs: dict):
+    # Pages are handed back once the DOM is ready, scrapers and uploader only use the page's html and forms.
+    options.page_load_strategy = "eager"
+    prefs["profile.managed_default_content_settings.images"] = 2
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--autoplay-policy=user-gesture-required")
+
+
+def _block_urls(driver: WebDriver, urls: list[str]):
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+
+
+def driver_setup(
+    headless: bool = False, profile: DriverProfiles | None = None, download_events: bool = False
+) -> WebDriver:
+    """
+    :param profile: overrides driver_profile from settings.
+    :param download_events: turns on the performance log, where scrapers read download events from.
+    see scrapers.chrome_downloads.ChromeDownloadTracker.
+    """
     ua = UserAgent()
     user_settings = load_user_settings()
+    if profile is None:
+        profile = user_settings.driver_profile
 
     download_folder = user_settings.downloads_path
     options = webdriver.ChromeOptions()
@@ -21,7 +59,213 @@ def driver_setup(headless: bool = False) -> WebDriver:
     if headless:
         options.add_argument("--headless")
     options.add_argument(f"user-agent={ua.random}")
+    if profile == DriverProfiles.performance:
+        _apply_performance_profile(options, prefs)
     options.add_experimental_option("prefs", prefs)
+    if download_events:
+        # DevTools events, download events included, are read from the performance log.
+        # Network events would fill it with every request of every page, they're left out.
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": False})
 
     driver = webdriver.Chrome(options=options)
+    if profile == DriverProfiles.performance:
+        _block_urls(driver, HEAVY_RESOURCE_URLS + user_settings.driver_blocked_urls)
     return driver
+
+
+def _read_proc_stat(pid: int) -> tuple[int, int] | None:
+    """
+    :return: parent pid and start time of a process, None if it's gone or /proc isn't available.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+
+    # The command name may contain spaces and parentheses, fields are counted after its closing one.
+    fields = stat.rpartition(")")[2].split()
+    if fields[0] == "Z":
+        return None
+    return int(fields[1]), int(fields[19])
+
+
+def _process_tree(root_pid: int) -> dict[int, int]:
+    """
+    :return: root_pid and its descendants, mapped to their start time (to tell them from reused pids).
+    empty if /proc isn't available.
+    """
+    children: dict[int, list[int]] = {}
+    start_times = {}
+    try:
+        proc_entries = os.listdir("/proc")
+    except OSError:
+        return {}
+
+    for entry in proc_entries:
+        if not entry.isdigit():
+            continue
+        stat = _read_proc_stat(int(entry))
+        if stat is not None:
+            children.setdefault(stat[0], []).append(int(entry))
+            start_times[int(entry)] = stat[1]
+
+    tree = {}
+    to_visit = [root_pid]
+    while to_visit:
+        pid = to_visit.pop()
+        if pid in start_times and pid not in tree:
+            tree[pid] = start_times[pid]
+            to_visit.extend(children.get(pid, []))
+    return tree
+
+
+def _rss_mb(pids: Iterable[int]) -> float | None:
+    rss_pages = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                rss_pages += int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss_pages * PAGE_SIZE / 1024 ** 2
+
+
+class DriverManager:
+    """
+    Owns a Chrome instance for its whole life: every driver it replaces is quit first, and Chrome
+    processes that outlive quit() are killed, so long runs don't pile up browsers.
+    Use get() before each page instead of keeping a driver around. The browser is replaced once it gets
+    too old, too big, or has served too many pages, and whenever it stops responding.
+    Limits default to the driver_max_* settings, 0 disables a limit.
+    Browsers of scrapers that follow downloads are started with download_events, see driver_setup.
+    Chrome processes are found through /proc, so on systems without it (Windows, macOS) leftover processes
+    aren't killed and max_rss_mb isn't checked. The other limits and health checks work everywhere.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        driver_factory: Callable[[], WebDriver] | None = None,
+        max_pages: int | None = None,
+        max_age: int | None = None,
+        max_rss_mb: int | None = None,
+        download_events: bool = False,
+    ):
+        if max_pages is None or max_age is None or max_rss_mb is None:
+            user_settings = load_user_settings()
+            max_pages = max_pages if max_pages is not None else user_settings.driver_max_pages
+            max_age = max_age if max_age is not None else user_settings.driver_max_age
+            max_rss_mb = max_rss_mb if max_rss_mb is not None else user_settings.driver_max_rss_mb
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self._driver_factory = driver_factory or (
+            lambda: driver_setup(headless, download_events=download_events)
+        )
+        self.driver: WebDriver | None = None
+        self._service_pid: int | None = None
+        self._started_at = 0.0
+        self._stats = DriverStats()
+
+    def __enter__(self) -> "DriverManager":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.quit()
+
+    def _start(self):
+        self.driver = self._driver_factory()
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        self._service_pid = process.pid if process is not None else None
+        self._started_at = time.monotonic()
+        self._stats.started += 1
+        self._stats.pages = 0
+
+    def _browser_pids(self) -> dict[int, int]:
+        if self._service_pid is None:
+            return {}
+        return _process_tree(self._service_pid)
+
+    def is_healthy(self) -> bool:
+        """
+        Checks the browser still answers commands and has a window to work in.
+        """
+        if self.driver is None:
+            return False
+        try:
+            return self.driver.execute_script("return 1") == 1 and len(self.driver.window_handles) > 0
+        except WebDriverException:
+            return False
+
+    def _recycle_reason(self) -> str | None:
+        stats = self.get_stats()
+        if 0 < self.max_pages <= stats.pages:
+            return f"served {stats.pages} pages"
+        if 0 < self.max_age <= stats.age:
+            return f"running for {stats.age:.0f} seconds"
+        if stats.rss_mb is not None and 0 < self.max_rss_mb <= stats.rss_mb:
+            return f"using {stats.rss_mb:.0f} MiB"
+        if not self.is_healthy():
+            self._stats.failed_health_checks += 1
+            return "failed health check"
+        return None
+
+    def get(self) -> WebDriver:
+        """
+        Returns a healthy driver, starting or replacing the browser if needed. Counts as one page.
+        """
+        if self.driver is not None:
+            reason = self._recycle_reason()
+            if reason is not None:
+                self.restart(reason)
+
+        if self.driver is None:
+            self._start()
+
+        self._stats.pages += 1
+        return self.driver
+
+    def restart(self, reason: str = "requested"):
+        logging.info(f"Restarting Chrome: {reason}.")
+        self.quit()
+        self._stats.restarts += 1
+        self._start()
+
+    def quit(self):
+        """
+        Quits the browser, killing whatever is left of it. A new one is started by the next get().
+        """
+        if self.driver is None:
+            return
+
+        browser_pids = self._browser_pids()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.error(f"Could not quit Chrome cleanly: {e}")
+
+        for pid, start_time in browser_pids.items():
+            stat = _read_proc_stat(pid)
+            # Same pid and start time, the process outlived quit() and isn't a new one reusing the pid.
+            if stat is None or stat[1] != start_time:
+                continue
+            try:
+                os.kill(pid, signal.SIGKILL)
+                self._stats.orphans_killed += 1
+            except OSError:
+                continue
+
+        self.driver = None
+        self._service_pid = None
+        logging.info(f"Chrome stopped, driver stats: {self._stats.dict()}")
+
+    def get_stats(self) -> DriverStats:
+        if self.driver is not None:
+            self._stats.age = time.monotonic() - self._started_at
+            browser_pids = self._browser_pids()
+            self._stats.rss_mb = _rss_mb(browser_pids) if browser_pids else None
+            if self._stats.rss_mb is not None:
+                self._stats.peak_rss_mb = max(self._stats.peak_rss_mb, self._stats.rss_mb)
+        return self._stats.copy()
@@ -1,9 +1,9 @@
 import logging
 import os
-from selenium.webdriver.remote.remote_connection import LOGGER
 
 # Reduce the level of selenium's logger.
-LOGGER.setLevel(logging.FATAL)
+# It's looked up by name, so selenium itself is only imported when a driver is needed.
+logging.getLogger("selenium.webdriver.remote.remote_connection").setLevel(logging.FATAL)
 
 LOGGING_PATH = os.path.abspath("logs.log")
 
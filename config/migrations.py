@@ -0,0 +1,360 @@
+"""
+Schema migrations for the history database.
+
+Each migration upgrades the database by one version, and the applied version is kept in
+PRAGMA user_version. Databases created before versioning existed report version 0, so every migration
+must also work on tables that already have some of its changes.
+Append new migrations at the end of SCHEMA_MIGRATIONS, never reorder or remove them.
+"""
+import json
+import logging
+import sqlite3
+from typing import Callable
+
+from pydantic import ValidationError
+
+from models.uploader_models import LibgenMetadata
+
+# Rows are backfilled in batches of this size, each batch in its own transaction.
+MIGRATION_BATCH_SIZE = 1000
+
+# Metadata fields stored as their own columns, in LibgenMetadata order.
+METADATA_COLUMNS = (
+    "topic",
+    "title",
+    "authors",
+    "language",
+    "publisher",
+    "series",
+    "description",
+    "pages",
+    "year",
+    "source",
+)
+
+
+def _add_missing_columns(conn: sqlite3.Connection, columns: dict[str, str], table: str = "spp"):
+    """
+    Adds columns to a table of databases created before they existed.
+    :param columns: column names mapped to their types
+    """
+    cursor = conn.cursor()
+    existing_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    for name, column_type in columns.items():
+        if name not in existing_columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def _load_metadata(entry_id: int, metadata_str: str | None) -> LibgenMetadata | None:
+    try:
+        return LibgenMetadata(**json.loads(metadata_str))
+    except (TypeError, ValueError, ValidationError):
+        logging.error(f"Entry {entry_id} has invalid metadata.")
+        return None
+
+
+def _backfill_in_batches(
+    conn: sqlite3.Connection,
+    where: str,
+    build_update: Callable[[int, LibgenMetadata], tuple],
+    update_query: str,
+):
+    """
+    Walks the rows matching where by id, building an update for each from its metadata.
+    Rows with invalid metadata are skipped and left as they are.
+    """
+    last_id = 0
+    updated = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, metadata FROM spp WHERE id>? AND {where} ORDER BY id LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if len(rows) == 0:
+            break
+
+        updates = []
+        for entry_id, metadata_str in rows:
+            metadata = _load_metadata(entry_id, metadata_str)
+            if metadata is not None:
+                updates.append(build_update(entry_id, metadata))
+
+        with conn:
+            conn.executemany(update_query, updates)
+
+        updated += len(updates)
+        last_id = rows[-1][0]
+
+    if updated:
+        logging.info(f"Backfilled {updated} history entries.")
+
+
+def _create_spp_table(conn: sqlite3.Connection):
+    with conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS spp(id INTEGER PRIMARY KEY,
+                                                         metadata TEXT, 
+                                                         filepath TEXT,
+                                                         uploaded INTEGER DEFAULT 0,
+                                                         uploaded_at TEXT DEFAULT NULL)"""
+        )
+
+
+def _add_dedup_key(conn: sqlite3.Connection):
+    with conn:
+        _add_missing_columns(conn, {"dedup_key": "TEXT"})
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_dedup_key_idx ON spp(dedup_key)")
+
+    _backfill_in_batches(
+        conn,
+        "dedup_key IS NULL",
+        lambda entry_id, metadata: (metadata.dedup_key(), entry_id),
+        "UPDATE spp SET dedup_key=? WHERE id=?",
+    )
+
+
+def _add_file_hashes(conn: sqlite3.Connection):
+    # Hashes of old rows are filled by the uploader, as files are read anyway before uploading.
+    with conn:
+        _add_missing_columns(
+            conn, {"md5": "TEXT", "sha1": "TEXT", "file_size": "INTEGER"}
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_md5_idx ON spp(md5)")
+
+
+def _add_metadata_columns(conn: sqlite3.Connection):
+    with conn:
+        _add_missing_columns(conn, {column: "TEXT" for column in METADATA_COLUMNS})
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_uploaded_idx ON spp(uploaded)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS spp_pending_idx ON spp(uploaded, topic, language)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_source_idx ON spp(source)")
+
+    assignments = ", ".join(f"{column}=?" for column in METADATA_COLUMNS)
+    _backfill_in_batches(
+        conn,
+        "source IS NULL",
+        lambda entry_id, metadata: (*metadata_to_columns(metadata), entry_id),
+        f"UPDATE spp SET {assignments} WHERE id=?",
+    )
+
+
+def _add_full_text_search(conn: sqlite3.Connection):
+    # spp_fts is an external content table, it only stores the index. Triggers keep it in sync with spp.
+    try:
+        with conn:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS spp_fts USING fts5("
+                "title, authors, description, content='spp', content_rowid='id')"
+            )
+    except sqlite3.OperationalError as e:
+        logging.error(f"Full-text search is not available in this SQLite build: {e}")
+        return
+
+    with conn:
+        conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS spp_fts_insert AFTER INSERT ON spp BEGIN
+                INSERT INTO spp_fts(rowid, title, authors, description)
+                VALUES (new.id, new.title, new.authors, new.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS spp_fts_delete AFTER DELETE ON spp BEGIN
+                INSERT INTO spp_fts(spp_fts, rowid, title, authors, description)
+                VALUES ('delete', old.id, old.title, old.authors, old.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS spp_fts_update AFTER UPDATE OF title, authors, description ON spp BEGIN
+                INSERT INTO spp_fts(spp_fts, rowid, title, authors, description)
+                VALUES ('delete', old.id, old.title, old.authors, old.description);
+                INSERT INTO spp_fts(rowid, title, authors, description)
+                VALUES (new.id, new.title, new.authors, new.description);
+            END;
+            """
+        )
+        conn.execute("INSERT INTO spp_fts(spp_fts) VALUES ('rebuild')")
+
+
+def _stats_trigger_statements(row: str, sign: str) -> str:
+    """
+    Returns the statements that add (sign "+") or remove (sign "-") a spp row from spp_stats.
+    :param row: "new" or "old", the row as seen by the trigger
+    """
+    upsert = "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"
+    return f"""
+        INSERT INTO spp_stats(name, value) VALUES ('total', {sign}1) {upsert}
+        INSERT INTO spp_stats(name, value)
+        VALUES (
+            CASE WHEN {row}.uploaded = 0 AND {row}.source IS NULL THEN 'invalid'
+            WHEN {row}.uploaded = 0 THEN 'pending' WHEN {row}.uploaded = 1 THEN 'uploaded' ELSE 'remote' END,
+            {sign}1
+        ) {upsert}
+        INSERT INTO spp_stats(name, value) VALUES ('bytes', {sign}COALESCE({row}.file_size, 0)) {upsert}
+        INSERT INTO spp_stats(name, value)
+        SELECT 'topic:' || {row}.topic, {sign}1 WHERE {row}.topic IS NOT NULL {upsert}
+        INSERT INTO spp_stats(name, value)
+        SELECT 'source:' || {row}.source, {sign}1 WHERE {row}.source IS NOT NULL {upsert}
+    """
+
+
+def _rebuild_stats(conn: sqlite3.Connection):
+    """
+    (Re)creates the triggers that maintain spp_stats, and recounts it from spp.
+    """
+    with conn:
+        for trigger in ("spp_stats_insert", "spp_stats_delete", "spp_stats_update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.executescript(
+            f"""
+            CREATE TRIGGER spp_stats_insert AFTER INSERT ON spp BEGIN
+                {_stats_trigger_statements("new", "+")}
+            END;
+            CREATE TRIGGER spp_stats_delete AFTER DELETE ON spp BEGIN
+                {_stats_trigger_statements("old", "-")}
+            END;
+            CREATE TRIGGER spp_stats_update
+            AFTER UPDATE OF uploaded, file_size, topic, source ON spp BEGIN
+                {_stats_trigger_statements("old", "-")}
+                {_stats_trigger_statements("new", "+")}
+            END;
+            """
+        )
+        conn.execute("DELETE FROM spp_stats")
+        conn.execute(
+            """
+            INSERT INTO spp_stats(name, value)
+            SELECT 'total', COUNT(*) FROM spp
+            UNION ALL SELECT 'pending', COUNT(*) FROM spp WHERE uploaded = 0 AND source IS NOT NULL
+            UNION ALL SELECT 'invalid', COUNT(*) FROM spp WHERE uploaded = 0 AND source IS NULL
+            UNION ALL SELECT 'uploaded', COUNT(*) FROM spp WHERE uploaded = 1
+            UNION ALL SELECT 'remote', COUNT(*) FROM spp WHERE uploaded NOT IN (0, 1)
+            UNION ALL SELECT 'bytes', COALESCE(SUM(file_size), 0) FROM spp
+            UNION ALL SELECT 'topic:' || topic, COUNT(*) FROM spp WHERE topic IS NOT NULL GROUP BY topic
+            UNION ALL SELECT 'source:' || source, COUNT(*) FROM spp WHERE source IS NOT NULL GROUP BY source
+            """
+        )
+
+
+def _add_stats(conn: sqlite3.Connection):
+    # Counters kept up to date by triggers, so reading them doesn't depend on history size.
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spp_stats(name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+        )
+    _rebuild_stats(conn)
+
+
+def _add_source_url(conn: sqlite3.Connection):
+    # Page each book was downloaded from, the seen urls filter is rebuilt from it. Older rows don't have it.
+    with conn:
+        _add_missing_columns(conn, {"source_url": "TEXT"})
+
+
+def _add_frontier(conn: sqlite3.Connection):
+    # Pages the catalog crawler found and still has to visit, see history.frontier.
+    with conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS spp_frontier(id INTEGER PRIMARY KEY,
+                                                       url TEXT NOT NULL UNIQUE,
+                                                       kind TEXT NOT NULL,
+                                                       state TEXT NOT NULL DEFAULT 'pending',
+                                                       attempts INTEGER NOT NULL DEFAULT 0,
+                                                       claimed_at REAL DEFAULT NULL,
+                                                       error TEXT DEFAULT NULL)"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS spp_frontier_state_idx ON spp_frontier(state, kind, id)"
+        )
+
+
+def _add_leases(conn: sqlite3.Connection):
+    # Claims of scraper processes sharing this database, see history.leases.
+    with conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS spp_leases(key TEXT PRIMARY KEY,
+                                                     owner TEXT NOT NULL,
+                                                     expires_at REAL NOT NULL)"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_leases_owner_idx ON spp_leases(owner)")
+        _add_missing_columns(conn, {"claimed_by": "TEXT DEFAULT NULL"}, "spp_frontier")
+        # Pages claimed before claims had an owner can't be told apart from live ones, requeue them.
+        conn.execute(
+            "UPDATE spp_frontier SET state='pending' WHERE state='in_progress' AND claimed_by IS NULL"
+        )
+
+
+def _add_page_cache(conn: sqlite3.Connection):
+    # Index of the book pages kept in the page cache, see history.page_cache.
+    with conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS spp_pages(url TEXT PRIMARY KEY,
+                                                    digest TEXT NOT NULL,
+                                                    size INTEGER NOT NULL,
+                                                    is_text INTEGER NOT NULL DEFAULT 0,
+                                                    fetched_at REAL NOT NULL,
+                                                    accessed_at REAL NOT NULL)"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_pages_accessed_idx ON spp_pages(accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_pages_digest_idx ON spp_pages(digest)")
+        # Entries are updated by the page they came from when cached pages are parsed again.
+        conn.execute("CREATE INDEX IF NOT EXISTS spp_source_url_idx ON spp(source_url)")
+
+
+def _add_remote_entries(conn: sqlite3.Connection):
+    # uploaded is 2 for entries imported from another node whose files aren't here, see
+    # history.replication. They count as duplicates, but aren't waiting for upload.
+    _rebuild_stats(conn)
+
+
+def _count_invalid_entries(conn: sqlite3.Connection):
+    # Entries whose metadata couldn't be read (source is NULL) are never uploaded, so they no longer
+    # count as pending, matching the upload queue.
+    _rebuild_stats(conn)
+
+
+def _add_host_states(conn: sqlite3.Connection):
+    # Backoff shared by the processes sending requests to each host, see history.host_states.
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spp_hosts(host TEXT PRIMARY KEY, not_before REAL NOT NULL)"
+        )
+
+
+def _add_page_cache_size(conn: sqlite3.Connection):
+    # Bytes used by the page cache, kept up to date as pages are stored and evicted, so checking the
+    # cache limit doesn't depend on its size.
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spp_pages_stats(name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO spp_pages_stats(name, value) SELECT 'bytes', COALESCE(SUM(size), 0) "
+            "FROM (SELECT MAX(size) AS size FROM spp_pages GROUP BY digest)"
+        )
+
+
+def metadata_to_columns(metadata: LibgenMetadata) -> tuple:
+    """
+    Returns the values for METADATA_COLUMNS, in the same order.
+    """
+    values = metadata.dict()
+    values["topic"] = metadata.topic.value
+    values["source"] = metadata.source.value
+    return tuple(values[column] for column in METADATA_COLUMNS)
+
+
+SCHEMA_MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [
+    _create_spp_table,
+    _add_dedup_key,
+    _add_file_hashes,
+    _add_metadata_columns,
+    _add_full_text_search,
+    _add_stats,
+    _add_source_url,
+    _add_frontier,
+    _add_leases,
+    _add_page_cache,
+    _add_remote_entries,
+    _count_invalid_entries,
+    _add_host_states,
+    _add_page_cache_size,
+]
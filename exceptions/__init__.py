@@ -1,2 +1,4 @@
-from .exceptions import ScraperError, UploaderError, UploaderFileError, \
-    UploaderHumanConfirmationError, UploaderDuplicateError, HistoryError, HistoryFileError
+from .exceptions import ScraperError, ScraperEngineError, ScraperDuplicateError, ScraperLimitError, \
+    ScraperDownloadError, ScraperUnavailableError, \
+    UploaderError, UploaderFileError, UploaderHumanConfirmationError, UploaderDuplicateError, HistoryError, \
+    HistoryFileError
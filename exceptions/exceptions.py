@@ -2,6 +2,41 @@ class ScraperError(Exception):
     pass
 
 
+class ScraperEngineError(ScraperError):
+    """
+    The scraper engine can't handle the current page, a different engine may.
+    """
+    pass
+
+
+class ScraperDuplicateError(ScraperError):
+    """
+    The current book was already visited, or is already in history.
+    """
+    pass
+
+
+class ScraperLimitError(ScraperError):
+    """
+    The download limit was reached, counting books other scrapers are downloading.
+    """
+    pass
+
+
+class ScraperDownloadError(ScraperError):
+    """
+    None of the current book's files could be downloaded. Only the book failed, not the source.
+    """
+    pass
+
+
+class ScraperUnavailableError(ScraperError):
+    """
+    The source serves its pages, but doesn't start downloads. Its download service is likely down.
+    """
+    pass
+
+
 class UploaderError(Exception):
     pass
 
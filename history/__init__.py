@@ -1 +1,6 @@
 from .history import HistoryHandler
+from .upload_queue import UploadQueueReader
+from .frontier import FrontierHandler
+from .leases import LeaseHandler
+from .page_cache import PageCache
+from .registration import RegistrationStage
@@ -0,0 +1,31 @@
+import os
+
+
+class DownloadsSnapshot:
+    """
+    Set of files in the downloads directory, listed once with os.scandir.
+    Checking a path inside the directory is then a set lookup instead of stat calls, which matters on
+    network mounted volumes. Paths elsewhere are still checked individually.
+    """
+
+    def __init__(self, downloads_path: str):
+        self.downloads_path = self._normalize(downloads_path)
+        self.file_paths: set[str] = set()
+        try:
+            with os.scandir(self.downloads_path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self.file_paths.add(self._normalize(entry.path))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _normalize(file_path: str) -> str:
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def is_file(self, file_path: str) -> bool:
+        normalized_path = self._normalize(file_path)
+        if os.path.dirname(normalized_path) == self.downloads_path:
+            return normalized_path in self.file_paths
+
+        return os.path.isfile(file_path)
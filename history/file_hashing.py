@@ -0,0 +1,100 @@
+import hashlib
+import mmap
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from models.history_models import FileHashes
+
+# Files are hashed in slices of this size, big enough to keep syscall overhead irrelevant.
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class StreamHasher:
+    """
+    Computes the MD5 (used by Libgen to identify files) and SHA-1 of a file fed chunk by chunk, e.g. while
+    it's downloaded, so it never has to be read again.
+    """
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._sha1 = hashlib.sha1()
+        self.size = 0
+
+    def update(self, chunk: bytes | memoryview):
+        self._md5.update(chunk)
+        self._sha1.update(chunk)
+        self.size += len(chunk)
+
+    def get_hashes(self) -> FileHashes:
+        return FileHashes(md5=self._md5.hexdigest(), sha1=self._sha1.hexdigest(), size=self.size)
+
+
+def hash_file(file_path: str) -> FileHashes:
+    """
+    Hashes a file already on disk in a single streaming pass, see StreamHasher.
+    """
+    hasher = StreamHasher()
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        # Empty files can't be memory mapped.
+        if size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, size, HASH_CHUNK_SIZE):
+                        chunk = view[offset : offset + HASH_CHUNK_SIZE]
+                        hasher.update(chunk)
+                        chunk.release()
+
+    return hasher.get_hashes()
+
+
+class FileHasher:
+    """
+    Hashes files in a process pool, so big files don't hold the caller's loop.
+    The pool is only started on first use.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def submit(self, file_path: str) -> Future:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor.submit(hash_file, file_path)
+
+    def submit_files(self, file_paths: list[str]) -> dict[str, Future]:
+        """
+        Starts hashing every file, without waiting for any of them.
+        :return: futures resolving to the FileHashes of each file, by filepath.
+        """
+        return {file_path: self.submit(file_path) for file_path in file_paths}
+
+    def hash_files(self, file_paths: list[str]) -> dict[str, FileHashes]:
+        """
+        Hashes every file and waits for all of them. Callers that can't wait use submit_files.
+        """
+        if len(file_paths) <= 1:
+            # Nothing to run in parallel, the pool would only add overhead.
+            return {file_path: hash_file(file_path) for file_path in file_paths}
+
+        futures = self.submit_files(file_paths)
+        return {file_path: future.result() for file_path, future in futures.items()}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_file_hasher: FileHasher | None = None
+
+
+def get_file_hasher() -> FileHasher:
+    """
+    Returns the process-wide hasher, shared by every HistoryHandler.
+    """
+    global _file_hasher
+    if _file_hasher is None:
+        _file_hasher = FileHasher()
+    return _file_hasher
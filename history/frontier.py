@@ -0,0 +1,102 @@
+import logging
+import time
+from typing import Iterable
+
+from keys import get_sqlite_manager
+from models.frontier_models import FrontierEntry, FrontierKinds, FrontierStates
+from .leases import get_owner_id
+
+# Failed pages are retried until they failed this many times.
+MAX_FRONTIER_ATTEMPTS = 3
+
+
+class FrontierHandler:
+    """
+    The catalog crawler's queue of pages, kept in the spp_frontier table of the history database.
+    Pages are claimed in a fixed order (books first, then listings, oldest first), so a crawl resumes
+    exactly where it stopped. Pages claimed by a process that stopped are released by
+    LeaseHandler.release_dead_owners.
+    """
+
+    def __init__(self, owner: str | None = None):
+        self.db_manager = get_sqlite_manager()
+        self.owner = owner if owner is not None else get_owner_id()
+
+    def add_urls(self, urls: Iterable[str], kind: FrontierKinds) -> int:
+        """
+        Adds pages to the frontier. Pages already in it, in any state, are ignored.
+        :return: number of new pages
+        """
+        with self.db_manager.connection() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO spp_frontier (url, kind) VALUES (?, ?)",
+                ((url, kind.value) for url in urls),
+            )
+            return cursor.rowcount
+
+    def claim(self) -> FrontierEntry | None:
+        """
+        Marks the next pending page as in progress and returns it.
+        The page is picked and claimed in a single statement, so two crawlers never get the same page.
+        :return: None if there are no pending pages.
+        """
+        with self.db_manager.connection() as conn:
+            row = conn.execute(
+                "UPDATE spp_frontier SET state=?, attempts=attempts+1, claimed_at=?, claimed_by=? "
+                "WHERE id=(SELECT id FROM spp_frontier WHERE state=? ORDER BY kind, id LIMIT 1) "
+                "RETURNING id, url, kind, attempts",
+                (
+                    FrontierStates.in_progress.value,
+                    time.time(),
+                    self.owner,
+                    FrontierStates.pending.value,
+                ),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return FrontierEntry(entry_id=row[0], url=row[1], kind=row[2], attempts=row[3])
+
+    def complete(self, entry: FrontierEntry):
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "UPDATE spp_frontier SET state=?, error=NULL, claimed_by=NULL WHERE id=?",
+                (FrontierStates.done.value, entry.entry_id),
+            )
+
+    def fail(self, entry: FrontierEntry, error: str):
+        """
+        Sends a page back to the queue, or marks it as failed once it reached MAX_FRONTIER_ATTEMPTS.
+        """
+        state = FrontierStates.pending
+        if entry.attempts >= MAX_FRONTIER_ATTEMPTS:
+            state = FrontierStates.failed
+            logging.error(f"Giving up on {entry.url} after {entry.attempts} attempts: {error}")
+
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "UPDATE spp_frontier SET state=?, error=?, claimed_by=NULL WHERE id=?",
+                (state.value, error, entry.entry_id),
+            )
+
+    def release(self, entry: FrontierEntry):
+        """
+        Sends a claimed page back to the queue, without counting the attempt.
+        """
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "UPDATE spp_frontier SET state=?, attempts=attempts-1, claimed_by=NULL WHERE id=?",
+                (FrontierStates.pending.value, entry.entry_id),
+            )
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of pages in each state.
+        """
+        with self.db_manager.connection() as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) FROM spp_frontier GROUP BY state"
+            ).fetchall()
+
+        return {state.value: 0 for state in FrontierStates} | dict(rows)
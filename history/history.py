@@ -1,19 +1,37 @@
 import logging
 import os
+import sqlite3
+from enum import Enum
+import json
 from typing import Generator
-from unittest import result
 
-from inquirer.questions import json
 from exceptions.exceptions import HistoryError
-from models.history_models import HistoryEntry
-from models.uploader_models import LibgenMetadata
-from keys import sqlite_instance
+from models.history_models import (
+    HistoryEntry,
+    FileHashes,
+    HistorySearchResult,
+    HistoryStats,
+    UploadStates,
+)
+from models.uploader_models import (
+    LibgenMetadata,
+    ValidTopics,
+    AvailableSources,
+)
+from config.migrations import METADATA_COLUMNS, metadata_to_columns
+from keys import get_sqlite_manager
+from config.data_config import load_user_settings
+from .downloads_snapshot import DownloadsSnapshot
+from .file_hashing import get_file_hasher, hash_file
+from .seen_urls import SeenURLFilter, get_seen_url_filter
+from .upload_queue import UploadQueueReader
 
 
 class HistoryHandler:
     def __init__(self):
-        self.db_conn = sqlite_instance
+        self.db_manager = get_sqlite_manager()
         self.valid_extensions = ("epub", "pdf", "mobi")
+        self.file_hasher = get_file_hasher()
 
     def _remove_file(self, file_path: str):
         try:
@@ -52,17 +70,16 @@ class HistoryHandler:
         if file_path:
             self._validate_file_path(file_path)
 
-        with self.db_conn as conn:
-            metadata_str = self.stringfy_metadata(metadata)
+        with self.db_manager.connection() as conn:
             cursor = conn.cursor()
             query = cursor.execute(
-                "SELECT metadata, filepath, uploaded FROM spp WHERE metadata=?",
-                (metadata_str,),
+                "SELECT filepath, uploaded FROM spp WHERE dedup_key=?",
+                (metadata.dedup_key(),),
             )
             possible_values: list[tuple] = query.fetchall()
             for value in possible_values:
-                value_path = value[1]
-                value_uploaded = value[2]
+                value_path = value[0]
+                value_uploaded = value[1]
 
                 if value_uploaded != 0:
                     return True
@@ -75,53 +92,200 @@ class HistoryHandler:
 
             return False
 
+    def _metadata_from_columns(self, values: tuple) -> LibgenMetadata:
+        # Columns are only written from validated models, so validating again is skipped.
+        fields = dict(zip(METADATA_COLUMNS, values))
+        fields["topic"] = ValidTopics(fields["topic"])
+        fields["source"] = AvailableSources(fields["source"])
+        return LibgenMetadata.construct(**fields)
+
+    def _build_pending_filter(
+        self,
+        topic: ValidTopics | None = None,
+        language: str | None = None,
+        source: AvailableSources | None = None,
+    ) -> tuple[str, list]:
+        conditions = ["uploaded=0", "source IS NOT NULL"]
+        params = []
+        for column, value in (("topic", topic), ("language", language), ("source", source)):
+            if value is not None:
+                conditions.append(f"{column}=?")
+                params.append(value.value if isinstance(value, Enum) else value)
+
+        return " AND ".join(conditions), params
+
     def get_all_history(self) -> Generator[LibgenMetadata, None, None]:
-        with self.db_conn as conn:
+        columns = ", ".join(METADATA_COLUMNS)
+        with self.db_manager.connection() as conn:
             cursor = conn.cursor()
             for row in cursor.execute(
-                "SELECT id, metadata, filepath, uploaded, uploaded_at " "FROM spp"
+                f"SELECT {columns} FROM spp WHERE source IS NOT NULL"
             ):
-                metadata_str = row[1]
-                metadata = self.load_metadata(metadata_str)
-                metadata_as_model = LibgenMetadata(**metadata)
-                yield metadata_as_model
-
-    def get_num_uploadable_entries(self) -> int:
-        with self.db_conn as conn:
+                yield self._metadata_from_columns(row)
+
+    def get_num_uploadable_entries(
+        self,
+        topic: ValidTopics | None = None,
+        language: str | None = None,
+        source: AvailableSources | None = None,
+    ) -> int:
+        if topic is None and language is None and source is None:
+            return self.stats().pending
+
+        where, params = self._build_pending_filter(topic, language, source)
+        with self.db_manager.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM spp WHERE uploaded=0")
+            cursor.execute(f"SELECT COUNT(*) FROM spp WHERE {where}", params)
             count = cursor.fetchone()
             return count[0]
 
-    def get_uploadable_history(self) -> Generator[HistoryEntry, None, None]:
-        with self.db_conn as conn:
-            cursor = conn.cursor()
-            count = self.get_num_uploadable_entries()
-            if count == 0:
-                logging.info("No files to upload.")
-                raise FileNotFoundError("No files to upload.")
+    def get_num_uploadable_books(self, source: AvailableSources | None = None) -> int:
+        """
+        Books waiting for upload, all formats of a book count once.
+        """
+        where, params = self._build_pending_filter(source=source)
+        with self.db_manager.connection() as conn:
+            return conn.execute(
+                f"SELECT COUNT(DISTINCT dedup_key) FROM spp WHERE {where}", params
+            ).fetchone()[0]
 
-            for row in cursor.execute(
-                "SELECT id, metadata, filepath, uploaded, uploaded_at "
-                "FROM spp WHERE uploaded=0"
-            ):
-                entry_id = row[0]
-                metadata_str = row[1]
-                file_path = row[2]
-                metadata = self.load_metadata(metadata_str)
-                metadata_as_model = LibgenMetadata(**metadata)
-                if not self._is_path_valid(file_path):
-                    logging.warning(f"File {file_path} does not exist. Skipping.")
-                    continue
-                elif not self._is_extension_valid(file_path):
-                    logging.warning(f"File {file_path} does not exist. Skipping.")
-                    continue
-
-                history_entry = HistoryEntry(
-                    entry_id=entry_id, file_path=file_path, metadata=metadata_as_model
+    def stats(self) -> HistoryStats:
+        """
+        Returns history counters. They're maintained by triggers, so this is cheap regardless of history size.
+        """
+        with self.db_manager.connection() as conn:
+            rows = conn.execute("SELECT name, value FROM spp_stats").fetchall()
+
+        stats = HistoryStats()
+        for name, value in rows:
+            if name.startswith("topic:"):
+                stats.topics[name.removeprefix("topic:")] = value
+            elif name.startswith("source:"):
+                stats.sources[name.removeprefix("source:")] = value
+            elif name in HistoryStats.__fields__:
+                setattr(stats, name, value)
+
+        return stats
+
+    def get_uploadable_page(
+        self,
+        last_id: int = 0,
+        limit: int = 50,
+        topic: ValidTopics | None = None,
+        language: str | None = None,
+        source: AvailableSources | None = None,
+        snapshot: DownloadsSnapshot | None = None,
+    ) -> tuple[list[HistoryEntry], list[str], int | None]:
+        """
+        Fetches one page of entries waiting for upload, with ids greater than last_id.
+        The connection is released as soon as the page is read.
+        Entries can be filtered by topic, language and source.
+        :param snapshot: listing of the downloads directory used to check files exist. one is taken if omitted.
+        :return: valid entries in the page, paths of missing files and the last id read.
+        the last id is None if the page was empty.
+        """
+        if snapshot is None:
+            snapshot = DownloadsSnapshot(load_user_settings().downloads_path)
+
+        where, params = self._build_pending_filter(topic, language, source)
+        columns = ", ".join(METADATA_COLUMNS)
+        with self.db_manager.connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, filepath, md5, {columns} FROM spp "
+                f"WHERE {where} AND id>? ORDER BY id LIMIT ?",
+                (*params, last_id, limit),
+            ).fetchall()
+
+        if len(rows) == 0:
+            return [], [], None
+
+        entries = []
+        missing_paths = []
+        for entry_id, file_path, md5, *metadata_values in rows:
+            if not self._is_extension_valid(file_path) or not snapshot.is_file(file_path):
+                missing_paths.append(file_path)
+                continue
+
+            entries.append(
+                HistoryEntry(
+                    entry_id=entry_id,
+                    file_path=file_path,
+                    metadata=self._metadata_from_columns(metadata_values),
+                    md5=md5,
                 )
+            )
+
+        return entries, missing_paths, rows[-1][0]
+
+    def get_uploadable_history(
+        self,
+        topic: ValidTopics | None = None,
+        language: str | None = None,
+        source: AvailableSources | None = None,
+    ) -> Generator[HistoryEntry, None, None]:
+        count = self.get_num_uploadable_entries(topic, language, source)
+        if count == 0:
+            logging.info("No files to upload.")
+            raise FileNotFoundError("No files to upload.")
+
+        yield from UploadQueueReader(
+            self, topic=topic, language=language, source=source
+        )
+
+    def _build_search_query(self, query: str) -> str:
+        # Every word is quoted, so user input can't break FTS5 syntax, and prefix matched.
+        terms = [term.replace('"', '""') for term in query.split()]
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def _get_upload_state(self, uploaded: int) -> UploadStates:
+        if uploaded == 0:
+            return UploadStates.pending
+        if uploaded == 1:
+            return UploadStates.uploaded
+        return UploadStates.remote
+
+    def search(self, query: str, limit: int = 20) -> list[HistorySearchResult]:
+        """
+        Searches history by title, authors and description, best matches first.
+        :param query: words to look for. all of them must match, partial words are accepted.
+        :param limit: max number of results
+        """
+        match_query = self._build_search_query(query)
+        if match_query == "":
+            return []
+
+        columns = ", ".join(f"spp.{column}" for column in METADATA_COLUMNS)
+        with self.db_manager.connection() as conn:
+            try:
+                rows = conn.execute(
+                    f"SELECT spp.id, spp.filepath, spp.uploaded, spp.uploaded_at, {columns} "
+                    "FROM spp_fts JOIN spp ON spp.id = spp_fts.rowid "
+                    "WHERE spp_fts MATCH ? AND spp.source IS NOT NULL "
+                    "ORDER BY spp_fts.rank LIMIT ?",
+                    (match_query, limit),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                logging.error(f"Could not search history: {e}")
+                raise HistoryError("History search is not available.")
+
+        return [
+            HistorySearchResult(
+                entry_id=entry_id,
+                file_path=file_path,
+                status=self._get_upload_state(uploaded),
+                uploaded_at=uploaded_at,
+                metadata=self._metadata_from_columns(metadata_values),
+            )
+            for entry_id, file_path, uploaded, uploaded_at, *metadata_values in rows
+        ]
+
+    def is_file_valid(self, file_path: str) -> bool:
+        try:
+            self._validate_file_path(file_path)
+        except HistoryError:
+            return False
 
-                yield history_entry
+        return True
 
     def _validate_file_path(self, file_path: str):
         if not os.path.isabs(file_path):
@@ -132,59 +296,288 @@ class HistoryHandler:
         ):
             raise HistoryError("File path or extension is invalid.")
 
+    def _build_insert_row(
+        self,
+        metadata: LibgenMetadata,
+        file_path: str,
+        hashes: FileHashes,
+        source_url: str | None = None,
+    ) -> tuple:
+        dedup_key = metadata.dedup_key()
+        return (
+            self.stringfy_metadata(metadata),
+            file_path,
+            dedup_key,
+            hashes.md5,
+            hashes.sha1,
+            hashes.size,
+            source_url,
+            *metadata_to_columns(metadata),
+            dedup_key,
+            file_path,
+            hashes.md5,
+        )
+
+    def _insert_rows(self, rows: list[tuple]) -> int:
+        """
+        Inserts rows built by _build_insert_row in a single transaction.
+        The duplicate check happens inside the INSERT itself, so rowcount tells how many were added.
+        Byte-identical files (same md5) are always considered duplicates.
+        """
+        columns = ", ".join(METADATA_COLUMNS)
+        placeholders = ", ".join("?" for _ in METADATA_COLUMNS)
+        with self.db_manager.connection() as conn:
+            cursor = conn.executemany(
+                "INSERT INTO spp "
+                f"(metadata, filepath, uploaded, dedup_key, md5, sha1, file_size, source_url, {columns}) "
+                f"SELECT ?, ?, 0, ?, ?, ?, ?, ?, {placeholders} WHERE NOT EXISTS "
+                "(SELECT 1 FROM spp WHERE dedup_key=? AND (uploaded!=0 OR filepath=?)) "
+                "AND NOT EXISTS (SELECT 1 FROM spp WHERE md5=?)",
+                rows,
+            )
+            return cursor.rowcount
+
     def add_to_history(self, metadata: LibgenMetadata, file_path: str):
-        if self.check_duplicate(metadata, file_path):
+        self._validate_file_path(file_path)
+
+        hashes = hash_file(file_path)
+        added = self._insert_rows([self._build_insert_row(metadata, file_path, hashes)])
+        if added != 1:
             raise HistoryError("Duplicated entry. Skipping.")
 
-        self._validate_file_path(file_path)
+        logging.info(f"Added {file_path} to history.")
 
-        with self.db_conn as conn:
-            metadata_str = self.stringfy_metadata(metadata)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO spp (metadata, filepath, uploaded) VALUES (?, ?, ?)",
-                (metadata_str, file_path, 0),
+    def add_many_to_history(
+        self,
+        entries: list[tuple[LibgenMetadata, str]],
+        hashes: dict[str, FileHashes] | None = None,
+        source_url: str | None = None,
+    ) -> int:
+        """
+        Adds several files to history in a single transaction.
+        Entries with an invalid file path, or which are already in history, are skipped.
+        :param entries: pairs of metadata and absolute filepath
+        :param hashes: hashes of the files, by filepath. computed in the hashing pool if omitted.
+        :param source_url: page the files were downloaded from, stored with every entry.
+        :return: number of entries added
+        """
+        valid_entries = []
+        for metadata, file_path in entries:
+            try:
+                self._validate_file_path(file_path)
+            except HistoryError as e:
+                logging.error(f"Not adding {file_path} to history: {e}")
+                continue
+            valid_entries.append((metadata, file_path))
+
+        if hashes is None:
+            hashes = self.file_hasher.hash_files(
+                [file_path for _, file_path in valid_entries]
             )
 
-            last_id = cursor.lastrowid
-            cursor.execute(
-                "SELECT id, metadata, filepath FROM spp WHERE id=?", (last_id,)
-            )
-            added_entry = cursor.fetchone()
-            if (
-                added_entry is None
-                or added_entry[1] != metadata_str
-                or added_entry[2] != file_path
-            ):
-                logging.error(f"Could not add entry to history.")
-                raise HistoryError("Could not add entry to history.")
+        rows = [
+            self._build_insert_row(metadata, file_path, hashes[file_path], source_url)
+            for metadata, file_path in valid_entries
+        ]
 
-        logging.info(f"Added {file_path} to history.")
+        if len(rows) == 0:
+            return 0
 
-    def mark_as_uploaded(self, entry_id: int, uploaded_at: str | None = None):
-        with self.db_conn as conn:
-            cursor = conn.cursor()
-            if uploaded_at:
-                cursor.execute(
-                    "UPDATE spp SET uploaded=1, uploaded_at=? WHERE id=?",
-                    (uploaded_at, entry_id),
-                )
+        added = self._insert_rows(rows)
+        if added < len(rows):
+            logging.warning(f"Skipped {len(rows) - added} duplicated history entries.")
+
+        logging.info(f"Added {added} entries to history.")
+        return added
+
+    def register_downloaded_files(
+        self,
+        metadata: LibgenMetadata,
+        file_paths: list[str],
+        source_url: str | None = None,
+        hashes: dict[str, FileHashes] | None = None,
+    ) -> int:
+        """
+        Adds freshly downloaded files of a book to history, in a single transaction.
+        Invalid files and files byte-identical to one already in history are removed from disk.
+        :param source_url: page of the book, marked as seen.
+        :param hashes: hashes computed while the files were downloaded, by filepath. files missing
+        from it are hashed in the hashing pool.
+        :return: number of files added
+        """
+        if source_url is not None:
+            self.mark_url_seen(source_url)
+
+        valid_paths = []
+        for file_path in file_paths:
+            if self.is_file_valid(file_path):
+                valid_paths.append(file_path)
             else:
-                cursor.execute("UPDATE spp SET uploaded=1 WHERE id=?", (entry_id,))
+                logging.error(f"Failed to add {file_path} to history. Invalid file.")
+                self._remove_file(file_path)
+
+        known_hashes = hashes or {}
+        hashes = {path: known_hashes[path] for path in valid_paths if path in known_hashes}
+        # Only files that weren't hashed while downloading are read again.
+        hashes.update(
+            self.file_hasher.hash_files([path for path in valid_paths if path not in known_hashes])
+        )
+        for file_path in self.find_known_files(hashes):
+            logging.warning(
+                f"File {file_path} is byte-identical to a file in history. Removing."
+            )
+            self._remove_file(file_path)
+            valid_paths.remove(file_path)
+            hashes.pop(file_path)
 
-            cursor.execute("SELECT uploaded FROM spp WHERE id=?", (entry_id,))
-            test_result = cursor.fetchone()
+        return self.add_many_to_history(
+            [(metadata, file_path) for file_path in valid_paths], hashes, source_url
+        )
 
-            if test_result is None or test_result[0] != 1:
-                logging.error(f"Could not mark entry {entry_id} as uploaded.")
-                raise HistoryError(
-                    f"Could not mark entry with id {entry_id} as uploaded."
+    def _get_seen_urls(self) -> SeenURLFilter:
+        """
+        Returns the seen urls filter, building it from the source urls in history if it doesn't exist,
+        or if it holds more urls than it was sized for.
+        """
+        db_path = self.db_manager.db_path
+        seen_urls = get_seen_url_filter(
+            os.path.join(os.path.dirname(os.path.abspath(db_path)), "seen_urls.bloom")
+        )
+        if seen_urls.is_open and not seen_urls.is_full:
+            return seen_urls
+
+        # Scraper threads share the filter, only one of them opens and fills it.
+        with seen_urls.lock:
+            if seen_urls.is_open and not seen_urls.is_full:
+                return seen_urls
+
+            if seen_urls.is_full:
+                logging.info("Seen urls filter is full. Rebuilding it with twice the size.")
+                seen_urls.reset()
+
+            with self.db_manager.connection() as conn:
+                num_urls = conn.execute(
+                    "SELECT COUNT(*) FROM spp WHERE source_url IS NOT NULL"
+                ).fetchone()[0]
+                if seen_urls.open(num_urls):
+                    seen_urls.add_many(
+                        row[0]
+                        for row in conn.execute(
+                            "SELECT source_url FROM spp WHERE source_url IS NOT NULL"
+                        )
+                    )
+
+        return seen_urls
+
+    def is_url_seen(self, url: str) -> bool:
+        """
+        Checks if a book page was already visited, without touching the database.
+        Rarely returns true for a new url, never returns false for a seen one.
+        """
+        return url in self._get_seen_urls()
+
+    def mark_url_seen(self, url: str):
+        self._get_seen_urls().add(url)
+
+    def find_known_files(self, hashes: dict[str, FileHashes]) -> list[str]:
+        """
+        Returns the filepaths whose content (by md5) is already in history.
+        :param hashes: hashes of the files, by filepath
+        """
+        if len(hashes) == 0:
+            return []
+
+        md5s = list({file_hashes.md5 for file_hashes in hashes.values()})
+        with self.db_manager.connection() as conn:
+            placeholders = ", ".join("?" for _ in md5s)
+            known_md5s = {
+                row[0]
+                for row in conn.execute(
+                    f"SELECT md5 FROM spp WHERE md5 IN ({placeholders})", md5s
                 )
+            }
+
+        return [
+            file_path
+            for file_path, file_hashes in hashes.items()
+            if file_hashes.md5 in known_md5s
+        ]
+
+    def is_content_uploaded(self, entry: HistoryEntry) -> bool:
+        """
+        Checks if a byte-identical copy of this entry's file has already been uploaded.
+        Hashes are computed and stored for entries that don't have them yet.
+        """
+        if entry.md5 is None:
+            hashes = hash_file(entry.file_path)
+            self.set_file_hashes(entry.entry_id, hashes)
+            entry.md5 = hashes.md5
+
+        with self.db_manager.connection() as conn:
+            result = conn.execute(
+                "SELECT 1 FROM spp WHERE md5=? AND uploaded=1 AND id!=? LIMIT 1",
+                (entry.md5, entry.entry_id),
+            ).fetchone()
+
+        return result is not None
+
+    def set_file_hashes(self, entry_id: int, hashes: FileHashes):
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "UPDATE spp SET md5=?, sha1=?, file_size=? WHERE id=?",
+                (hashes.md5, hashes.sha1, hashes.size, entry_id),
+            )
+
+    def update_metadata(self, source_url: str, metadata: LibgenMetadata) -> int:
+        """
+        Replaces the metadata of the entries downloaded from source_url that weren't uploaded yet,
+        e.g. after their page was parsed again.
+        :return: number of updated entries
+        """
+        assignments = ", ".join(f"{column}=?" for column in METADATA_COLUMNS)
+        with self.db_manager.connection() as conn:
+            cursor = conn.execute(
+                f"UPDATE spp SET metadata=?, dedup_key=?, {assignments} WHERE source_url=? AND uploaded=0",
+                (
+                    self.stringfy_metadata(metadata),
+                    metadata.dedup_key(),
+                    *metadata_to_columns(metadata),
+                    source_url,
+                ),
+            )
+            return cursor.rowcount
+
+    def mark_as_uploaded(self, entry_id: int, uploaded_at: str | None = None):
+        if self.mark_many_as_uploaded([entry_id], uploaded_at) != 1:
+            logging.error(f"Could not mark entry {entry_id} as uploaded.")
+            raise HistoryError(f"Could not mark entry with id {entry_id} as uploaded.")
+
+    def mark_many_as_uploaded(
+        self, entry_ids: list[int], uploaded_at: str | None = None
+    ) -> int:
+        """
+        Marks several entries as uploaded in a single transaction.
+        :param entry_ids: ids of the entries to mark
+        :param uploaded_at: optional value for uploaded_at. existing values are kept if omitted.
+        :return: number of entries marked
+        """
+        with self.db_manager.connection() as conn:
+            cursor = conn.executemany(
+                "UPDATE spp SET uploaded=1, uploaded_at=COALESCE(?, uploaded_at) WHERE id=?",
+                [(uploaded_at or None, entry_id) for entry_id in entry_ids],
+            )
+            marked = cursor.rowcount
+
+        if marked < len(entry_ids):
+            logging.warning(
+                f"Only {marked} of {len(entry_ids)} entries were marked as uploaded."
+            )
 
-            logging.info(f"Marked entry {entry_id} as uploaded.")
+        logging.info(f"Marked {marked} entries as uploaded.")
+        return marked
 
     def remove_from_history(self, entry_id: int, clean: bool = False):
-        with self.db_conn as conn:
+        with self.db_manager.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT filepath FROM spp WHERE id=?", (entry_id,))
             result = cursor.fetchone()
@@ -0,0 +1,36 @@
+import time
+
+from keys import get_sqlite_manager
+
+
+class HostStateHandler:
+    """
+    Backoff and circuit breaker state of each host, kept in the spp_hosts table, so every process sharing
+    a history database leaves a host alone once one of them finds it throttling or down.
+    Times are wall clock timestamps, they're compared across processes.
+    """
+
+    def __init__(self):
+        self.db_manager = get_sqlite_manager()
+
+    def get_wait_time(self, host: str) -> float:
+        """
+        :return: seconds before a request may be sent to host, 0 if it may go now.
+        """
+        with self.db_manager.connection() as conn:
+            row = conn.execute("SELECT not_before FROM spp_hosts WHERE host=?", (host,)).fetchone()
+
+        if row is None:
+            return 0
+        return max(0.0, row[0] - time.time())
+
+    def delay(self, host: str, wait_time: float):
+        """
+        Holds every process' requests to host for wait_time seconds, unless they're already held longer.
+        """
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "INSERT INTO spp_hosts (host, not_before) VALUES (?, ?) "
+                "ON CONFLICT(host) DO UPDATE SET not_before=MAX(not_before, excluded.not_before)",
+                (host, time.time() + wait_time),
+            )
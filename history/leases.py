@@ -0,0 +1,170 @@
+import logging
+import os
+import socket
+import time
+
+from keys import get_sqlite_manager
+from models.frontier_models import FrontierStates
+from .seen_urls import normalize_url
+
+# Seconds a lease lasts if its owner never releases it, e.g. because the process was killed.
+LEASE_TTL = 1800
+
+# Windows API values used to check if a process is running.
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+
+def get_owner_id(pid: int | None = None, worker: str | None = None) -> str:
+    """
+    Identifies a process of this machine (this one by default) in leases and frontier claims.
+    :param worker: tells apart scrapers running in threads of the same process.
+    """
+    owner = f"{socket.gethostname()}:{pid if pid is not None else os.getpid()}"
+    return f"{owner}#{worker}" if worker is not None else owner
+
+
+def _is_windows_process_running(pid: int) -> bool:
+    # os.kill can't probe a process on Windows, it'd terminate it.
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # The process exists, but belongs to another user.
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _is_process_running(pid: int) -> bool:
+    if os.name == "nt":
+        return _is_windows_process_running(pid)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def is_owner_alive(owner: str) -> bool:
+    """
+    Checks if the process behind an owner id is still running.
+    Processes of other machines are always considered alive, their leases expire on their own.
+    """
+    host, _, pid = owner.partition("#")[0].rpartition(":")
+    if host != socket.gethostname():
+        return True
+
+    try:
+        return _is_process_running(int(pid))
+    except ValueError:
+        return True
+
+
+def book_lease_key(url: str) -> str:
+    return f"book:{normalize_url(url)}"
+
+
+class LeaseHandler:
+    """
+    Short-lived claims on shared work, kept in the spp_leases table, so scraper processes sharing a
+    history database never work on the same book.
+    """
+
+    def __init__(self, owner: str | None = None):
+        self.db_manager = get_sqlite_manager()
+        self.owner = owner if owner is not None else get_owner_id()
+
+    def acquire(self, key: str, ttl: float = LEASE_TTL, max_pending: int | None = None) -> bool:
+        """
+        Claims key, unless another owner holds an unexpired lease on it.
+        :param max_pending: fails if pending history entries plus active leases would exceed it, so a
+        download limit holds across every process.
+        :return: true if the lease was acquired.
+        """
+        now = time.time()
+        with self.db_manager.connection() as conn:
+            # A single statement, checked and written under SQLite's write lock.
+            cursor = conn.execute(
+                "INSERT INTO spp_leases (key, owner, expires_at) SELECT ?, ?, ? "
+                "WHERE ? IS NULL OR COALESCE((SELECT value FROM spp_stats WHERE name='pending'), 0) "
+                "+ (SELECT COUNT(*) FROM spp_leases WHERE expires_at>? AND key!=?) < ? "
+                "ON CONFLICT(key) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at "
+                "WHERE spp_leases.expires_at<=? OR spp_leases.owner=excluded.owner",
+                (key, self.owner, now + ttl, max_pending, now, key, max_pending, now),
+            )
+            return cursor.rowcount == 1
+
+    def is_held_by_other(self, key: str) -> bool:
+        with self.db_manager.connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM spp_leases WHERE key=? AND owner!=? AND expires_at>?",
+                (key, self.owner, time.time()),
+            ).fetchone()
+            return row is not None
+
+    def release(self, key: str):
+        with self.db_manager.connection() as conn:
+            conn.execute(
+                "DELETE FROM spp_leases WHERE key=? AND owner=?", (key, self.owner)
+            )
+
+    def count_active(self) -> int:
+        with self.db_manager.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM spp_leases WHERE expires_at>?", (time.time(),)
+            ).fetchone()[0]
+
+    def release_owner(self, owner: str) -> int:
+        """
+        Drops the leases of a process (its worker threads' included), and sends the frontier pages it
+        claimed back to the queue.
+        :return: number of released leases and pages
+        """
+        workers = f"{owner}#%"
+        with self.db_manager.connection() as conn:
+            released = conn.execute(
+                "DELETE FROM spp_leases WHERE owner=? OR owner LIKE ?", (owner, workers)
+            ).rowcount
+            released += conn.execute(
+                "UPDATE spp_frontier SET state=?, claimed_by=NULL "
+                "WHERE state=? AND (claimed_by=? OR claimed_by LIKE ?)",
+                (FrontierStates.pending.value, FrontierStates.in_progress.value, owner, workers),
+            ).rowcount
+            return released
+
+    def release_dead_owners(self) -> int:
+        """
+        Releases everything held by processes of this machine that are no longer running.
+        """
+        with self.db_manager.connection() as conn:
+            owners = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT owner FROM spp_leases UNION "
+                    "SELECT claimed_by FROM spp_frontier WHERE state=? AND claimed_by IS NOT NULL",
+                    (FrontierStates.in_progress.value,),
+                )
+            ]
+
+        released = 0
+        for owner in owners:
+            if not is_owner_alive(owner):
+                released += self.release_owner(owner)
+
+        if released > 0:
+            logging.info(f"Released {released} leases and claims left by stopped scrapers.")
+        return released
@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Iterator
+
+from config.data_config import load_user_settings
+from keys import get_sqlite_manager
+
+# Eviction frees space down to this share of the limit, so it doesn't run again on the next page.
+EVICTION_TARGET = 0.9
+# Index rows looked at per eviction round.
+EVICTION_BATCH_SIZE = 256
+
+
+class PageCache:
+    """
+    Compressed copies of fetched book pages, so metadata can be parsed again offline, e.g. after a
+    parser fix, see routines.page_cache_routines.
+    Pages are stored by the sha256 of their content, so identical pages are only stored once, and
+    indexed by url in the spp_pages table. Least recently used pages are evicted once the cache grows
+    past page_cache_max_mb. Their total size is kept in spp_pages_stats as pages come and go, so checking
+    the limit after every page doesn't get slower as the cache grows.
+    """
+
+    def __init__(self, cache_path: str | None = None, max_mb: int | None = None):
+        self.db_manager = get_sqlite_manager()
+        settings = load_user_settings()
+        if cache_path is None:
+            cache_path = settings.page_cache_path or os.path.join(
+                os.path.dirname(self.db_manager.db_path), "page_cache"
+            )
+        self.cache_path = cache_path
+        self.max_bytes = (max_mb if max_mb is not None else settings.page_cache_max_mb) * 1024 ** 2
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_path, digest[:2], f"{digest}.html.gz")
+
+    def _write_blob(self, digest: str, page: bytes) -> int:
+        """
+        :return: size of the compressed page.
+        """
+        blob_path = self._blob_path(digest)
+        if os.path.exists(blob_path):
+            return os.path.getsize(blob_path)
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(page, compresslevel=6))
+            # Readers never see a partial page.
+            os.replace(temp_path, blob_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        return os.path.getsize(blob_path)
+
+    @staticmethod
+    def _add_bytes(conn: sqlite3.Connection, size: int):
+        conn.execute("UPDATE spp_pages_stats SET value = value + ? WHERE name='bytes'", (size,))
+
+    def _drop_pages(self, conn: sqlite3.Connection, pages: list[tuple[str, str, int]]) -> list[str]:
+        """
+        Removes pages from the index, and their size from the cache size once no url uses their copy.
+        :param pages: url, digest and size of each page
+        :return: digests of the copies no longer used, to be removed once the transaction is committed.
+        """
+        orphans = []
+        for url, digest, size in pages:
+            conn.execute("DELETE FROM spp_pages WHERE url=?", (url,))
+            # Identical pages of other urls keep the blob.
+            if conn.execute("SELECT 1 FROM spp_pages WHERE digest=?", (digest,)).fetchone() is None:
+                orphans.append(digest)
+                self._add_bytes(conn, -size)
+        return orphans
+
+    def _remove_blob(self, digest: str):
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    def put(self, url: str, page: bytes | str):
+        """
+        Stores the page fetched from url, replacing any older copy. Pages decoded by the browser are
+        given back as str by get.
+        """
+        if not self.enabled:
+            return
+
+        is_text = isinstance(page, str)
+        content = page.encode("UTF-8") if is_text else page
+        digest = hashlib.sha256(content).hexdigest()
+        try:
+            size = self._write_blob(digest, content)
+        except OSError as e:
+            # The cache is a convenience, it never stops scraping.
+            logging.error(f"Could not cache page {url}: {e}")
+            return
+
+        now = time.time()
+        orphans = []
+        with self.db_manager.connection() as conn:
+            previous = conn.execute(
+                "SELECT digest, size FROM spp_pages WHERE url=?", (url,)
+            ).fetchone()
+            if previous is not None and previous[0] == digest:
+                conn.execute(
+                    "UPDATE spp_pages SET fetched_at=?, accessed_at=? WHERE url=?", (now, now, url)
+                )
+            else:
+                if previous is not None:
+                    # The page changed since it was cached, its old copy may no longer be used by any url.
+                    orphans = self._drop_pages(conn, [(url, *previous)])
+                is_new = conn.execute("SELECT 1 FROM spp_pages WHERE digest=?", (digest,)).fetchone() is None
+                conn.execute(
+                    "INSERT INTO spp_pages (url, digest, size, is_text, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, digest, size, int(is_text), now, now),
+                )
+                if is_new:
+                    self._add_bytes(conn, size)
+
+        for orphan in orphans:
+            self._remove_blob(orphan)
+        self.evict()
+
+    def _read(self, url: str, digest: str, is_text: int) -> bytes | str | None:
+        try:
+            with gzip.open(self._blob_path(digest), "rb") as f:
+                content = f.read()
+        except (OSError, EOFError) as e:
+            logging.error(f"Cached page of {url} is unreadable, dropping it: {e}")
+            with self.db_manager.connection() as conn:
+                size = conn.execute("SELECT size FROM spp_pages WHERE url=?", (url,)).fetchone()
+                orphans = self._drop_pages(conn, [(url, digest, size[0])]) if size is not None else []
+            for orphan in orphans:
+                self._remove_blob(orphan)
+            return None
+
+        return content.decode("UTF-8") if is_text else content
+
+    def get(self, url: str) -> bytes | str | None:
+        with self.db_manager.connection() as conn:
+            row = conn.execute(
+                "UPDATE spp_pages SET accessed_at=? WHERE url=? RETURNING digest, is_text",
+                (time.time(), url),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return self._read(url, *row)
+
+    def iter_pages(self) -> Iterator[tuple[str, bytes | str]]:
+        """
+        Every cached page with its url. Doesn't count as a use for eviction.
+        """
+        with self.db_manager.connection() as conn:
+            rows = conn.execute("SELECT url, digest, is_text FROM spp_pages ORDER BY url").fetchall()
+
+        for url, digest, is_text in rows:
+            page = self._read(url, digest, is_text)
+            if page is not None:
+                yield url, page
+
+    def size(self) -> int:
+        """
+        Bytes used by the cached pages, each stored page counted once.
+        """
+        with self.db_manager.connection() as conn:
+            row = conn.execute("SELECT value FROM spp_pages_stats WHERE name='bytes'").fetchone()
+            return row[0] if row is not None else 0
+
+    def evict(self) -> int:
+        """
+        Removes least recently used pages until the cache fits in its limit again.
+        :return: number of evicted pages.
+        """
+        total_size = self.size()
+        if total_size <= self.max_bytes:
+            return 0
+
+        target_size = self.max_bytes * EVICTION_TARGET
+        evicted = 0
+        orphans = []
+        with self.db_manager.connection() as conn:
+            while total_size > target_size:
+                rows = conn.execute(
+                    "SELECT url, digest, size FROM spp_pages ORDER BY accessed_at LIMIT ?",
+                    (EVICTION_BATCH_SIZE,),
+                ).fetchall()
+                if len(rows) == 0:
+                    break
+
+                for row in rows:
+                    dropped = self._drop_pages(conn, [row])
+                    orphans.extend(dropped)
+                    evicted += 1
+                    if len(dropped) > 0:
+                        total_size -= row[2]
+                    if total_size <= target_size:
+                        break
+
+        for digest in orphans:
+            self._remove_blob(digest)
+
+        logging.info(f"Evicted {evicted} pages from the page cache.")
+        return evicted
@@ -0,0 +1,65 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+from models.history_models import FileHashes
+from models.uploader_models import LibgenMetadata
+
+if TYPE_CHECKING:
+    from history.history import HistoryHandler
+
+
+class RegistrationStage:
+    """
+    Adds downloaded files to history in a background thread, so hashing files that weren't hashed while
+    downloading doesn't hold the scraper's loop. Books are registered in the order they're submitted.
+    """
+
+    def __init__(self, history_handler: "HistoryHandler"):
+        self.history_handler = history_handler
+        # A single worker keeps registrations in order, the hashing itself runs in the hashing pool.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _register(
+        self,
+        metadata: LibgenMetadata,
+        file_paths: list[str],
+        source_url: str | None,
+        hashes: dict[str, FileHashes] | None,
+        on_done: Callable[[], None] | None,
+    ) -> int:
+        try:
+            return self.history_handler.register_downloaded_files(
+                metadata, file_paths, source_url, hashes
+            )
+        except Exception as e:
+            logging.error(f"Failed to add {file_paths} to history: {e}", exc_info=True)
+            raise
+        finally:
+            if on_done is not None:
+                on_done()
+
+    def submit(
+        self,
+        metadata: LibgenMetadata,
+        file_paths: list[str],
+        source_url: str | None = None,
+        hashes: dict[str, FileHashes] | None = None,
+        on_done: Callable[[], None] | None = None,
+    ) -> Future:
+        """
+        Queues the files of a book for register_downloaded_files.
+        :param on_done: called in the background thread once the files are in history, or failed to be added.
+        :return: future resolving to the number of files added.
+        """
+        return self._executor.submit(
+            self._register, metadata, file_paths, source_url, hashes, on_done
+        )
+
+    def shutdown(self):
+        """
+        Waits for every queued book to be registered.
+        """
+        # The worker thread ends with the executor, its connection must not outlive it.
+        self._executor.submit(self.history_handler.db_manager.release_current)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,265 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+
+from config.data_config import load_user_settings
+from config.migrations import METADATA_COLUMNS
+from exceptions.exceptions import HistoryError
+from keys import get_sqlite_manager
+from models.history_models import HistoryImportReport
+from .downloads_snapshot import DownloadsSnapshot
+from .file_hashing import hash_file
+from models.uploader_models import AvailableSources, ValidTopics, build_dedup_key
+
+EXPORT_FORMAT = "spp-history"
+EXPORT_FORMAT_VERSION = 1
+
+# Rows read from (or written to) the database per transaction.
+REPLICATION_BATCH_SIZE = 5000
+
+# Only this many conflicts are written to the log, the report always has the full count.
+MAX_LOGGED_CONFLICTS = 20
+
+_VALID_TOPICS = {topic.value for topic in ValidTopics}
+_VALID_SOURCES = {source.value for source in AvailableSources}
+
+# Columns shared by spp and the temporary import table.
+_IMPORT_COLUMNS = (
+    "metadata",
+    "filepath",
+    "uploaded",
+    "uploaded_at",
+    "dedup_key",
+    "md5",
+    "sha1",
+    "file_size",
+    *METADATA_COLUMNS,
+)
+
+
+def _row_to_record(row: tuple) -> dict:
+    file_path, uploaded, uploaded_at, md5, sha1, file_size, *metadata_values = row
+    return {
+        "metadata": dict(zip(METADATA_COLUMNS, metadata_values)),
+        "file_name": os.path.basename(file_path) if file_path else None,
+        "md5": md5,
+        "sha1": sha1,
+        "file_size": file_size,
+        "uploaded": uploaded == 1,
+        "uploaded_at": uploaded_at,
+    }
+
+
+def export_history(output_path: str) -> int:
+    """
+    Streams the whole history, along with its file manifest (names, hashes and sizes), to a gzipped
+    JSON lines file. The first line is a header, every other line is one entry.
+    Rows are read in pages, so no transaction is kept open during the export.
+    :return: number of exported entries
+    """
+    manager = get_sqlite_manager()
+    columns = ", ".join(METADATA_COLUMNS)
+    exported = 0
+    last_id = 0
+    # Higher compression levels are several times slower for little gain on this kind of data.
+    with gzip.open(output_path, "wt", encoding="UTF-8", compresslevel=5) as f:
+        header = {"format": EXPORT_FORMAT, "version": EXPORT_FORMAT_VERSION}
+        f.write(json.dumps(header) + "\n")
+        while True:
+            with manager.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT id, filepath, uploaded, uploaded_at, md5, sha1, file_size, {columns} "
+                    "FROM spp WHERE id>? AND source IS NOT NULL ORDER BY id LIMIT ?",
+                    (last_id, REPLICATION_BATCH_SIZE),
+                ).fetchall()
+
+            if len(rows) == 0:
+                break
+
+            f.writelines(
+                json.dumps(_row_to_record(row[1:]), ensure_ascii=False) + "\n"
+                for row in rows
+            )
+            exported += len(rows)
+            last_id = rows[-1][0]
+
+    logging.info(f"Exported {exported} history entries to {output_path}.")
+    return exported
+
+
+class _LocalFiles:
+    """
+    Tells whether files in the downloads folder are the ones an export describes.
+    Each file is hashed at most once per import, and only if its size already matches.
+    """
+
+    def __init__(self, snapshot: DownloadsSnapshot):
+        self.snapshot = snapshot
+        self._md5s: dict[str, str] = {}
+
+    def matches(self, file_path: str, md5: str | None, file_size: int | None) -> bool:
+        """
+        :return: whether file_path exists and has the given md5 and size. values missing from the export
+        aren't checked.
+        """
+        if not self.snapshot.is_file(file_path):
+            return False
+        if file_size is not None and os.path.getsize(file_path) != file_size:
+            return False
+        if md5 is None:
+            return True
+
+        if file_path not in self._md5s:
+            self._md5s[file_path] = hash_file(file_path).md5
+        return self._md5s[file_path] == md5
+
+
+def _record_to_row(record: dict, local_files: _LocalFiles) -> tuple | None:
+    metadata = record.get("metadata") or {}
+    if (
+        metadata.get("topic") not in _VALID_TOPICS
+        or metadata.get("source") not in _VALID_SOURCES
+        or not isinstance(metadata.get("title"), str)
+        or not isinstance(metadata.get("authors"), str)
+    ):
+        return None
+
+    file_name = record.get("file_name")
+    # Files are shared separately. Entries point to where a copy would be placed in this node's
+    # downloads folder. Pending entries whose file isn't there yet are kept as remote (uploaded=2),
+    # they only count as duplicates, until an import finds their file. A different file that happens
+    # to have the same name doesn't count.
+    file_path = (
+        os.path.join(local_files.snapshot.downloads_path, os.path.basename(file_name))
+        if file_name
+        else None
+    )
+    if record.get("uploaded"):
+        uploaded = 1
+    elif file_path is not None and local_files.matches(
+        file_path, record.get("md5"), record.get("file_size")
+    ):
+        uploaded = 0
+    else:
+        uploaded = 2
+    metadata_values = tuple(metadata.get(column) for column in METADATA_COLUMNS)
+    dedup_key = build_dedup_key(
+        metadata["source"], metadata["title"], metadata["authors"], metadata["topic"]
+    )
+    return (
+        json.dumps(dict(zip(METADATA_COLUMNS, metadata_values)), ensure_ascii=False),
+        file_path,
+        uploaded,
+        record.get("uploaded_at"),
+        dedup_key,
+        record.get("md5"),
+        record.get("sha1"),
+        record.get("file_size"),
+        *metadata_values,
+    )
+
+
+def _create_import_table(conn: sqlite3.Connection):
+    # The unique constraints drop duplicates inside the imported file itself.
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS spp_import("
+        f"{', '.join(_IMPORT_COLUMNS)}, UNIQUE(md5), UNIQUE(dedup_key, filepath))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS temp.spp_import_dedup_key_idx ON spp_import(dedup_key)")
+
+
+def _merge_batch(conn: sqlite3.Connection, rows: list[tuple], report: HistoryImportReport):
+    columns = ", ".join(_IMPORT_COLUMNS)
+    placeholders = ", ".join("?" for _ in _IMPORT_COLUMNS)
+    with conn:
+        conn.execute("DELETE FROM spp_import")
+        conn.executemany(
+            f"INSERT OR IGNORE INTO spp_import ({columns}) VALUES ({placeholders})", rows
+        )
+
+        # Same file under a different book: one of the two nodes has wrong metadata.
+        # CROSS JOIN makes SQLite walk the small import batch instead of the whole history.
+        conflicts = conn.execute(
+            "SELECT i.md5, i.title, spp.title FROM spp_import i "
+            "CROSS JOIN spp ON spp.md5 = i.md5 WHERE spp.dedup_key != i.dedup_key"
+        ).fetchall()
+        for md5, imported_title, local_title in conflicts:
+            if report.conflicts < MAX_LOGGED_CONFLICTS:
+                logging.warning(
+                    f"Import conflict: file {md5} is '{imported_title}' in the export "
+                    f"but '{local_title}' in history."
+                )
+            report.conflicts += 1
+
+        # Files uploaded by the other node don't need to be uploaded here.
+        # The unary + keeps SQLite on the md5 index instead of scanning every pending entry.
+        updated = conn.execute(
+            "UPDATE spp SET uploaded=1, uploaded_at=COALESCE(uploaded_at, "
+            "(SELECT uploaded_at FROM spp_import i WHERE i.md5 = spp.md5)) "
+            "WHERE +uploaded IN (0, 2) AND md5 IN (SELECT md5 FROM spp_import WHERE uploaded=1) "
+            "AND dedup_key = (SELECT dedup_key FROM spp_import i WHERE i.md5 = spp.md5)"
+        ).rowcount
+        report.updated += updated
+
+        # Remote entries whose file was copied here since they were imported can be uploaded now.
+        # Imported rows are only pending once the file at their path was checked against their md5.
+        queued = conn.execute(
+            "UPDATE spp SET uploaded=0 "
+            "WHERE +uploaded=2 AND md5 IN (SELECT md5 FROM spp_import WHERE uploaded=0) "
+            "AND (dedup_key, filepath) = "
+            "(SELECT dedup_key, filepath FROM spp_import i WHERE i.md5 = spp.md5)"
+        ).rowcount
+        report.queued += queued
+
+        inserted = conn.execute(
+            f"INSERT INTO spp ({columns}) SELECT {columns} FROM spp_import i "
+            "WHERE NOT EXISTS (SELECT 1 FROM spp WHERE spp.md5 = i.md5) "
+            "AND NOT EXISTS (SELECT 1 FROM spp WHERE spp.dedup_key = i.dedup_key "
+            "AND (spp.filepath = i.filepath OR spp.uploaded != 0))"
+        ).rowcount
+        report.inserted += inserted
+        report.duplicates += len(rows) - inserted
+
+
+def import_history(input_path: str) -> HistoryImportReport:
+    """
+    Merges a history export from another node into this one, in large batched transactions.
+    Entries already known by md5, or by dedup key and file, are skipped. Entries uploaded by the other
+    node mark identical local files as uploaded. Pending entries of the other node only join the upload
+    queue once their file, with the same md5 and size, is in the downloads folder, importing again picks
+    up files copied since.
+    Files with different metadata on each side are reported as conflicts and left untouched.
+    """
+    local_files = _LocalFiles(DownloadsSnapshot(load_user_settings().downloads_path))
+    conn = get_sqlite_manager().get_connection()
+    report = HistoryImportReport()
+    with gzip.open(input_path, "rt", encoding="UTF-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != EXPORT_FORMAT or header.get("version") != EXPORT_FORMAT_VERSION:
+            raise HistoryError(f"{input_path} is not a supported history export.")
+
+        _create_import_table(conn)
+        batch = []
+        for line in f:
+            report.read += 1
+            try:
+                row = _record_to_row(json.loads(line), local_files)
+            except (ValueError, AttributeError, TypeError):
+                row = None
+
+            if row is None:
+                report.invalid += 1
+                continue
+
+            batch.append(row)
+            if len(batch) >= REPLICATION_BATCH_SIZE:
+                _merge_batch(conn, batch, report)
+                batch = []
+
+        if batch:
+            _merge_batch(conn, batch, report)
+
+    logging.info(f"Imported history from {input_path}: {report}")
+    return report
@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable
+from urllib.parse import urlsplit
+
+# Books expected before the filter is rebuilt with twice the size.
+DEFAULT_CAPACITY = 1_000_000
+
+# Chance of a new url being reported as seen. A false positive only costs one random draw.
+FALSE_POSITIVE_RATE = 0.001
+
+_MAGIC = b"SPPBLOOM"
+# magic, number of bits, number of hash functions, capacity, urls added.
+_HEADER = struct.Struct("<8sQIQQ")
+_COUNT_OFFSET = _HEADER.size - 8
+
+
+def normalize_url(url: str) -> str:
+    """
+    Reduces a book url to its host and path, so http/https, www. and trailing slashes don't matter.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+class SeenURLFilter:
+    """
+    A Bloom filter of book urls already visited, memory mapped from a file next to history.db.
+    Bits are set directly in the mapped file, so it persists without explicit saving, and processes
+    sharing the file see each other's urls.
+    It may wrongly report a new url as seen (see FALSE_POSITIVE_RATE), but never the opposite.
+    Thread-safe. Hold lock to open and fill the filter as one step, see HistoryHandler._get_seen_urls.
+    """
+
+    def __init__(self, file_path: str, capacity: int = DEFAULT_CAPACITY):
+        self.file_path = file_path
+        self.capacity = capacity
+        self.num_bits = 0
+        self.num_hashes = 0
+        # Reentrant, so a caller holding it can still open and fill the filter.
+        self.lock = threading.RLock()
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+
+    @staticmethod
+    def _parameters(capacity: int) -> tuple[int, int]:
+        num_bits = math.ceil(-capacity * math.log(FALSE_POSITIVE_RATE) / math.log(2) ** 2)
+        # Rounded to whole bytes.
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return num_bits, num_hashes
+
+    def _create_file(self, file_path: str, capacity: int):
+        num_bits, num_hashes = self._parameters(capacity)
+        with open(file_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, num_bits, num_hashes, capacity, 0))
+            f.truncate(_HEADER.size + num_bits // 8)
+
+    def _map(self) -> bool:
+        """
+        Maps the filter file. Returns False if it's missing or not a valid filter.
+        """
+        try:
+            f = open(self.file_path, "r+b")
+        except FileNotFoundError:
+            return False
+
+        header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            magic, num_bits, num_hashes, capacity, _ = _HEADER.unpack(header)
+            if magic == _MAGIC and os.fstat(f.fileno()).st_size == _HEADER.size + num_bits // 8:
+                self._file = f
+                self._mmap = mmap.mmap(f.fileno(), 0)
+                self.num_bits = num_bits
+                self.num_hashes = num_hashes
+                self.capacity = capacity
+                return True
+
+        f.close()
+        return False
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._mmap is not None
+
+    def open(self, expected_urls: int = 0) -> bool:
+        """
+        Maps the filter, creating it first if the file is missing or invalid.
+        :param expected_urls: urls that will be added to a new filter, it's sized for at least twice as many.
+        :return: true if a new, empty, filter was created and must be filled.
+        """
+        with self.lock:
+            if self._mmap is not None or self._map():
+                return False
+
+            if os.path.exists(self.file_path):
+                logging.warning(f"{self.file_path} is not a valid seen urls filter. Rebuilding it.")
+
+            self.capacity = max(self.capacity, expected_urls * 2)
+            # Built under a temporary name and swapped in, so readers never map a half-built filter.
+            temp_path = f"{self.file_path}.tmp"
+            self._create_file(temp_path, self.capacity)
+            os.replace(temp_path, self.file_path)
+            self._map()
+            return True
+
+    def _positions(self, url: str) -> list[int]:
+        # Double hashing: k positions out of two 64 bit halves of a single digest.
+        digest = hashlib.blake2b(normalize_url(url).encode("UTF-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        offset = _HEADER.size
+        with self.lock:
+            if self._mmap is None:
+                return False
+            return all(
+                self._mmap[offset + position // 8] & (1 << (position % 8))
+                for position in self._positions(url)
+            )
+
+    @property
+    def count(self) -> int:
+        with self.lock:
+            if self._mmap is None:
+                return 0
+            return struct.unpack_from("<Q", self._mmap, _COUNT_OFFSET)[0]
+
+    def add(self, url: str):
+        self.add_many([url])
+
+    def add_many(self, urls: Iterable[str]):
+        offset = _HEADER.size
+        with self.lock:
+            if self._mmap is None:
+                return
+            added = 0
+            for url in urls:
+                for position in self._positions(url):
+                    index = offset + position // 8
+                    self._mmap[index] = self._mmap[index] | (1 << (position % 8))
+                added += 1
+            struct.pack_into("<Q", self._mmap, _COUNT_OFFSET, self.count + added)
+
+    @property
+    def is_full(self) -> bool:
+        return self.count > self.capacity
+
+    def reset(self):
+        """
+        Deletes the filter file, the next open() builds a new one.
+        """
+        with self.lock:
+            self._unmap()
+            try:
+                os.remove(self.file_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+            self._unmap()
+
+
+_seen_url_filter: SeenURLFilter | None = None
+_seen_url_filter_lock = threading.Lock()
+
+
+def get_seen_url_filter(file_path: str) -> SeenURLFilter:
+    """
+    Returns the process-wide filter, shared by every HistoryHandler. It's opened by HistoryHandler.
+    """
+    global _seen_url_filter
+    with _seen_url_filter_lock:
+        if _seen_url_filter is None or _seen_url_filter.file_path != file_path:
+            _seen_url_filter = SeenURLFilter(file_path)
+        return _seen_url_filter
@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator
+
+from config.data_config import load_user_settings
+from models.history_models import HistoryEntry
+from models.uploader_models import ValidTopics, AvailableSources
+from .downloads_snapshot import DownloadsSnapshot
+
+if TYPE_CHECKING:
+    from history.history import HistoryHandler
+
+
+class UploadQueueReader:
+    """
+    Iterates over entries waiting for upload, one small page at a time (keyset pagination by id).
+    No cursor is kept open between pages, so uploads that take minutes don't hold a read transaction.
+    The next page is fetched in background while the current one is consumed.
+
+    Files are checked against a single listing of the downloads directory, and missing ones are
+    reported in one summary once iteration ends.
+    """
+
+    def __init__(
+        self,
+        history_handler: "HistoryHandler",
+        page_size: int = 50,
+        topic: ValidTopics | None = None,
+        language: str | None = None,
+        source: AvailableSources | None = None,
+    ):
+        self.history_handler = history_handler
+        self.page_size = page_size
+        self.topic = topic
+        self.language = language
+        self.source = source
+        self.snapshot: DownloadsSnapshot | None = None
+        self.missing_paths: list[str] = []
+
+    def _fetch_page(self, last_id: int) -> tuple[list[HistoryEntry], list[str], int | None]:
+        return self.history_handler.get_uploadable_page(
+            last_id,
+            self.page_size,
+            self.topic,
+            self.language,
+            self.source,
+            self.snapshot,
+        )
+
+    def _report_missing_files(self):
+        if len(self.missing_paths) == 0:
+            return
+
+        logging.warning(
+            f"Skipped {len(self.missing_paths)} entries in the upload queue whose files don't exist "
+            f"or have an invalid extension. First ones: {self.missing_paths[:5]}"
+        )
+
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        # A single worker is enough, only one page is prefetched at a time.
+        self.snapshot = DownloadsSnapshot(load_user_settings().downloads_path)
+        self.missing_paths = []
+        executor = ThreadPoolExecutor(max_workers=1)
+        next_page: Future | None = None
+        try:
+            next_page = executor.submit(self._fetch_page, 0)
+            while True:
+                entries, missing_paths, last_id = next_page.result()
+                self.missing_paths.extend(missing_paths)
+                if last_id is None:
+                    return
+
+                next_page = executor.submit(self._fetch_page, last_id)
+                yield from entries
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+            # The worker thread ends with the executor, its connection must not outlive it.
+            executor.submit(self.history_handler.db_manager.release_current)
+            executor.shutdown(wait=True)
+            self._report_missing_files()
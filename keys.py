@@ -1,7 +1,18 @@
-from json import load
+import threading
 
-from dotenv import load_dotenv
+from config.data_config import SQLiteConnectionManager, sqlite_conn_setup
 
-from config.data_config import sqlite_conn_setup
+_sqlite_manager: SQLiteConnectionManager | None = None
+_sqlite_manager_lock = threading.Lock()
 
-sqlite_instance = sqlite_conn_setup()
+
+def get_sqlite_manager() -> SQLiteConnectionManager:
+    """
+    Returns the history database manager, opening and migrating the database on first use.
+    Nothing is touched at import time, so commands that don't need history start faster.
+    """
+    global _sqlite_manager
+    with _sqlite_manager_lock:
+        if _sqlite_manager is None:
+            _sqlite_manager = sqlite_conn_setup()
+        return _sqlite_manager
@@ -1,8 +1,8 @@
+import argparse
+
 from dotenv import load_dotenv
 
 from config import logging_setup
-from menu import SPPMenu
-import keys
 
 
 def spp_setup():
@@ -10,7 +10,102 @@ def spp_setup():
     logging_setup()
 
 
+def show_status():
+    from history import HistoryHandler
+
+    stats = HistoryHandler().stats()
+    print(f"Entries ready for upload: {stats.pending}")
+    print(f"Uploaded entries: {stats.uploaded}")
+    print(f"Entries with files on another node: {stats.remote}")
+    if stats.invalid:
+        print(f"Entries with invalid metadata: {stats.invalid}")
+    print(f"Total entries: {stats.total} ({stats.bytes / 1024 ** 2:.1f} MiB)")
+    for topic, count in stats.topics.items():
+        print(f"Topic {topic}: {count}")
+    for source, count in stats.sources.items():
+        print(f"Source {source}: {count}")
+
+
+def export_history(output_path: str):
+    from history.replication import export_history as export_history_file
+
+    exported = export_history_file(output_path)
+    print(f"Exported {exported} entries to {output_path}")
+
+
+def import_history(input_path: str):
+    from history.replication import import_history as import_history_file
+
+    report = import_history_file(input_path)
+    print(
+        f"Read {report.read} entries: {report.inserted} added, {report.duplicates} duplicates, "
+        f"{report.updated} marked as uploaded, {report.queued} queued for upload, "
+        f"{report.conflicts} conflicts, {report.invalid} invalid."
+    )
+
+
+def reparse_pages(update_history: bool):
+    from routines.page_cache_routines import reparse_cached_pages
+
+    report = reparse_cached_pages(update_history)
+    print(
+        f"Parsed {report.parsed} of {report.pages} cached pages: {report.failed} failed, "
+        f"{report.skipped} skipped, {report.updated} history entries updated."
+    )
+
+
+def scrape(workers_num: int, max_downloads_num: int | None):
+    from routines.scraper_workers import elivros_worker_pool
+
+    elivros_worker_pool(workers_num, max_downloads_num)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scraper's Preservation Project")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("status", help="Show how many entries are waiting for upload.")
+    export_parser = subparsers.add_parser(
+        "export", help="Export history and its file manifest to share with other collaborators."
+    )
+    export_parser.add_argument("path", help="Output file, e.g. history.jsonl.gz")
+    import_parser = subparsers.add_parser(
+        "import", help="Merge a history export from another collaborator into this one."
+    )
+    import_parser.add_argument("path", help="File created by the export command.")
+    scrape_parser = subparsers.add_parser(
+        "scrape", help="Run the elivros scraper without the menu, optionally in several processes."
+    )
+    scrape_parser.add_argument(
+        "--workers", type=int, default=1, help="Number of scraper processes sharing the history."
+    )
+    scrape_parser.add_argument(
+        "--max-downloads", type=int, default=None, help="Overrides max_downloads from settings."
+    )
+    reparse_parser = subparsers.add_parser(
+        "reparse", help="Parse cached book pages again, without fetching them, e.g. after a parser fix."
+    )
+    reparse_parser.add_argument(
+        "--update", action="store_true", help="Update the metadata of entries not uploaded yet."
+    )
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
+    args = parse_args()
     spp_setup()
-    spp = SPPMenu()
-    spp.start()
+    if args.command == "status":
+        show_status()
+    elif args.command == "export":
+        export_history(args.path)
+    elif args.command == "import":
+        import_history(args.path)
+    elif args.command == "scrape":
+        scrape(args.workers, args.max_downloads)
+    elif args.command == "reparse":
+        reparse_pages(args.update)
+    else:
+        # The interactive menu is only loaded when it's going to be used.
+        from menu import SPPMenu
+
+        spp = SPPMenu()
+        spp.start()
@@ -1,17 +1,18 @@
 import os
 
 import inquirer
-import pyfiglet
 from pydantic import BaseModel
 
-from menu.spp_submenus import SPPScraperMenu, SPPUploadMenu
-from routines.upload_routines import libgen_uploader
+from menu.spp_submenus import SPPScraperMenu, SPPUploadMenu, SPPSearchMenu
 
+# Submenus are only instantiated when chosen, as some of them load settings or open history.
+# None marks options yet to be implemented.
 SPP_MENU_OPTIONS = {
-    "scraping": SPPScraperMenu().start,
-    "uploading": SPPUploadMenu().start,
-    "settings": "",
-    "exit": ""
+    "scraping": SPPScraperMenu,
+    "uploading": SPPUploadMenu,
+    "search": SPPSearchMenu,
+    "settings": None,
+    "exit": None
 }
 
 
@@ -22,6 +23,8 @@ class SPPMenu:
         self.start_choices = [el for el in self.menu_options.keys()]
 
     def _show_figlet(self):
+        import pyfiglet
+
         figlet = pyfiglet.Figlet()
         print(figlet.renderText("SPP"))
 
@@ -33,7 +36,13 @@ class SPPMenu:
             print("You can use CTRL + C to exit anytime.")
 
             choice = inquirer.list_input("Choose one option", choices=self.start_choices)
-            self.menu_options[choice]()
+            if choice == "exit":
+                self.stop()
+                continue
+
+            submenu_class = self.menu_options[choice]
+            if submenu_class is not None:
+                submenu_class().start()
 
     def start(self):
         self.run = True
@@ -3,27 +3,39 @@ import os
 import inquirer
 
 from config.data_config import load_user_settings
+from exceptions import HistoryError
+from history import HistoryHandler
 from models.uploader_models import AvailableSources
-from routines import elivros_downloader
-from routines.upload_routines import libgen_uploader
+
+
+ALL_SOURCES_CHOICE = "All sources"
 
 
 class SPPScraperMenu:
     def __init__(self):
         self.settings = load_user_settings()
-        self.max_downloads_num = self.settings.max_downloads
 
     def _handle_scraper_choice(self, choice: str):
         os.system("clear")
 
-        if choice == AvailableSources.elivros:
+        if choice == ALL_SOURCES_CHOICE:
+            print("Starting scrapers of all sources")
+            print("You may close the scrapers at any time by pressing CTRL + C")
+            from routines.scraper_scheduler import multi_source_downloader
+
+            multi_source_downloader()
+
+        elif choice == AvailableSources.elivros:
             print(f"Starting {AvailableSources.elivros.value} scraper")
             print("You may close the scraper at any time by pressing CTRL + C" "")
-            elivros_downloader(self.max_downloads_num)
+            # Imported here so selenium is only loaded when scraping starts.
+            from routines import elivros_downloader
+
+            elivros_downloader()
 
     def _show_scraper_menu(self):
 
-        self.choices = [source.value for source in AvailableSources]
+        self.choices = [source.value for source in AvailableSources] + [ALL_SOURCES_CHOICE]
 
         while True:
             os.system("clear")
@@ -51,7 +63,45 @@ class SPPUploadMenu:
             "SPP will upload all valid files in history that are not already uploaded."
         )
         print("You may close the uploader at any time by pressing CTRL + C")
+        # Imported here so selenium is only loaded when uploading starts.
+        from routines.upload_routines import libgen_uploader
+
         libgen_uploader()
 
     def start(self):
         self._show_upload_menu()
+
+
+class SPPSearchMenu:
+    def __init__(self):
+        self.results_limit = 20
+
+    def _show_results(self, query: str):
+        try:
+            results = HistoryHandler().search(query, self.results_limit)
+        except HistoryError as e:
+            print(e)
+            return
+
+        if len(results) == 0:
+            print("No entries found.")
+            return
+
+        for result in results:
+            print(
+                f"[{result.status.value}] {result.metadata.title} - {result.metadata.authors} "
+                f"({result.file_path})"
+            )
+
+    def _show_search_menu(self):
+        os.system("clear")
+        print("Search history by title, authors or description.")
+        print("Leave it empty to go back.")
+        while True:
+            query = inquirer.text("Search")
+            if not query:
+                break
+            self._show_results(query)
+
+    def start(self):
+        self._show_search_menu()
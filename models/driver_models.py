@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+class DriverStats(BaseModel):
+    # Counters of a config.driver_config.DriverManager, for the whole run.
+    started: int = Field(0)
+    restarts: int = Field(0)
+    failed_health_checks: int = Field(0)
+    orphans_killed: int = Field(0)
+    # Pages handed out to the current browser, and seconds since it was started.
+    pages: int = Field(0)
+    age: float = Field(0)
+    # Memory of chromedriver and every Chrome process under it, None if it can't be read.
+    rss_mb: float | None = Field(None)
+    peak_rss_mb: float = Field(0)
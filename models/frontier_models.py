@@ -0,0 +1,23 @@
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class FrontierStates(str, Enum):
+    pending = "pending"
+    in_progress = "in_progress"
+    done = "done"
+    failed = "failed"
+
+
+class FrontierKinds(str, Enum):
+    # listing pages link to books and other listings, book pages have the files.
+    listing = "listing"
+    book = "book"
+
+
+class FrontierEntry(BaseModel):
+    entry_id: int = Field(...)
+    url: str = Field(...)
+    kind: FrontierKinds = Field(...)
+    attempts: int = Field(0)
@@ -1,9 +1,67 @@
+from enum import Enum
+
 from pydantic import BaseModel, Field
 
 from models.uploader_models import LibgenMetadata
 
 
+class UploadStates(str, Enum):
+    # Values of the uploaded column are 0, 1 and 2 respectively.
+    pending = "pending"
+    uploaded = "uploaded"
+    # imported from another node, whose file isn't in this node's downloads folder.
+    remote = "remote"
+
+
 class HistoryEntry(BaseModel):
     entry_id: int = Field(...)
     metadata: LibgenMetadata = Field(...)
     file_path: str = Field(...)
+    md5: str | None = Field(None)
+
+
+class FileHashes(BaseModel):
+    md5: str = Field(...)
+    sha1: str = Field(...)
+    size: int = Field(...)
+
+
+class HistorySearchResult(BaseModel):
+    entry_id: int = Field(...)
+    metadata: LibgenMetadata = Field(...)
+    file_path: str = Field(...)
+    status: UploadStates = Field(...)
+    uploaded_at: str | None = Field(None)
+
+
+class HistoryImportReport(BaseModel):
+    read: int = Field(0)
+    inserted: int = Field(0)
+    duplicates: int = Field(0)
+    updated: int = Field(0)
+    # Entries of the other node whose files were copied here since they were first imported.
+    queued: int = Field(0)
+    conflicts: int = Field(0)
+    invalid: int = Field(0)
+
+
+class HistoryStats(BaseModel):
+    total: int = Field(0)
+    pending: int = Field(0)
+    uploaded: int = Field(0)
+    # Entries imported from another node, whose files aren't here.
+    remote: int = Field(0)
+    # Entries not uploaded whose metadata is invalid, they're never uploaded.
+    invalid: int = Field(0)
+    bytes: int = Field(0)
+    topics: dict[str, int] = Field(default_factory=dict)
+    sources: dict[str, int] = Field(default_factory=dict)
+
+
+class PageReparseReport(BaseModel):
+    pages: int = Field(0)
+    parsed: int = Field(0)
+    failed: int = Field(0)
+    # Pages of sites no parser is known for.
+    skipped: int = Field(0)
+    updated: int = Field(0)
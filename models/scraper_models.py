@@ -0,0 +1,52 @@
+from concurrent.futures import Future
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from models.history_models import FileHashes
+from models.uploader_models import LibgenMetadata
+
+
+class DownloadResult(BaseModel):
+    url: str = Field(...)
+    file_path: str | None = Field(None)
+    bytes: int = Field(0)
+    duration: float = Field(0)
+    error: str | None = Field(None)
+    # Computed while the file was written, so it's never read again to be added to history.
+    hashes: FileHashes | None = Field(None)
+
+
+class ScrapedBook(BaseModel):
+    # A book going through the steps of a scrapers.base.BaseScraper.
+    url: str = Field(...)
+    metadata: LibgenMetadata | None = Field(None)
+    # Lease that keeps other scrapers away from this book.
+    lease_key: str | None = Field(None)
+    # Whatever the scraper already fetched or parsed of the book page.
+    page: Any = Field(None)
+    document: Any = Field(None)
+    # Hashes of the downloaded files by path, for those the scraper hashed while downloading.
+    file_hashes: dict[str, FileHashes] = Field(default_factory=dict)
+
+
+class PendingBook(ScrapedBook):
+    # A book whose files are still being downloaded.
+    downloads: list[Future] = Field(default_factory=list)
+    # Scratch directory the files are downloaded to, a scrapers.download_job.DownloadJob.
+    job: Any = Field(...)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class ChromeDownload(BaseModel):
+    # A download followed through Chrome DevTools events.
+    guid: str = Field(...)
+    url: str = Field(...)
+    file_name: str = Field(...)
+    state: str = Field("inProgress")
+    received_bytes: int = Field(0)
+    total_bytes: int = Field(0)
+    finished_at: float | None = Field(None)
+    file_path: str | None = Field(None)
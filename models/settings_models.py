@@ -1,3 +1,5 @@
+from enum import Enum
+
 from pydantic import BaseModel, Field
 import os
 
@@ -6,8 +8,68 @@ DEFAULT_TEMP_DOWNLOAD_PATH = os.path.join("data", "temp_downloads")
 DEFAULT_HISTORY_DB_PATH = os.path.join("data", "history.db")
 
 
+class ScraperEngines(str, Enum):
+    # http fetches pages and files directly, selenium drives a Chrome instance.
+    http = "http"
+    selenium = "selenium"
+
+
+class ScraperModes(str, Enum):
+    # random draws books from RandomBook, crawl walks the catalog listings through the frontier.
+    random = "random"
+    crawl = "crawl"
+
+
+class DriverProfiles(str, Enum):
+    # performance stops waiting for images, fonts, media and blocked URLs, default is plain Chrome.
+    default = "default"
+    performance = "performance"
+
+
+# Ads and trackers, matched with Network.setBlockedURLs wildcards.
+DEFAULT_DRIVER_BLOCKED_URLS = [
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*facebook.net*",
+    "*disqus.com*",
+]
+
+
+DEFAULT_RATE_LIMITS = {
+    "elivros.love": 2.0,
+    "library.bz": 0.5,
+}
+
+
 class SPPSettingsModel(BaseModel):
     max_downloads: int = Field(default=100)
     downloads_path: str = Field(default=os.path.abspath(DEFAULT_DOWNLOAD_PATH))
     temp_downloads_path: str = Field(default=os.path.abspath(DEFAULT_TEMP_DOWNLOAD_PATH))
     history_db_path: str = Field(default=os.path.abspath(DEFAULT_HISTORY_DB_PATH))
+    scraper_engine: ScraperEngines = Field(default=ScraperEngines.selenium)
+    scraper_mode: ScraperModes = Field(default=ScraperModes.random)
+    # Concurrency limits for the HTTP scraper engine.
+    max_concurrent_downloads: int = Field(default=6)
+    max_downloads_per_host: int = Field(default=3)
+    max_concurrent_books: int = Field(default=2)
+    # A Chrome instance is replaced once it reaches any of these limits, 0 disables a limit.
+    driver_max_pages: int = Field(default=50)
+    driver_max_age: int = Field(default=3600)
+    driver_max_rss_mb: int = Field(default=1500)
+    # performance is opt-in until benchmarks/driver_profiles.py shows it helps against the live sites.
+    driver_profile: DriverProfiles = Field(default=DriverProfiles.default)
+    # Only blocked with the performance profile.
+    driver_blocked_urls: list[str] = Field(default_factory=lambda: list(DEFAULT_DRIVER_BLOCKED_URLS))
+    # Max requests per second to each host, lowered while a host throttles. See ratelimit.
+    rate_limits: dict[str, float] = Field(default_factory=lambda: dict(DEFAULT_RATE_LIMITS))
+    default_rate_limit: float = Field(default=2.0)
+    # Scrapers run at once for each source, and books each source may have waiting for upload
+    # (0 or missing for no limit but max_downloads), when scraping all sources. Quotas count books, not
+    # files: all formats of a book count once.
+    source_concurrency: dict[str, int] = Field(default_factory=lambda: {"elivros.love": 2})
+    source_quotas: dict[str, int] = Field(default_factory=dict)
+    # Compressed copies of fetched book pages, next to history.db if no path is set. 0 MiB disables it.
+    page_cache_path: str | None = Field(default=None)
+    page_cache_max_mb: int = Field(default=512)
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.select import Select
+
+
+class UploadMetadataElements(BaseModel):
+    title: WebElement
+    authors: WebElement
+    series: WebElement
+    description: WebElement
+    publisher: WebElement
+    pages: WebElement
+    language: Select
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -1,8 +1,7 @@
+import hashlib
 from enum import Enum
 
 from pydantic import BaseModel, Field
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.select import Select
 
 
 class AvailableSources(str, Enum):
@@ -20,8 +19,18 @@ class ValidTopics(str, Enum):
     scitech = "sci-tech"
 
 
+def build_dedup_key(source: str, title: str, authors: str, topic: str) -> str:
+    """
+    Fixed-width key identifying a book in history. See LibgenMetadata.dedup_key.
+    """
+    fields = (source, title, authors, topic)
+    normalized = "\x1f".join(" ".join(field.split()).casefold() for field in fields)
+    return hashlib.sha1(normalized.encode("UTF-8")).hexdigest()
+
+
 class LibgenMetadata(BaseModel):
-    # Adding or removing anything will break existing update queue and upload history entries.
+    # Fields are also stored as columns in history (see config/migrations.py).
+    # Adding or removing anything requires a new schema migration.
     topic: ValidTopics
     title: str
     authors: str
@@ -33,15 +42,13 @@ class LibgenMetadata(BaseModel):
     year: str | None = Field(None)
     source: AvailableSources  # Source for metadata and uploading.
 
+    def dedup_key(self) -> str:
+        """
+        Returns a fixed-width key that identifies this book in history.
+        Only source, title, authors and topic are used, so changes in other fields (e.g. description)
+        don't make a book look new.
+        """
+        return build_dedup_key(
+            self.source.value, self.title, self.authors, self.topic.value
+        )
 
-class UploadMetadataElements(BaseModel):
-    title: WebElement
-    authors: WebElement
-    series: WebElement
-    description: WebElement
-    publisher: WebElement
-    pages: WebElement
-    language: Select
-
-    class Config:
-        arbitrary_types_allowed = True
@@ -0,0 +1 @@
+from .rate_limiter import RateLimiter, get_rate_limiter
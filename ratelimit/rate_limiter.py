@@ -0,0 +1,356 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+from urllib.parse import urlsplit
+
+import requests
+from selenium.common import TimeoutException, WebDriverException
+
+from config.data_config import load_user_settings
+from exceptions.exceptions import ScraperError
+
+if TYPE_CHECKING:
+    from history.host_states import HostStateHandler
+
+# Delay before the first retry of each error class, doubled on every consecutive failure.
+BACKOFF_BASE = {
+    "throttled": 10.0,
+    "server": 5.0,
+    "connection": 5.0,
+    "timeout": 2.0,
+    "other": 1.0,
+}
+MAX_BACKOFF = 300.0
+
+# Consecutive failures after which a host is considered down.
+CIRCUIT_FAILURE_THRESHOLD = 5
+# Seconds a host is left alone once down, doubled every time it's still down after that.
+CIRCUIT_BASE_COOLDOWN = 60.0
+CIRCUIT_MAX_COOLDOWN = 900.0
+
+# Requests per second are halved when a host throttles, and grow back by this much on each success.
+RATE_RECOVERY_STEP = 0.05
+MIN_RATE = 0.05
+
+# Seconds between reads of the backoff other processes found, see history.host_states.
+SHARED_STATE_REFRESH = 1.0
+
+
+def get_host(url: str) -> str:
+    host = urlsplit(url).hostname or url
+    return host.removeprefix("www.")
+
+
+def classify_error(error: BaseException) -> str | None:
+    """
+    Tells what an error says about the host it came from.
+    :return: the error class, or None if the host isn't to blame (e.g. a 404, or a browser crash).
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status in (429, 503):
+            return "throttled"
+        if status >= 500:
+            return "server"
+        return None
+    if isinstance(error, (requests.Timeout, TimeoutException)):
+        return "timeout"
+    if isinstance(error, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+        return "connection"
+    if isinstance(error, requests.exceptions.RetryError):
+        # The session's own retries on 5xx ran out.
+        return "server"
+    if isinstance(error, WebDriverException):
+        # Chrome reports network errors of the page it loads as net::ERR_*.
+        return "connection" if "net::ERR_" in (error.msg or "") else None
+    if isinstance(error, (ScraperError, OSError)):
+        # Our own checks, or the local disk.
+        return None
+    return "other"
+
+
+def _get_retry_after(error: BaseException) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    if retry_after.isdigit():
+        return float(retry_after)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host that is down. After the cooldown a single request is let through, and
+    the circuit closes again only if it succeeds.
+    Not thread-safe on its own, HostLimiter locks around it.
+    """
+
+    def __init__(self):
+        self.state = "closed"
+        self.opened_at = 0.0
+        # Times in a row the host was still down after a cooldown.
+        self.trips = 0
+        self.failures = 0
+
+    @property
+    def cooldown(self) -> float:
+        return min(CIRCUIT_MAX_COOLDOWN, CIRCUIT_BASE_COOLDOWN * 2 ** max(0, self.trips - 1))
+
+    def open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self.failures = 0
+
+    def wait_time(self, probe: bool = True) -> float:
+        """
+        :param probe: false if no request follows, so the circuit isn't half opened for nothing.
+        :return: seconds before a request may go through, 0 if it may go now.
+        """
+        if self.state == "closed":
+            return 0
+        if self.state == "open":
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or not probe:
+                return max(0.0, remaining)
+            # This request is the probe.
+            self.state = "half_open"
+            return 0
+        # A probe is already out, check back soon.
+        return 1.0
+
+    def record_success(self):
+        if self.state == "closed":
+            self.trips = 0
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self.open()
+
+
+class HostLimiter:
+    """
+    Pacing of the requests to one host: a token bucket whose rate adapts to throttling, exponential
+    backoff with jitter on errors, and a circuit breaker.
+    With shared host states, backoff and outages are published to the other processes sharing the history
+    database, and theirs are respected here.
+    """
+
+    def __init__(self, host: str, max_rate: float, shared: "HostStateHandler | None" = None):
+        self.host = host
+        self.shared = shared
+        self._shared_checked_at = float("-inf")
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self._tokens = max(1.0, max_rate)
+        self._updated_at = time.monotonic()
+        self._not_before = 0.0
+        self._failures: dict[str, int] = {}
+        self.breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _wait_time(self, take_token: bool) -> float:
+        now = time.monotonic()
+        wait_time = max(self.breaker.wait_time(probe=take_token), self._not_before - now)
+        if wait_time > 0 or not take_token:
+            return wait_time
+
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def _refresh_shared_state(self):
+        if self.shared is None:
+            return
+
+        now = time.monotonic()
+        if now - self._shared_checked_at < SHARED_STATE_REFRESH:
+            return
+        self._shared_checked_at = now
+        wait_time = self.shared.get_wait_time(self.host)
+        with self._lock:
+            self._not_before = max(self._not_before, now + wait_time)
+
+    def _publish(self, wait_time: float):
+        if self.shared is not None:
+            self.shared.delay(self.host, wait_time)
+
+    def acquire(self, take_token: bool = True):
+        """
+        Blocks until a request may be sent to the host.
+        :param take_token: false to only wait out backoff and the circuit breaker.
+        """
+        logged = False
+        while True:
+            self._refresh_shared_state()
+            with self._lock:
+                wait_time = self._wait_time(take_token)
+            if wait_time <= 0:
+                return
+
+            if wait_time > 10 and not logged:
+                logging.info(f"Waiting {wait_time:.0f} seconds before the next request to {self.host}.")
+                logged = True
+            time.sleep(min(wait_time, 5.0))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = {}
+            self._not_before = 0.0
+            self.breaker.record_success()
+            self.rate = min(self.max_rate, self.rate + RATE_RECOVERY_STEP)
+
+    def record_failure(self, error: BaseException) -> float:
+        """
+        :return: seconds until the next request to the host goes through.
+        """
+        error_class = classify_error(error)
+        if error_class is None:
+            self.record_success()
+            return 0
+
+        with self._lock:
+            failures = self._failures.get(error_class, 0) + 1
+            self._failures[error_class] = failures
+            delay = min(MAX_BACKOFF, BACKOFF_BASE[error_class] * 2 ** (failures - 1))
+            # Equal jitter, so processes and threads that failed together don't retry together.
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            retry_after = _get_retry_after(error)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if error_class == "throttled":
+                self.rate = max(MIN_RATE, self.rate / 2)
+
+            self.breaker.record_failure()
+            self._not_before = max(self._not_before, time.monotonic() + delay)
+            wait_time = max(delay, self.breaker.wait_time(probe=False))
+
+        self._publish(wait_time)
+        logging.warning(
+            f"{error_class} error from {self.host} ({failures} in a row), next request in {wait_time:.0f}s: "
+            f"{error}"
+        )
+        return wait_time
+
+    def trip(self) -> float:
+        """
+        Marks the host as down, e.g. when its pages load but it doesn't serve files.
+        :return: seconds until a request is let through again.
+        """
+        with self._lock:
+            self.breaker.open()
+            cooldown = self.breaker.cooldown
+
+        self._publish(cooldown)
+        return cooldown
+
+
+class RateLimiter:
+    """
+    Paces requests per host, so throughput adapts to what each host tolerates instead of fixed sleeps.
+    Every scraper and uploader request goes through the process-wide instance, see get_rate_limiter.
+    Max requests per second of each host come from the rate_limits setting, times rate_share when several
+    processes split them.
+    """
+
+    def __init__(self, shared: "HostStateHandler | None" = None):
+        self.shared = shared
+        self.rate_share = 1.0
+        self._hosts: dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _get_max_rate(self, host: str) -> float:
+        settings = load_user_settings()
+        return settings.rate_limits.get(host, settings.default_rate_limit) * self.rate_share
+
+    def set_rate_share(self, rate_share: float):
+        """
+        Sets the share of each host's rate limit this process gets, e.g. 1 / N for one of N scraper
+        workers, so together they stay within rate_limits.
+        """
+        with self._lock:
+            self.rate_share = rate_share
+            for host, host_limiter in self._hosts.items():
+                host_limiter.max_rate = self._get_max_rate(host)
+                host_limiter.rate = min(host_limiter.rate, host_limiter.max_rate)
+
+    def get_host_limiter(self, url: str) -> HostLimiter:
+        """
+        :param url: a url, or just a host name.
+        """
+        host = get_host(url)
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(host, self._get_max_rate(host), self.shared)
+            return self._hosts[host]
+
+    def acquire(self, url: str):
+        self.get_host_limiter(url).acquire()
+
+    def wait(self, url: str):
+        """
+        Waits out backoff and the circuit breaker of a host, without counting as a request.
+        """
+        self.get_host_limiter(url).acquire(take_token=False)
+
+    def record_success(self, url: str):
+        self.get_host_limiter(url).record_success()
+
+    def record_failure(self, url: str, error: BaseException) -> float:
+        return self.get_host_limiter(url).record_failure(error)
+
+    def trip(self, url: str) -> float:
+        return self.get_host_limiter(url).trip()
+
+    @contextmanager
+    def request(self, url: str) -> Iterator[None]:
+        """
+        Waits for the host, and records how the request inside the block went.
+        """
+        host_limiter = self.get_host_limiter(url)
+        host_limiter.acquire()
+        try:
+            yield
+        except Exception as e:
+            host_limiter.record_failure(e)
+            raise
+        host_limiter.record_success()
+
+
+_rate_limiter: RateLimiter | None = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter, shared by every scraper, crawler and uploader.
+    Its backoff is shared with the other processes using the same history database.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            # Imported here, ratelimit doesn't open the history database until it's used.
+            from history.host_states import HostStateHandler
+
+            _rate_limiter = RateLimiter(HostStateHandler())
+        return _rate_limiter
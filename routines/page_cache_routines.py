@@ -0,0 +1,49 @@
+import logging
+import time
+
+from exceptions.exceptions import ScraperError
+from history import HistoryHandler, PageCache
+from models.history_models import PageReparseReport
+from models.uploader_models import AvailableSources
+from ratelimit.rate_limiter import get_host
+from scrapers.elivros_parser import ELivrosParser
+
+# Parser of the book pages of each source, given a page as fetched.
+PAGE_PARSERS = {
+    AvailableSources.elivros: ELivrosParser,
+}
+
+
+def reparse_cached_pages(update_history: bool = False) -> PageReparseReport:
+    """
+    Parses every page in the page cache again, without touching the network, e.g. after a parser fix.
+    :param update_history: replaces the metadata of entries downloaded from each page, if not uploaded yet.
+    """
+    page_cache = PageCache()
+    history = HistoryHandler()
+    parsers = {source.value: parser() for source, parser in PAGE_PARSERS.items()}
+    report = PageReparseReport()
+    start_time = time.perf_counter()
+
+    for url, page in page_cache.iter_pages():
+        report.pages += 1
+        parser = parsers.get(get_host(url))
+        if parser is None:
+            report.skipped += 1
+            continue
+
+        try:
+            metadata = parser.parse_book_page(page)
+        except ScraperError as e:
+            logging.error(f"Could not parse cached page {url}: {e}")
+            report.failed += 1
+            continue
+
+        report.parsed += 1
+        if update_history:
+            report.updated += history.update_metadata(url, metadata)
+
+    logging.info(
+        f"Parsed {report.parsed} of {report.pages} cached pages in {time.perf_counter() - start_time:.1f} seconds."
+    )
+    return report
@@ -1,65 +1,341 @@
 import logging
 import os
-import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
 
 from selenium.common import WebDriverException
 
-from config.driver_config import driver_setup
-from exceptions.exceptions import ScraperError
-from history import HistoryHandler
-from scrapers import ELivrosDownloader
+from config.data_config import load_user_settings
+from config.driver_config import DriverManager
+from exceptions.exceptions import (
+    ScraperError,
+    ScraperEngineError,
+    ScraperDuplicateError,
+    ScraperLimitError,
+    ScraperUnavailableError,
+)
+from history import HistoryHandler, LeaseHandler
+from models.scraper_models import PendingBook
+from models.frontier_models import FrontierKinds
+from models.settings_models import ScraperEngines, ScraperModes
+from scrapers import ELivrosCrawler, ELivrosDownloader, ELivrosHTTPDownloader
 
+ELIVROS_HOST = "elivros.love"
 
-def elivros_downloader(max_downloads_num: int = 0):
+
+def _reached_max_downloads(
+    history: HistoryHandler, max_downloads_num: int | None, leases: LeaseHandler | None = None
+) -> bool:
     """
-    A pre-made script that runs the ELivrosDownloader with default configs and automatically handles errors.
+    :param leases: when given, books other scraper processes (and this one) are downloading count
+    towards the limit too.
     """
-    scraper = ELivrosDownloader()
+    max_downloads = max_downloads_num
+    if max_downloads is None:
+        max_downloads = load_user_settings().max_downloads
+
+    if max_downloads > 0:
+        uploadable_entries = history.get_num_uploadable_entries()
+        if leases is not None:
+            uploadable_entries += leases.count_active()
+        if uploadable_entries >= max_downloads:
+            logging.info(f"Reached max downloads number ({max_downloads}).")
+            print(f"Reached max downloads number ({max_downloads}).")
+            return True
+
+    return False
+
+
+def elivros_http_downloader(
+    max_downloads_num: int | None = None, on_book_done: Callable[[int], None] | None = None
+) -> bool:
+    """
+    Runs the ELivrosHTTPDownloader, which doesn't need a browser, and automatically handles errors.
+    Keeps up to max_concurrent_books books downloading at once, the next book is fetched while the
+    files of the previous ones are still coming in.
+    :param on_book_done: called with the number of files each finished book added to history.
+    :return: false if the HTTP engine can't handle elivros pages and a browser is needed.
+    """
+    scraper = ELivrosHTTPDownloader()
+    scraper.max_downloads = max_downloads_num
     history = HistoryHandler()
-    driver = driver_setup()
+    pending_books: deque[PendingBook] = deque()
+
+    try:
+        while True:
+            try:
+                # Books already downloading hold a lease, so they're part of the count.
+                can_start = len(pending_books) < load_user_settings().max_concurrent_books
+                if can_start and not _reached_max_downloads(history, max_downloads_num, scraper.leases):
+                    pending_books.append(scraper.start_download())
+                    continue
+
+                if len(pending_books) == 0:
+                    return True
+
+                pending = pending_books.popleft()
+                successful_attempts = scraper.finish_download(pending)
+                print(
+                    f"Added {successful_attempts} files from {pending.url} to history "
+                    f"after {scraper.elapsed_time:.1f} seconds."
+                )
+                if on_book_done is not None:
+                    on_book_done(successful_attempts)
+
+            except ScraperEngineError as e:
+                logging.error(f"HTTP scraper engine can't handle elivros: {e}")
+                return False
+
+            except ScraperLimitError:
+                # Another process took the last download, the limit check now finishes what's pending.
+                continue
+
+            except ScraperError as e:
+                # A single book failed, e.g. none of its files could be downloaded. Failed requests
+                # already count towards elivros' backoff.
+                print(e)
+
+            except KeyboardInterrupt:
+                return True
+
+            except BaseException as e:
+                print(e)
 
-    tries = 0
+    finally:
+        # Queued files of unfinished books are cancelled, files already downloading are let finish.
+        scraper.close()
+        for pending in pending_books:
+            pending.job.cleanup()
+            scraper.release(pending)
 
-    while True:
 
-        if max_downloads_num > 0:
-            uploadable_entries = history.get_num_uploadable_entries()
-            if uploadable_entries >= max_downloads_num:
-                logging.info(f"Reached max downloads number ({max_downloads_num}).")
-                print(f"Reached max downloads number ({max_downloads_num}).")
+def _report_registration(registration: Future, on_book_done: Callable[[int], None]):
+    def report(future: Future):
+        if future.exception() is None:
+            on_book_done(future.result())
+
+    registration.add_done_callback(report)
+
+
+class _CrawlerBooks:
+    """
+    Downloads the book pages found by the crawler, with the scraper engine set in settings.
+    The HTTP engine falls back to Selenium for the rest of the crawl once it can't handle a book page,
+    Chrome is only started then.
+    """
+
+    def __init__(
+        self,
+        http_scraper: ELivrosHTTPDownloader,
+        max_downloads_num: int | None,
+        on_book_done: Callable[[int], None] | None,
+    ):
+        self.http_scraper = http_scraper
+        self.max_downloads_num = max_downloads_num
+        self.on_book_done = on_book_done
+        self.engine = load_user_settings().scraper_engine
+        self.selenium_scraper: ELivrosDownloader | None = None
+        self.drivers: DriverManager | None = None
+
+    def download(self, url: str):
+        """
+        throws ScraperError, WebDriverException
+        """
+        if self.engine == ScraperEngines.http:
+            successful_attempts = self.http_scraper.finish_download(self.http_scraper.start_download(url))
+            print(f"Added {successful_attempts} files from {url} to history.")
+            if self.on_book_done is not None:
+                self.on_book_done(successful_attempts)
+            return
+
+        if self.selenium_scraper is None:
+            self.selenium_scraper = ELivrosDownloader()
+            self.selenium_scraper.max_downloads = self.max_downloads_num
+            self.drivers = DriverManager(download_events=True)
+
+        self.selenium_scraper.make_download(self.drivers.get(), url)
+        if self.on_book_done is not None:
+            _report_registration(self.selenium_scraper.last_registration, self.on_book_done)
+
+    def fall_back(self, error: ScraperEngineError):
+        logging.error(f"HTTP scraper engine can't handle elivros: {error}")
+        print("Falling back to the Selenium scraper for book pages.")
+        self.engine = ScraperEngines.selenium
+
+    def restart_browser(self, reason: str):
+        if self.drivers is not None:
+            self.drivers.restart(reason)
+
+    def close(self):
+        if self.drivers is not None:
+            self.drivers.quit()
+        if self.selenium_scraper is not None:
+            # Waits for the files of the last books to be added to history.
+            self.selenium_scraper.close()
+
+
+def elivros_crawler(
+    max_downloads_num: int | None = None, on_book_done: Callable[[int], None] | None = None
+):
+    """
+    Walks the elivros catalog through the frontier table, downloading every book found.
+    Stopping and starting again resumes the same crawl, several processes can crawl it at once.
+    Listings are plain pages, they're always fetched over HTTP, books are downloaded with the engine set in
+    settings, see _CrawlerBooks.
+    :param on_book_done: called with the number of files each finished book added to history.
+    """
+    scraper = ELivrosHTTPDownloader()
+    scraper.max_downloads = max_downloads_num
+    crawler = ELivrosCrawler(scraper.session)
+    frontier = crawler.frontier
+    history = HistoryHandler()
+    books = _CrawlerBooks(scraper, max_downloads_num, on_book_done)
+
+    # Pages and books left in progress by crawls that were stopped go back to the queue.
+    scraper.leases.release_dead_owners()
+    crawler.seed()
+
+    try:
+        while True:
+            if _reached_max_downloads(history, max_downloads_num, scraper.leases):
+                return
+
+            entry = frontier.claim()
+            if entry is None:
+                print("Finished crawling the elivros catalog.")
+                return
+
+            try:
+                if entry.kind == FrontierKinds.listing:
+                    crawler.crawl_listing(entry)
+                else:
+                    books.download(entry.url)
+                frontier.complete(entry)
+
+            except ScraperDuplicateError:
+                frontier.complete(entry)
+
+            except ScraperLimitError:
+                frontier.release(entry)
+
+            except ScraperEngineError as e:
+                # The page is fine, the engine isn't. It's tried again with Selenium.
+                frontier.release(entry)
+                books.fall_back(e)
+
+            except ScraperUnavailableError:
+                # Neither is the page to blame when the download service is down.
+                frontier.release(entry)
+                cooldown = scraper.rate_limiter.trip(ELIVROS_HOST)
+                print(f"Elivros download service is currently down. Waiting {cooldown:.0f} seconds...")
+
+            except ScraperError as e:
+                frontier.fail(entry, str(e))
+
+            except WebDriverException as e:
+                frontier.release(entry)
+                books.restart_browser(f"WebDriverException: {e.msg}")
+
+            except KeyboardInterrupt:
+                frontier.release(entry)
+                return
+
+            except Exception as e:
+                # A single page never ends the crawl, nor stays claimed.
+                logging.error(f"Unexpected error while crawling {entry.url}: {e}", exc_info=True)
+                frontier.fail(entry, str(e))
+
+    finally:
+        print(f"Crawl frontier: {frontier.counts()}")
+        books.close()
+        scraper.close()
+
+
+def elivros_selenium_downloader(
+    max_downloads_num: int | None = None, on_book_done: Callable[[int], None] | None = None
+):
+    """
+    Runs the ELivrosDownloader, which drives a Chrome instance, and automatically handles errors.
+    :param on_book_done: called with the number of files each finished book added to history.
+    """
+    scraper = ELivrosDownloader()
+    scraper.max_downloads = max_downloads_num
+    history = HistoryHandler()
+    # Replaces Chrome once it's too old or too big, instead of every 20 tries.
+    # Downloads are followed through the events in the performance log.
+    drivers = DriverManager(download_events=True)
+
+    try:
+        while True:
+            if _reached_max_downloads(history, max_downloads_num, scraper.leases):
                 break
 
-        # Restart chrome driver every 20 attempts
-        if tries > 0 and tries % 20 == 0:
-            driver = driver_setup()
-            scraper = ELivrosDownloader()
-            history = HistoryHandler()
-            tries = 0
-            continue
-
-        try:
-            tries += 1
-            scraper.make_download(driver)
-
-        except WebDriverException as e:
-            scraper = ELivrosDownloader()
-            driver = driver_setup()
-            continue
-
-        except ScraperError as e:
-            e_str = str(e)
-            if e_str == "No downloads where started.":
+            try:
+                scraper.make_download(drivers.get())
+                if on_book_done is not None:
+                    # Files are added to history in background, the count is known once they're in.
+                    _report_registration(scraper.last_registration, on_book_done)
+
+            except WebDriverException as e:
+                drivers.restart(f"WebDriverException: {e.msg}")
+                scraper.close()
+                scraper = ELivrosDownloader()
+                scraper.max_downloads = max_downloads_num
+                continue
+
+            except ScraperLimitError:
+                continue
+
+            except ScraperUnavailableError:
+                cooldown = scraper.rate_limiter.trip(ELIVROS_HOST)
                 print(
-                    "Elivros download service is currently down. Waiting 900 seconds..."
+                    f"Elivros download service is currently down. Waiting {cooldown:.0f} seconds..."
                 )
-                driver.quit()
-                time.sleep(900)
+                # A fresh browser is started once the service is given another try.
+                drivers.quit()
+                scraper.close()
+                scraper.rate_limiter.wait(ELIVROS_HOST)
                 scraper = ELivrosDownloader()
-                driver = driver_setup()
+                scraper.max_downloads = max_downloads_num
+                continue
+
+            except ScraperError:
+                # A single book failed, the spinner already showed why.
                 continue
 
-        except KeyboardInterrupt:
-            break
+            except KeyboardInterrupt:
+                break
+
+            except BaseException as e:
+                print(e)
+
+    finally:
+        drivers.quit()
+        # Waits for the files of the last books to be added to history.
+        scraper.close()
+
+
+def elivros_downloader(
+    max_downloads_num: int | None = None, on_book_done: Callable[[int], None] | None = None
+):
+    """
+    A pre-made script that runs the elivros scraper with default configs and automatically handles errors.
+    Uses the mode and engine set in settings. The HTTP engine falls back to Selenium if it can't handle
+    the site.
+    :param max_downloads_num: overrides max_downloads from settings. when omitted, changes to the setting
+    are picked up while running.
+    :param on_book_done: called with the number of files each finished book added to history.
+    """
+    settings = load_user_settings()
+    if settings.scraper_mode == ScraperModes.crawl:
+        elivros_crawler(max_downloads_num, on_book_done)
+        return
+
+    if settings.scraper_engine == ScraperEngines.http:
+        if elivros_http_downloader(max_downloads_num, on_book_done):
+            return
+
+        print("Falling back to the Selenium scraper.")
 
-        except BaseException as e:
-            print(e)
+    elivros_selenium_downloader(max_downloads_num, on_book_done)
@@ -0,0 +1,183 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+from selenium.common import WebDriverException
+
+from config.data_config import load_user_settings
+from config.driver_config import DriverManager
+from exceptions.exceptions import (
+    ScraperError,
+    ScraperEngineError,
+    ScraperDuplicateError,
+    ScraperLimitError,
+    ScraperUnavailableError,
+)
+from history import HistoryHandler, LeaseHandler
+from history.leases import get_owner_id
+from models.settings_models import ScraperEngines
+from models.uploader_models import AvailableSources
+from scrapers import SOURCE_SCRAPERS, BaseScraper
+
+
+class ScraperScheduler:
+    """
+    Scrapes several sources at once, each with its own number of scrapers (source_concurrency) and
+    its own share of the upload queue (source_quotas).
+    Every scraper runs in a thread of its own and shares history with the others, so a book found
+    by two sources, or two scrapers of the same source, is only downloaded once.
+    Scrapers use the engine set in scraper_engine, see SOURCE_SCRAPERS. Those that need a browser get
+    their own Chrome instance.
+    """
+
+    def __init__(self, sources: list[AvailableSources] | None = None, max_downloads_num: int | None = None):
+        self.sources = sources if sources is not None else list(SOURCE_SCRAPERS)
+        self.max_downloads_num = max_downloads_num
+        self.history = HistoryHandler()
+        self.books = Counter()
+        self.files = Counter()
+        # Books being scraped for each source, they count towards its quota.
+        self._in_flight = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _get_concurrency(source: AvailableSources) -> int:
+        return load_user_settings().source_concurrency.get(source.value, 1)
+
+    def _reserve(self, source: AvailableSources) -> bool:
+        """
+        Counts a book towards the source's quota before it's scraped. Quotas are in books.
+        :return: false if the source reached its quota.
+        """
+        quota = load_user_settings().source_quotas.get(source.value, 0)
+        with self._lock:
+            if quota > 0:
+                # Both in books, a history entry is one file of a book.
+                pending = self.history.get_num_uploadable_books(source)
+                if pending + self._in_flight[source] >= quota:
+                    return False
+            self._in_flight[source] += 1
+            return True
+
+    def _unreserve(self, source: AvailableSources, files: int | None = None):
+        with self._lock:
+            self._in_flight[source] -= 1
+            if files is not None:
+                self.books[source] += 1
+                self.files[source] += files
+
+    def _unreserve_when_registered(self, source: AvailableSources, registration: Future):
+        # The book stays in flight until its files are in history, or the quota could be overshot meanwhile.
+        def unreserve(future: Future):
+            self._unreserve(source, future.result() if future.exception() is None else None)
+
+        registration.add_done_callback(unreserve)
+
+    def _build_scraper(self, source: AvailableSources, name: str, engine: ScraperEngines) -> BaseScraper:
+        scrapers = SOURCE_SCRAPERS[source]
+        # Sources without a scraper for this engine run the one they have.
+        scraper = scrapers.get(engine, next(iter(scrapers.values())))()
+        scraper.max_downloads = self.max_downloads_num
+        # Each thread holds its own leases, or they could claim the same book.
+        scraper.leases = LeaseHandler(get_owner_id(worker=name))
+        return scraper
+
+    def _run_scraper(self, source: AvailableSources, name: str):
+        engine = load_user_settings().scraper_engine
+        scraper = self._build_scraper(source, name, engine)
+        drivers: DriverManager | None = None
+        try:
+            while not self._stop.is_set():
+                if not self._reserve(source):
+                    print(f"{source.value} reached its quota.")
+                    return
+
+                files = None
+                scraper.last_registration = None
+                try:
+                    if scraper.needs_browser:
+                        if drivers is None:
+                            drivers = DriverManager(download_events=True)
+                        scraper.use_driver(drivers.get())
+                    files = scraper.scrape_book()
+                    print(f"[{name}] Downloaded {files} files of {scraper.metadata.title}.")
+
+                except ScraperDuplicateError:
+                    continue
+
+                except ScraperLimitError:
+                    # The limit is shared by every source, so they all stop.
+                    print("Reached max downloads number.")
+                    self._stop.set()
+
+                except ScraperEngineError as e:
+                    if engine == ScraperEngines.selenium or ScraperEngines.selenium not in SOURCE_SCRAPERS[source]:
+                        logging.error(f"Scraper {name} can't handle {source.value}: {e}")
+                        return
+
+                    logging.error(f"Scraper {name} can't handle {source.value}, falling back to Selenium: {e}")
+                    scraper.close()
+                    engine = ScraperEngines.selenium
+                    scraper = self._build_scraper(source, name, engine)
+
+                except ScraperUnavailableError:
+                    # The next request to the source waits until it's given another try.
+                    scraper.rate_limiter.trip(source.value)
+
+                except ScraperError as e:
+                    # Only this book failed.
+                    logging.error(f"Scraper {name} failed: {e}")
+
+                except WebDriverException as e:
+                    if drivers is not None:
+                        drivers.restart(f"WebDriverException: {e.msg}")
+
+                except Exception as e:
+                    logging.error(f"Scraper {name} failed: {e}", exc_info=True)
+
+                finally:
+                    if files is not None and scraper.last_registration is not None:
+                        self._unreserve_when_registered(source, scraper.last_registration)
+                    else:
+                        self._unreserve(source, files)
+        finally:
+            if drivers is not None:
+                drivers.quit()
+            scraper.close()
+
+    def _start_scrapers(self) -> list[threading.Thread]:
+        threads = []
+        for source in self.sources:
+            for index in range(self._get_concurrency(source)):
+                name = f"{source.name}-{index}"
+                thread = threading.Thread(target=self._run_scraper, args=(source, name), name=name, daemon=True)
+                thread.start()
+                threads.append(thread)
+        return threads
+
+    def run(self):
+        # Books left leased by scrapers that were stopped are free again.
+        LeaseHandler().release_dead_owners()
+        threads = self._start_scrapers()
+        try:
+            for thread in threads:
+                # Joined with a timeout, so CTRL + C isn't held back.
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            print("Stopping scrapers after their current book...")
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        for source in self.sources:
+            print(f"{source.value}: added {self.files[source]} files from {self.books[source]} books.")
+
+
+def multi_source_downloader(max_downloads_num: int | None = None):
+    """
+    Scrapes every available source at once, see ScraperScheduler.
+    """
+    ScraperScheduler(max_downloads_num=max_downloads_num).run()
@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import queue
+import time
+from multiprocessing.process import BaseProcess
+
+from dotenv import load_dotenv
+
+from config import logging_setup
+from history import LeaseHandler
+from history.leases import get_owner_id
+
+# Times in a row a worker may crash before its slot is given up.
+MAX_WORKER_RESTARTS = 5
+# Seconds workers get to finish their current book after CTRL + C.
+WORKER_STOP_TIMEOUT = 60
+
+
+def _run_worker(
+    progress: multiprocessing.Queue, slot: int, max_downloads_num: int | None, rate_share: float
+):
+    load_dotenv()
+    logging_setup()
+    # Imported in the worker, spawned processes start from a clean interpreter.
+    from ratelimit import get_rate_limiter
+    from routines.scraper_routines import elivros_downloader
+
+    # Workers split each host's rate limit, backoff is shared through the history database.
+    get_rate_limiter().set_rate_share(rate_share)
+    elivros_downloader(max_downloads_num, lambda added: progress.put((slot, added)))
+
+
+class ScraperWorkerPool:
+    """
+    Runs several scraper processes sharing the same history database.
+    Workers coordinate through leases in the database, so no book is downloaded twice and max downloads
+    holds across all of them. Each book is downloaded into its own job directory, workers never touch
+    each other's files.
+    """
+
+    def __init__(self, workers_num: int, max_downloads_num: int | None = None):
+        self.workers_num = workers_num
+        self.max_downloads_num = max_downloads_num
+        # Spawn instead of fork, so workers don't inherit database connections or threads.
+        self._context = multiprocessing.get_context("spawn")
+        self._progress = self._context.Queue()
+        self._workers: dict[int, BaseProcess] = {}
+        self._restarts: dict[int, int] = {}
+        self.books = 0
+        self.files = 0
+
+    def _start_worker(self, slot: int):
+        worker = self._context.Process(
+            target=_run_worker,
+            args=(self._progress, slot, self.max_downloads_num, 1 / self.workers_num),
+            name=f"spp-scraper-{slot}",
+        )
+        worker.start()
+        self._workers[slot] = worker
+        logging.info(f"Started scraper worker {slot} with pid {worker.pid}.")
+
+    @staticmethod
+    def _release_worker(worker: BaseProcess):
+        # Whatever a stopped worker held would otherwise only be freed when its leases expire.
+        released = LeaseHandler().release_owner(get_owner_id(worker.pid))
+        if released > 0:
+            logging.info(f"Released {released} leases and claims of worker {worker.name}.")
+
+    def _read_progress(self, timeout: float):
+        try:
+            slot, added = self._progress.get(timeout=timeout)
+        except queue.Empty:
+            return
+
+        # A worker that gets books done isn't crashing in a loop anymore.
+        self._restarts[slot] = 0
+        self.books += 1
+        self.files += added
+        print(f"Workers added {self.files} files from {self.books} books to history.")
+
+    def _check_workers(self):
+        for slot, worker in list(self._workers.items()):
+            if worker.is_alive():
+                continue
+
+            worker.join()
+            self._release_worker(worker)
+            del self._workers[slot]
+            if worker.exitcode == 0:
+                logging.info(f"Scraper worker {slot} finished.")
+                continue
+
+            restarts = self._restarts.get(slot, 0) + 1
+            self._restarts[slot] = restarts
+            logging.error(f"Scraper worker {slot} stopped with exit code {worker.exitcode}.")
+            if restarts > MAX_WORKER_RESTARTS:
+                print(f"Scraper worker {slot} keeps crashing, not restarting it. Check logs for more info.")
+                continue
+
+            print(f"Scraper worker {slot} crashed, restarting it.")
+            self._start_worker(slot)
+
+    def _stop(self):
+        # Workers get CTRL + C from the terminal as well, and stop after their current book.
+        # They all stop at once, so they share the same deadline.
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for worker in self._workers.values():
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+        for worker in self._workers.values():
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+            self._release_worker(worker)
+
+        self._workers = {}
+
+    def run(self):
+        # Also migrates the database before workers open it.
+        LeaseHandler().release_dead_owners()
+        for slot in range(self.workers_num):
+            self._start_worker(slot)
+
+        try:
+            while len(self._workers) > 0:
+                self._read_progress(timeout=1)
+                self._check_workers()
+
+            # Books finished right before the last worker stopped.
+            while not self._progress.empty():
+                self._read_progress(timeout=0)
+
+        except KeyboardInterrupt:
+            print("Stopping scraper workers...")
+            self._stop()
+
+        print(f"Workers added {self.files} files from {self.books} books to history.")
+
+
+def elivros_worker_pool(workers_num: int, max_downloads_num: int | None = None):
+    """
+    Runs workers_num elivros scrapers at once, see ScraperWorkerPool.
+    A single worker runs in this process.
+    """
+    if workers_num <= 1:
+        from routines.scraper_routines import elivros_downloader
+
+        elivros_downloader(max_downloads_num)
+        return
+
+    ScraperWorkerPool(workers_num, max_downloads_num).run()
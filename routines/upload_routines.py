@@ -1,9 +1,10 @@
 from sqlite3 import OperationalError
 import time
 
-from config.driver_config import driver_setup
+from config.driver_config import DriverManager
 from exceptions.exceptions import UploaderFileError
 from history.history import HistoryHandler
+from ratelimit import get_rate_limiter
 from upload import LibgenUploadHandler
 
 from selenium.common import WebDriverException
@@ -12,7 +13,7 @@ from selenium.common import WebDriverException
 def libgen_uploader():
     uploader = LibgenUploadHandler()
     history = HistoryHandler()
-    driver = driver_setup()
+    rate_limiter = get_rate_limiter()
 
     uploadable_count = history.get_num_uploadable_entries()
 
@@ -22,21 +23,27 @@ def libgen_uploader():
     else:
         print(f"Found {uploadable_count} entries ready for upload.")
 
-    while True:
-
-        try:
-            uploader.start_uploading(driver)
-
-        except UploaderFileError as e:
-            e_str = str(e)
-            if e_str.find("No uploadable entries") != -1:
-                break
-
-        except WebDriverException as e:
-            driver = driver_setup()
-            uploader = LibgenUploadHandler()
-            continue
-
-        except Exception as e:
-            print(e)
-            continue
+    # Chrome is only started once there's something to upload.
+    with DriverManager() as drivers:
+        while True:
+
+            try:
+                uploader.start_uploading(drivers)
+
+            except UploaderFileError as e:
+                e_str = str(e)
+                if e_str.find("No uploadable entries") != -1:
+                    break
+
+            except WebDriverException as e:
+                rate_limiter.record_failure(uploader.scitech_upload, e)
+                drivers.restart(f"WebDriverException: {e.msg}")
+                uploader = LibgenUploadHandler()
+                continue
+
+            except Exception as e:
+                print(e)
+                # Backs off instead of retrying right away, longer every time it fails in a row.
+                rate_limiter.record_failure(uploader.scitech_upload, e)
+                rate_limiter.wait(uploader.scitech_upload)
+                continue
@@ -1 +1,16 @@
+from models.settings_models import ScraperEngines
+from models.uploader_models import AvailableSources
+from .base import BaseScraper
 from .elivros_scraper import ELivrosDownloader
+from .elivros_http_scraper import ELivrosHTTPDownloader
+from .elivros_crawler import ELivrosCrawler
+
+# The scrapers the scheduler runs for each source, by engine. The scheduler picks the one of scraper_engine,
+# and falls back to Selenium when the HTTP one can't handle the source.
+# A new source only needs a BaseScraper and an entry here.
+SOURCE_SCRAPERS: dict[AvailableSources, dict[ScraperEngines, type[BaseScraper]]] = {
+    AvailableSources.elivros: {
+        ScraperEngines.http: ELivrosHTTPDownloader,
+        ScraperEngines.selenium: ELivrosDownloader,
+    },
+}
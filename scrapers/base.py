@@ -1,3 +1,154 @@
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable
 
+from config.data_config import load_user_settings
+from exceptions.exceptions import ScraperError, ScraperDownloadError, ScraperDuplicateError
+from history import HistoryHandler, PageCache
+from history.leases import LeaseHandler
+from models.scraper_models import ScrapedBook
+from models.uploader_models import AvailableSources, LibgenMetadata
+from ratelimit import get_rate_limiter
+from scrapers.download_job import claim_book
 
 
+class BaseScraper(ABC):
+    """
+    A source of books. Every book goes through discover, fetch_metadata, fetch_files and register,
+    scrape_book runs them in order and takes care of deduplication against history and of leases, so
+    sources only implement the steps.
+    Instances aren't thread-safe, use one per thread.
+    """
+
+    source: AvailableSources
+    # Scrapers that drive a browser are handed one before each book, see use_driver.
+    needs_browser = False
+
+    def __init__(self):
+        self.settings = load_user_settings()
+        self.download_path = self.settings.downloads_path
+        self.history_service = HistoryHandler()
+        self.leases = LeaseHandler()
+        self.rate_limiter = get_rate_limiter()
+        # Book pages are kept, so their metadata can be parsed again without fetching them.
+        self.page_cache = PageCache()
+        # Overrides max_downloads from settings, see claim_book.
+        self.max_downloads: int | None = None
+        self.metadata: LibgenMetadata | None = None
+        self.downloaded_filepaths: list[str] = []
+        self.elapsed_time: float | None = None
+        # Set by scrapers that add files to history in background, resolves to the number of files added.
+        self.last_registration: Future | None = None
+
+    @abstractmethod
+    def discover(self) -> ScrapedBook:
+        """
+        Finds the next book to scrape. Its page may already be fetched, see ScrapedBook.page.
+        throws ScraperError
+        """
+
+    @abstractmethod
+    def fetch_metadata(self, book: ScrapedBook) -> LibgenMetadata:
+        """
+        throws ScraperError
+        """
+
+    @abstractmethod
+    def fetch_files(self, book: ScrapedBook) -> list[str]:
+        """
+        Downloads the files of a book into the downloads folder.
+        :return: paths of the downloaded files.
+        throws ScraperError
+        """
+
+    def discard(self, book: ScrapedBook):
+        """
+        Frees whatever discover kept of a book, once it's no longer needed.
+        """
+
+    def close(self):
+        """
+        Frees the scraper's resources once it's no longer used.
+        """
+
+    def use_driver(self, driver):
+        """
+        Hands a browser over to scrapers that need one, for the next book.
+        """
+
+    def claim(self, book: ScrapedBook):
+        """
+        Makes sure a book wasn't visited yet and leases it.
+        throws ScraperDuplicateError, ScraperLimitError
+        """
+        if self.history_service.is_url_seen(book.url):
+            logging.info(f"URL '{book.url}' was already visited. Skipping.")
+            raise ScraperDuplicateError("Current URL was already visited. Skipping.")
+
+        book.lease_key = claim_book(self.leases, book.url, self.max_downloads)
+
+    def release(self, book: ScrapedBook):
+        if book.lease_key is not None:
+            self.leases.release(book.lease_key)
+            book.lease_key = None
+
+    def check_duplicate(self, book: ScrapedBook):
+        """
+        throws ScraperDuplicateError if the book's metadata is already in history.
+        """
+        if self.history_service.check_duplicate(book.metadata):
+            self.history_service.mark_url_seen(book.url)
+            logging.warning(
+                f"URL '{book.url}' points to a metadata in queue or upload history. Skipping."
+            )
+            raise ScraperDuplicateError(
+                "Current URL points to a metadata in queue or upload history. Skipping."
+            )
+
+    def register(self, book: ScrapedBook, file_paths: list[str]) -> int:
+        """
+        Adds the downloaded files to history.
+        :return: number of files added.
+        """
+        successful_attempts = self.history_service.register_downloaded_files(
+            book.metadata, file_paths, book.url, book.file_hashes
+        )
+        if successful_attempts < len(file_paths):
+            logging.error(f"Failed to add some of {file_paths} to history.")
+        return successful_attempts
+
+    def scrape_book(
+        self, book: ScrapedBook | None = None, report: Callable[[str], None] | None = None
+    ) -> int:
+        """
+        Scrapes the next book, or the given one, from start to end.
+        :param report: called with a short description of each step.
+        :return: number of files added to history.
+        throws ScraperError
+        """
+        report = report or logging.debug
+        if book is None:
+            report("Looking for a book")
+            book = self.discover()
+
+        try:
+            self.claim(book)
+            report(f"Retrieving metadata from {book.url}")
+            book.metadata = self.fetch_metadata(book)
+            self.metadata = book.metadata
+            report("Checking for duplicates")
+            self.check_duplicate(book)
+
+            report("Downloading files")
+            self.downloaded_filepaths = self.fetch_files(book)
+            if len(self.downloaded_filepaths) == 0:
+                logging.error(f"Downloading failed for URL: {book.url}.")
+                raise ScraperDownloadError(f"Downloading failed for URL: {book.url}.")
+
+            report("Adding files to history")
+            return self.register(book, self.downloaded_filepaths)
+        finally:
+            # Once in history, the files count towards the download limit by themselves.
+            self.release(book)
+            self.discard(book)
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import time
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from exceptions.exceptions import ScraperUnavailableError
+from models.scraper_models import ChromeDownload
+
+# Seconds between reads of the DevTools events buffered by chromedriver.
+EVENTS_READ_INTERVAL = 0.25
+
+
+class ChromeDownloadTracker:
+    """
+    Follows Chrome downloads through DevTools download events, without leaving the current page.
+    Chrome stores each download under its GUID, the file is only given its real name once it's complete,
+    so the exact file of every download is known.
+
+    The driver must be created with download events turned on, see driver_setup.
+    """
+
+    def __init__(self, driver: WebDriver, download_path: str):
+        self.driver = driver
+        self.download_path = download_path
+        self.downloads: dict[str, ChromeDownload] = {}
+
+    def enable(self):
+        """
+        Sends downloads to download_path and turns download events on.
+        Should be called before clicking any download link.
+        """
+        self.driver.execute_cdp_cmd(
+            "Browser.setDownloadBehavior",
+            {
+                "behavior": "allowAndName",
+                "downloadPath": self.download_path,
+                "eventsEnabled": True,
+            },
+        )
+        # Drops events left over from previous pages.
+        self.driver.get_log("performance")
+        self.downloads = {}
+
+    def _handle_event(self, method: str, params: dict):
+        # Chrome reports downloads both in the Browser and the (deprecated) Page domain,
+        # chromedriver only forwards the latter to the performance log on some versions.
+        if method.endswith(".downloadWillBegin"):
+            guid = params["guid"]
+            if guid not in self.downloads:
+                self.downloads[guid] = ChromeDownload(
+                    guid=guid, url=params.get("url", ""), file_name=params.get("suggestedFilename", "")
+                )
+
+        elif method.endswith(".downloadProgress"):
+            download = self.downloads.get(params.get("guid"))
+            if download is None:
+                return
+            download.state = params.get("state", download.state)
+            download.received_bytes = int(params.get("receivedBytes", download.received_bytes))
+            download.total_bytes = int(params.get("totalBytes", download.total_bytes))
+            if download.state != "inProgress" and download.finished_at is None:
+                download.finished_at = time.monotonic()
+                logging.info(
+                    f"Chrome download of {download.file_name} ({download.url}) {download.state}: "
+                    f"{download.received_bytes} bytes."
+                )
+
+    def read_events(self):
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            self._handle_event(message.get("method", ""), message.get("params", {}))
+
+    def _finished_path(self, download: ChromeDownload) -> str:
+        # Downloads are written to a file named after their GUID, and given the suggested name here.
+        guid_path = os.path.join(self.download_path, download.guid)
+        name, extension = os.path.splitext(os.path.basename(download.file_name) or download.guid)
+        file_path = os.path.join(self.download_path, f"{name}{extension}")
+        copy_number = 1
+        while os.path.exists(file_path):
+            file_path = os.path.join(self.download_path, f"{name} ({copy_number}){extension}")
+            copy_number += 1
+
+        os.replace(guid_path, file_path)
+        return file_path
+
+    def wait(
+        self, expected_downloads: int = 1, timeout: float = 600, start_timeout: float = 10
+    ) -> list[ChromeDownload]:
+        """
+        Blocks until every started download is finished.
+        :param expected_downloads: number of links clicked. a fast download may finish before the next one
+        begins, so this many downloads are waited for, up to start_timeout.
+        :param start_timeout: seconds to wait for downloads to start.
+        :return: completed downloads, with their final file paths.
+        throws ScraperUnavailableError if no download starts
+        """
+        start_time = time.monotonic()
+        while True:
+            self.read_events()
+            elapsed_time = time.monotonic() - start_time
+            if len(self.downloads) == 0:
+                if elapsed_time > start_timeout:
+                    raise ScraperUnavailableError("No downloads were started.")
+            elif all(download.state != "inProgress" for download in self.downloads.values()) and (
+                len(self.downloads) >= expected_downloads or elapsed_time > start_timeout
+            ):
+                break
+            elif elapsed_time > timeout:
+                logging.error(f"Chrome downloads timed out after {timeout} seconds.")
+                break
+
+            time.sleep(EVENTS_READ_INTERVAL)
+
+        completed = []
+        for download in self.downloads.values():
+            if download.state != "completed":
+                logging.error(f"Chrome download of {download.url} ended as {download.state}.")
+                continue
+            try:
+                download.file_path = self._finished_path(download)
+            except OSError as e:
+                logging.error(f"Could not find Chrome download of {download.url}: {e}")
+                continue
+            completed.append(download)
+
+        return completed
@@ -0,0 +1,105 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from config.data_config import load_user_settings
+from exceptions.exceptions import ScraperDuplicateError, ScraperLimitError
+from history.leases import LeaseHandler, book_lease_key
+
+# Extensions of files browsers and the download stage are still writing to.
+PARTIAL_EXTENSIONS = (".crdownload", ".part", ".tmp")
+
+
+class DownloadJob:
+    """
+    A scratch directory under temp_downloads_path for the files of a single book.
+    Files are only moved into the downloads folder once they're complete, so jobs never see each other's
+    files, and whatever is left in the directory is removed with it.
+    Use it as a context manager, or call cleanup() when done.
+    """
+
+    def __init__(self, temp_downloads_path: str, downloads_path: str):
+        self.downloads_path = downloads_path
+        self.path = tempfile.mkdtemp(prefix="job-", dir=temp_downloads_path)
+
+    def __enter__(self) -> "DownloadJob":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+    def list_files(self) -> list[str]:
+        """
+        Complete files in this job's directory.
+        """
+        with os.scandir(self.path) as entries:
+            return [
+                entry.path
+                for entry in entries
+                if entry.is_file() and not entry.name.endswith(PARTIAL_EXTENSIONS)
+            ]
+
+    def promote(self, file_path: str) -> str:
+        """
+        Moves a finished file into the downloads folder, adding a number to its name if it's taken.
+        Hard links make the move atomic and never overwrite a file another job just promoted.
+        :return: the file's new path.
+        """
+        name, extension = os.path.splitext(os.path.basename(file_path))
+        copy_number = 0
+        while True:
+            if copy_number == 0:
+                target_path = os.path.join(self.downloads_path, f"{name}{extension}")
+            else:
+                target_path = os.path.join(self.downloads_path, f"{name} ({copy_number}){extension}")
+            copy_number += 1
+
+            try:
+                os.link(file_path, target_path)
+            except FileExistsError:
+                continue
+            except OSError:
+                # No hard links across filesystems (or on some of them), fall back to a plain move.
+                if os.path.exists(target_path):
+                    continue
+                shutil.move(file_path, target_path)
+                return target_path
+
+            os.remove(file_path)
+            return target_path
+
+    def promote_all(self, file_paths: list[str]) -> list[str]:
+        promoted = []
+        for file_path in file_paths:
+            try:
+                promoted.append(self.promote(file_path))
+            except OSError as e:
+                logging.error(f"Could not move {file_path} to the downloads folder: {e}")
+
+        return promoted
+
+    def cleanup(self):
+        # Partial downloads of a failed job go with the directory.
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def claim_book(leases: LeaseHandler, url: str, max_downloads: int | None = None) -> str:
+    """
+    Leases a book, so no other scraper process sharing the history downloads it at the same time.
+    Books being downloaded count towards max_downloads (max_downloads from settings if omitted).
+    :return: the lease key, release it once the book's files are in history.
+    throws ScraperDuplicateError, ScraperLimitError
+    """
+    if max_downloads is None:
+        max_downloads = load_user_settings().max_downloads
+
+    key = book_lease_key(url)
+    if leases.acquire(key, max_pending=max_downloads if max_downloads > 0 else None):
+        return key
+
+    if leases.is_held_by_other(key):
+        logging.info(f"URL '{url}' is being downloaded by another scraper. Skipping.")
+        raise ScraperDuplicateError("Current URL is being downloaded by another scraper. Skipping.")
+
+    raise ScraperLimitError(f"Reached max downloads number ({max_downloads}).")
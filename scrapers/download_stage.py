@@ -0,0 +1,149 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import requests
+
+from exceptions.exceptions import ScraperEngineError
+from history.file_hashing import StreamHasher
+from models.scraper_models import DownloadResult
+from ratelimit import RateLimiter, get_rate_limiter
+
+# Files are written to disk in chunks of this size, never fully buffered in memory.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Seconds to wait for a connection or for data.
+REQUEST_TIMEOUT = 30
+
+
+class DownloadStage:
+    """
+    Downloads files concurrently, streaming them to disk.
+    Concurrency is bounded both globally and per host, so several formats of several books can be
+    fetched at once without hammering a single server. Requests are also paced by the rate limiter.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        max_concurrent_downloads: int = 6,
+        max_downloads_per_host: int = 3,
+        valid_extensions: tuple[str, ...] = ("epub", "pdf", "mobi"),
+        rate_limiter: RateLimiter | None = None,
+    ):
+        self.session = session
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.max_downloads_per_host = max_downloads_per_host
+        self.valid_extensions = valid_extensions
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_downloads)
+        self._host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _get_host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_downloads_per_host
+                )
+            return self._host_semaphores[host]
+
+    def _get_file_name(self, response: requests.Response) -> str | None:
+        disposition = response.headers.get("Content-Disposition", "")
+        match = re.search(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", disposition)
+        if match:
+            file_name = unquote(match.group(1))
+        else:
+            file_name = unquote(os.path.basename(urlparse(response.url).path))
+
+        file_name = os.path.basename(file_name).strip()
+        if not file_name.endswith(self.valid_extensions):
+            return None
+
+        return file_name
+
+    def _reserve_file_path(self, download_path: str, file_name: str) -> str:
+        """
+        Picks a free path for the file and creates its partial file, so concurrent downloads of files with the
+        same name don't overwrite each other.
+        """
+        name, extension = os.path.splitext(file_name)
+        copy_number = 0
+        with self._lock:
+            while True:
+                if copy_number == 0:
+                    file_path = os.path.join(download_path, file_name)
+                else:
+                    file_path = os.path.join(download_path, f"{name} ({copy_number}){extension}")
+                copy_number += 1
+
+                if os.path.exists(file_path):
+                    continue
+                try:
+                    open(f"{file_path}.part", "xb").close()
+                except FileExistsError:
+                    continue
+                return file_path
+
+    def _download(self, url: str, download_path: str) -> DownloadResult:
+        start_time = time.monotonic()
+        result = DownloadResult(url=url)
+        partial_path = None
+        with self._get_host_semaphore(url):
+            try:
+                with self.rate_limiter.request(url):
+                    with self.session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                        response.raise_for_status()
+                        if response.headers.get("Content-Type", "").startswith("text/html"):
+                            raise ScraperEngineError(
+                                f"Direct link {url} returned a page instead of a file."
+                            )
+
+                        file_name = self._get_file_name(response)
+                        if file_name is None:
+                            result.error = "Link doesn't point to a file with a valid extension."
+                        else:
+                            file_path = self._reserve_file_path(download_path, file_name)
+                            partial_path = f"{file_path}.part"
+                            hasher = StreamHasher()
+                            with open(partial_path, "wb") as f:
+                                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                                    f.write(chunk)
+                                    hasher.update(chunk)
+                                    result.bytes += len(chunk)
+
+                if partial_path is not None:
+                    # The file only gets its final name once it's complete. Under the lock, or another
+                    # download could reserve the same name between the rename and its existence check.
+                    with self._lock:
+                        os.replace(partial_path, file_path)
+                    result.file_path = file_path
+                    result.hashes = hasher.get_hashes()
+
+            except (requests.RequestException, OSError) as e:
+                result.error = str(e)
+                if partial_path is not None and os.path.exists(partial_path):
+                    os.remove(partial_path)
+
+        result.duration = time.monotonic() - start_time
+        if result.error is not None:
+            logging.error(f"Failed to download {url}: {result.error}")
+        else:
+            logging.info(
+                f"Downloaded {url} to {result.file_path}: {result.bytes} bytes in {result.duration:.1f} seconds."
+            )
+        return result
+
+    def submit(self, url: str, download_path: str) -> Future:
+        """
+        Starts downloading url into download_path.
+        :return: future resolving to a DownloadResult. raises ScraperEngineError if the link is not a file.
+        """
+        return self._executor.submit(self._download, url, download_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,93 @@
+import logging
+import re
+from urllib.parse import urldefrag, urljoin, urlsplit, urlunsplit
+
+import requests
+from lxml import etree
+from lxml import html as lxml_html
+
+from exceptions.exceptions import ScraperError
+from history.frontier import FrontierHandler
+from models.frontier_models import FrontierEntry, FrontierKinds
+from ratelimit import get_rate_limiter
+from scrapers.download_stage import REQUEST_TIMEOUT
+
+# Book pages, e.g. /livro/baixar-livro-o-cortico-aluisio-azevedo-epub-pdf-mobi-ou-ler-online
+BOOK_PATH_RE = re.compile(r"^/livro/")
+# Category, author and tag listings, and their numbered pages.
+LISTING_PATH_RE = re.compile(r"^/(categoria|genero|autor|tag)/|/page/\d+/?$")
+
+
+class ELivrosCrawler:
+    """
+    Enumerates the elivros.love catalog, instead of sampling it through RandomBook.
+    Listing pages are visited and every book and listing they link to is added to the frontier, books are
+    then downloaded from there by the crawler routine.
+    """
+
+    def __init__(self, session: requests.Session):
+        self._base_url = "https://elivros.love/"
+        self.session = session
+        self.frontier = FrontierHandler()
+        self.rate_limiter = get_rate_limiter()
+
+    def seed(self) -> int:
+        """
+        Adds the home page to the frontier. Does nothing on a crawl that already started.
+        """
+        return self.frontier.add_urls([self._base_url], FrontierKinds.listing)
+
+    def _classify(self, url: str) -> FrontierKinds | None:
+        parts = urlsplit(url)
+        if (parts.hostname or "").removeprefix("www.") != urlsplit(self._base_url).hostname:
+            return None
+        if BOOK_PATH_RE.search(parts.path):
+            return FrontierKinds.book
+        if LISTING_PATH_RE.search(parts.path):
+            return FrontierKinds.listing
+        return None
+
+    def _normalize(self, url: str) -> str:
+        # Pages are linked over http and https, with and without www. They're all queued as the same url.
+        parts = urlsplit(url)
+        base_parts = urlsplit(self._base_url)
+        return urlunsplit((base_parts.scheme, base_parts.netloc, parts.path or "/", parts.query, ""))
+
+    def extract_links(self, page: bytes, page_url: str) -> dict[FrontierKinds, set[str]]:
+        """
+        Returns the book and listing pages a page links to.
+        throws ScraperError if the page can't be parsed, e.g. an empty body.
+        """
+        links = {FrontierKinds.book: set(), FrontierKinds.listing: set()}
+        try:
+            document = lxml_html.fromstring(page)
+        except (etree.ParserError, ValueError) as e:
+            raise ScraperError(f"Could not parse {page_url}: {e}")
+        for href in document.xpath("//a/@href"):
+            url, _ = urldefrag(urljoin(page_url, href.strip()))
+            kind = self._classify(url)
+            if kind is not None:
+                links[kind].add(self._normalize(url))
+
+        return links
+
+    def crawl_listing(self, entry: FrontierEntry) -> int:
+        """
+        Visits a listing page and adds the pages it links to to the frontier.
+        :return: number of pages new to the frontier.
+        throws ScraperError
+        """
+        try:
+            with self.rate_limiter.request(entry.url):
+                response = self.session.get(entry.url, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+        except requests.RequestException as e:
+            raise ScraperError(f"Could not fetch {entry.url}: {e}")
+
+        links = self.extract_links(response.content, response.url)
+        added = sum(self.frontier.add_urls(urls, kind) for kind, urls in links.items())
+        logging.info(
+            f"Found {len(links[FrontierKinds.book])} books and {len(links[FrontierKinds.listing])} "
+            f"listings in {entry.url}, {added} of them new."
+        )
+        return added
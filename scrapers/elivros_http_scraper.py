@@ -0,0 +1,244 @@
+import logging
+from urllib.parse import urljoin
+
+import requests
+from fake_useragent import UserAgent
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from yaspin import yaspin
+
+from exceptions.exceptions import ScraperError, ScraperDownloadError, ScraperEngineError
+from models.scraper_models import DownloadResult, PendingBook, ScrapedBook
+from models.uploader_models import AvailableSources, LibgenMetadata
+from scrapers.base import BaseScraper
+from scrapers.download_job import DownloadJob
+from scrapers.download_stage import REQUEST_TIMEOUT, DownloadStage
+from scrapers.elivros_parser import ELivrosParser
+
+# RandomBook answers in a row with a client error (other than throttling) after which elivros is
+# considered to reject clients that aren't a browser.
+MAX_REJECTED_REQUESTS = 3
+
+
+class ELivrosHTTPDownloader(BaseScraper):
+    """
+    Scrapes elivros.love without a browser.
+    Book pages are plain HTML, so they're fetched and parsed directly, and files are downloaded from the
+    direct links over pooled keep-alive connections, all formats of a book at once.
+    Raises ScraperEngineError when a page can't be handled without a browser.
+    """
+
+    source = AvailableSources.elivros
+
+    def __init__(self, session: requests.Session | None = None):
+        super().__init__()
+        self._base_url = r"https://elivros.love"
+        self._rand_book_url = "http://elivros.love/page/RandomBook"
+        self.valid_extensions = ("epub", "pdf", "mobi")
+        self.parser = ELivrosParser()
+        self._rejected_requests = 0
+        self.session = session if session is not None else self._build_session(
+            self.settings.max_concurrent_downloads
+        )
+        self.download_stage = DownloadStage(
+            self.session,
+            self.settings.max_concurrent_downloads,
+            self.settings.max_downloads_per_host,
+            self.valid_extensions,
+            self.rate_limiter,
+        )
+
+    @staticmethod
+    def _build_session(max_concurrent_downloads: int) -> requests.Session:
+        session = requests.Session()
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=(502, 503, 504))
+        # Every download thread needs its own connection, or they'd wait on each other for the pool.
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=max(8, max_concurrent_downloads), max_retries=retries
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = UserAgent().random
+        return session
+
+    def navigate(self, url: str | None = None) -> requests.Response:
+        """
+        Follows the random book redirect, or goes to url, and returns the book page, with its body not yet read.
+        """
+        target_url = url or self._rand_book_url
+        try:
+            with self.rate_limiter.request(target_url):
+                # The body is only read when needed, so known books cost just the redirect.
+                response = self.session.get(target_url, stream=True, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+        except requests.HTTPError as e:
+            if url is None:
+                self._check_rejected(e.response)
+            raise ScraperError(f"Could not fetch {url or 'a random book'}: {e}")
+        except requests.RequestException as e:
+            raise ScraperError(f"Could not fetch {url or 'a random book'}: {e}")
+
+        self._rejected_requests = 0
+        return response
+
+    def _check_rejected(self, response: requests.Response):
+        """
+        throws ScraperEngineError once RandomBook keeps refusing the request, e.g. with a 403 or a bot
+        challenge, so a browser is used instead.
+        """
+        if not 400 <= response.status_code < 500 or response.status_code == 429:
+            return
+
+        self._rejected_requests += 1
+        if self._rejected_requests >= MAX_REJECTED_REQUESTS:
+            raise ScraperEngineError(
+                f"elivros rejected {self._rejected_requests} requests in a row "
+                f"with status {response.status_code}, it may only serve browsers."
+            )
+
+    def _parse_html(self, html: bytes) -> lxml_html.HtmlElement:
+        # Raw bytes let the parser pick the page's own encoding, instead of requests guessing it.
+        return self.parser.parse_document(html)
+
+    def get_book_info(self, document: lxml_html.HtmlElement) -> LibgenMetadata:
+        return self.parser.parse_book_page(document)
+
+    def _get_download_links(self, document: lxml_html.HtmlElement, page_url: str) -> list[str]:
+        links = [
+            urljoin(page_url, href)
+            for href in self.parser.get_download_links(document, self.valid_extensions)
+        ]
+
+        if len(links) == 0:
+            # Links may be built by scripts on the page, which only a browser can run.
+            raise ScraperEngineError(f"No direct download links found in {page_url}.")
+
+        return links
+
+    def discover(self, url: str | None = None) -> ScrapedBook:
+        """
+        Fetches a random book page, or the page at url. Its body is only read by fetch_metadata.
+        """
+        response = self.navigate(url)
+        return ScrapedBook(url=response.url, page=response)
+
+    def discard(self, book: ScrapedBook):
+        if book.page is not None:
+            book.page.close()
+
+    def fetch_metadata(self, book: ScrapedBook) -> LibgenMetadata:
+        page = book.page.content
+        self.page_cache.put(book.url, page)
+        book.document = self._parse_html(page)
+        return self.get_book_info(book.document)
+
+    def _queue_files(self, book: ScrapedBook) -> PendingBook:
+        download_links = self._get_download_links(book.document, book.url)
+        job = DownloadJob(self.settings.temp_downloads_path, self.download_path)
+        pending = PendingBook(url=book.url, metadata=book.metadata, lease_key=book.lease_key, job=job)
+        for url in download_links:
+            pending.downloads.append(self.download_stage.submit(url, job.path))
+
+        return pending
+
+    def _collect_files(self, pending: PendingBook) -> list[str]:
+        with pending.job:
+            results: list[DownloadResult] = [future.result() for future in pending.downloads]
+            file_paths = []
+            for result in results:
+                if result.file_path is None:
+                    continue
+                try:
+                    file_path = pending.job.promote(result.file_path)
+                except OSError as e:
+                    logging.error(f"Could not move {result.file_path} to the downloads folder: {e}")
+                    continue
+                file_paths.append(file_path)
+                # Files were hashed as they streamed in, history doesn't read them again.
+                pending.file_hashes[file_path] = result.hashes
+
+        # Files are fetched in parallel, so the book took as long as its slowest file.
+        self.elapsed_time = max((result.duration for result in results), default=0)
+
+        if len(file_paths) == 0:
+            logging.error(rf"Downloading failed for URL: {pending.url}.")
+            raise ScraperDownloadError(f"No files could be downloaded from {pending.url}.")
+
+        total_bytes = sum(result.bytes for result in results)
+        logging.info(
+            f"Downloaded {len(file_paths)} files ({total_bytes} bytes) from {pending.url} "
+            f"in {self.elapsed_time:.1f} seconds."
+        )
+        return file_paths
+
+    def fetch_files(self, book: ScrapedBook) -> list[str]:
+        pending = self._queue_files(book)
+        file_paths = self._collect_files(pending)
+        book.file_hashes = pending.file_hashes
+        return file_paths
+
+    def close(self):
+        self.download_stage.shutdown()
+
+    def start_download(self, url: str | None = None) -> PendingBook:
+        """
+        Fetches a random book, or the book at url, and queues all its files in the download stage,
+        without waiting for them, so the next book can be fetched meanwhile.
+        Same steps as scrape_book, split in two, see finish_download.
+        throws ScraperError
+        """
+        book = self.discover(url)
+        try:
+            self.claim(book)
+            book.metadata = self.fetch_metadata(book)
+            self.check_duplicate(book)
+            return self._queue_files(book)
+        except BaseException:
+            self.release(book)
+            raise
+        finally:
+            self.discard(book)
+
+    def finish_download(self, pending: PendingBook) -> int:
+        """
+        Waits for all files of a book and adds the downloaded ones to the upload queue.
+        :return: number of files added to history.
+        throws ScraperError
+        """
+        try:
+            self.metadata = pending.metadata
+            self.downloaded_filepaths = self._collect_files(pending)
+            return self.register(pending, self.downloaded_filepaths)
+        finally:
+            self.release(pending)
+
+    def make_download(self, driver=None):
+        """
+        Main method. Makes the actual downloading.
+        Accepts a driver only to keep the same interface as ELivrosDownloader, it's not used.
+
+        Automatically builds and appends an entry to upload queue.
+
+        throws ScraperError
+        """
+        with yaspin(text=f"Downloading book") as spinner:
+            spinner.write("Fetching random book")
+            pending = self.start_download()
+            spinner.write(f"Downloading {len(pending.downloads)} files from {pending.url}")
+            try:
+                successful_attempts = self.finish_download(pending)
+            except ScraperError:
+                spinner.fail("Downloading failed. Check logs for more info.")
+                raise
+
+            spinner.write(
+                f"Added {successful_attempts} of {len(self.downloaded_filepaths)} files to history "
+                f"after {self.elapsed_time:.1f} seconds."
+            )
+
+            if successful_attempts == 0:
+                spinner.fail("❌")
+                return
+
+            spinner.ok("✔")
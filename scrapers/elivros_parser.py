@@ -0,0 +1,252 @@
+import codecs
+import logging
+import re
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector, UnicodeDammit
+from lxml import etree
+from lxml import html as lxml_html
+from pydantic import ValidationError
+
+from exceptions.exceptions import ScraperError
+from models.uploader_models import ValidTopics, LibgenMetadata, AvailableSources
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath equivalents of the CSS selectors used with BeautifulSoup, compiled once.
+_INFO = etree.XPath(f"(//*[{_has_class('info')}])[1]")
+_SERIES_AUTHORS = etree.XPath(f".//*[{_has_class('SerieAut')}]/ul/li")
+_TITLE = etree.XPath("(.//h1)[1]")
+_TOPIC = etree.XPath("(//*[@id='content']/article/ul/*[2][self::li]/a)[1]")
+_DESCRIPTION = etree.XPath(
+    f"(//div[{_has_class('description')}]/div[{_has_class('sinopse')}])[1]"
+)
+_DOWNLOAD_LINK = etree.XPath(
+    f"//*[@id='bookinfo']/div[{_has_class('info')}]/div[{_has_class('downloads')}]"
+    f"/a[{_has_class('mainDirectLink')}][contains(concat(' ', normalize-space(@class), ' '), "
+    "concat(' ', $extension, ' '))]/@href"
+)
+# BeautifulSoup's get_text() leaves out comments and the text of these elements.
+_TEXT = etree.XPath(
+    "descendant-or-self::text()"
+    "[not(ancestor::script or ancestor::style or ancestor::template or ancestor::rt or ancestor::rp)]"
+)
+
+_PRESERVES_WHITESPACE = etree.XPath("boolean(ancestor-or-self::pre or ancestor-or-self::textarea)")
+# BeautifulSoup turns strings made only of these into a single newline or space.
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+_UTF8_PARSER = lxml_html.HTMLParser(encoding="UTF-8")
+
+
+def _codec_name(encoding: str) -> str | None:
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def _first(elements: list):
+    return elements[0] if elements else None
+
+
+class ELivrosParser:
+    """
+    Extracts book metadata from elivros.love book pages.
+    Shared by every elivros scraper engine, whatever way the page was fetched.
+    """
+
+    def __init__(self):
+        self.fiction_categories = [
+            "Ficção",
+            "Aventura",
+            "Romance",
+            "Contos",
+            "Infanto",
+            "Policial",
+            "Humor",
+            "Poemas",
+            "Suspense",
+        ]
+        # A single pass over the category, instead of one search per fiction category.
+        self._fiction_re = re.compile("|".join(re.escape(cat) for cat in self.fiction_categories))
+
+    def _build_metadata(
+        self,
+        authors_series_info: list[str],
+        title: str | None,
+        topic_text: str | None,
+        description: str | None,
+    ) -> LibgenMetadata:
+        """
+        Builds metadata from the texts of a book page, however they were extracted.
+        :param authors_series_info: texts of the .SerieAut list items, in order.
+        """
+        if title is None or topic_text is None or description is None:
+            raise ScraperError("Book page is missing its title, category or description.")
+
+        series = None
+        authors = None
+        pages = None
+        if len(authors_series_info) == 1:
+            authors = authors_series_info[0]
+        elif len(authors_series_info) == 2:
+            authors = authors_series_info[0]
+            pages = authors_series_info[1]
+        elif len(authors_series_info) > 2:
+            first_el_text = authors_series_info[0]
+            if first_el_text.count("Vol:") == 0:
+                logging.error("Tried to add non-series value to series field.")
+                logging.error(f"Invalid value: {first_el_text}, other values:")
+                logging.error(
+                    f"Authors: {authors_series_info[1]}, Pages: {authors_series_info[2]}"
+                )
+                logging.error(f"Number of elements: {len(authors_series_info)}")
+                series = None
+            else:
+                series = authors_series_info[0]
+
+            authors = authors_series_info[1]
+            pages = authors_series_info[2]
+
+        # By default, a book is considered non-fiction.
+        topic = ValidTopics.scitech
+
+        # If the category contains any of self.fiction_categories, then it's fiction.
+        if self._fiction_re.search(topic_text):
+            topic = ValidTopics.fiction
+
+        if pages is not None:
+            pages_text = re.sub("Páginas", "", pages)
+            try:
+                pages_text = int(pages_text)
+            except (TypeError, ValueError):
+                logging.error("Tried to convert invalid element to page int.")
+                logging.error("Elements are:")
+                logging.error(
+                    f"Title is: {title}, "
+                    f"authors is: {authors}, "
+                    f"pages is: {pages}, "
+                    f"series is: {series}, "
+                    f"and number of elements is {len(authors_series_info)}"
+                )
+                raise ScraperError(
+                    "Invalid order for elements. Page element is not int. "
+                    "Check logs for more info."
+                )
+        else:
+            pages_text = None
+
+        try:
+            metadata = LibgenMetadata(
+                title=title,
+                authors=authors,
+                language="Portuguese",
+                series=series,
+                description=description,
+                pages=pages_text,
+                topic=topic,
+                source=AvailableSources.elivros,
+            )
+        except ValidationError as e:
+            logging.error(e, exc_info=True)
+            raise ScraperError(e)
+
+        return metadata
+
+    @staticmethod
+    def _soup_text(el) -> str | None:
+        return el.get_text() if el is not None else None
+
+    def get_book_info(self, soup: BeautifulSoup) -> LibgenMetadata:
+        """
+        Extracts metadata from a BeautifulSoup tree. Slower than parse_book_page, kept as its reference.
+        """
+        book_info_div = soup.select_one(".info")
+        if book_info_div is None:
+            logging.error("Book page has no .info element.")
+            raise ScraperError("Book page has no .info element.")
+
+        return self._build_metadata(
+            [el.get_text() for el in book_info_div.select(".SerieAut > ul > li")],
+            self._soup_text(book_info_div.select_one("h1")),
+            self._soup_text(soup.select_one("#content > article > ul > li:nth-child(2) > a")),
+            self._soup_text(soup.select_one("div.description > div.sinopse")),
+        )
+
+    @staticmethod
+    def parse_document(page: bytes | str) -> lxml_html.HtmlElement:
+        """
+        Parses a page with lxml, decoding it the same way BeautifulSoup would.
+        throws ScraperError if the page can't be parsed, e.g. an empty body.
+        """
+        if isinstance(page, bytes):
+            try:
+                page.decode("UTF-8")
+            except UnicodeDecodeError:
+                # Not UTF-8, let bs4 find the encoding, as the reference path does.
+                page = UnicodeDammit(page, is_html=True).unicode_markup
+            else:
+                declared_encoding = EncodingDetector.find_declared_encoding(page, is_html=True)
+                if declared_encoding is not None and _codec_name(declared_encoding) != "utf-8":
+                    page = UnicodeDammit(page, is_html=True).unicode_markup
+
+        if isinstance(page, str):
+            page = page.encode("UTF-8")
+
+        try:
+            return lxml_html.document_fromstring(page, parser=_UTF8_PARSER)
+        except (etree.ParserError, ValueError) as e:
+            raise ScraperError(f"Could not parse page: {e}")
+
+    @staticmethod
+    def _normalize_string(string) -> str:
+        if string.strip(_ASCII_SPACES):
+            return string
+
+        container = string.getparent()
+        if string.is_tail:
+            container = container.getparent()
+        if container is not None and _PRESERVES_WHITESPACE(container):
+            return string
+
+        return "\n" if "\n" in string else " "
+
+    def _text(self, el: lxml_html.HtmlElement | None) -> str | None:
+        # Same result as BeautifulSoup's get_text() on the same element.
+        if el is None:
+            return None
+        return "".join(self._normalize_string(string) for string in _TEXT(el))
+
+    def parse_book_page(self, page: bytes | str | lxml_html.HtmlElement) -> LibgenMetadata:
+        """
+        Extracts metadata straight from the page html, or a document from parse_document.
+        Produces the same metadata as get_book_info, several times faster.
+        """
+        document = page if isinstance(page, lxml_html.HtmlElement) else self.parse_document(page)
+        book_info_div = _first(_INFO(document))
+        if book_info_div is None:
+            logging.error("Book page has no .info element.")
+            raise ScraperError("Book page has no .info element.")
+
+        return self._build_metadata(
+            [self._text(el) for el in _SERIES_AUTHORS(book_info_div)],
+            self._text(_first(_TITLE(book_info_div))),
+            self._text(_first(_TOPIC(document))),
+            self._text(_first(_DESCRIPTION(document))),
+        )
+
+    def get_download_links(self, document: lxml_html.HtmlElement, extensions: tuple[str, ...]) -> list[str]:
+        """
+        Returns the direct download link of each extension found in the page, in extensions order.
+        Links are returned as they are in the page, possibly relative.
+        """
+        links = []
+        for extension in extensions:
+            hrefs = _DOWNLOAD_LINK(document, extension=extension)
+            if hrefs and hrefs[0].strip():
+                links.append(hrefs[0].strip())
+        return links
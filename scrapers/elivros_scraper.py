@@ -1,11 +1,9 @@
 import itertools
 import logging
 import os
-import re
-
-from bs4 import BeautifulSoup
-from pydantic import ValidationError
 
+from lxml import html as lxml_html
+from selenium.common import WebDriverException
 from selenium.webdriver import Keys
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
@@ -15,38 +13,33 @@ import time
 from selenium.webdriver.support.wait import WebDriverWait
 from yaspin import yaspin
 
-from config.data_config import load_user_settings
 from exceptions.exceptions import ScraperError
-from models.uploader_models import ValidTopics, LibgenMetadata, AvailableSources
-from history import HistoryHandler
+from history import RegistrationStage
+from models.scraper_models import ScrapedBook
+from models.uploader_models import AvailableSources, LibgenMetadata
+from scrapers.base import BaseScraper
+from scrapers.chrome_downloads import ChromeDownloadTracker
+from scrapers.download_job import DownloadJob
+from scrapers.elivros_parser import ELivrosParser
 
 
-class ELivrosDownloader:
-    def __init__(self):
+class ELivrosDownloader(BaseScraper):
+    """
+    Scrapes elivros.love through a Chrome instance, handed over by make_download.
+    """
+
+    source = AvailableSources.elivros
+    needs_browser = True
 
+    def __init__(self):
+        super().__init__()
         self._base_url = r"https://elivros.love"
         self._rand_book_url = "http://elivros.love/page/RandomBook"
-        self.history_service = HistoryHandler()
         self.first_run = True
-        self.settings = load_user_settings()
-        self.download_path = self.settings.downloads_path
-        self.metadata: LibgenMetadata | None = None
         self.driver: WebDriver | None = None
         self.valid_extensions = ("epub", "pdf", "mobi")
-        self.elapsed_time: int | None = None
-        self.old_downloads: list[str] = []
-        self.downloaded_filepaths: list[str] = []
-        self.fiction_categories = [
-            "Ficção",
-            "Aventura",
-            "Romance",
-            "Contos",
-            "Infanto",
-            "Policial",
-            "Humor",
-            "Poemas",
-            "Suspense",
-        ]
+        self.parser = ELivrosParser()
+        self.registrations = RegistrationStage(self.history_service)
 
     def _remove_invalid_file(self, file_path: str):
         try:
@@ -54,174 +47,20 @@ class ELivrosDownloader:
         except (OSError, FileNotFoundError):
             logging.error(f"Could not remove file {file_path}")
 
-    def _get_download_dir(self):
-        return os.listdir(self.download_path)
-
-    def _find_newly_added_files(self, old_downloads: list) -> list[str]:
-        """
-        Compares the difference between the older download list and the current one.
-        Old list should be saved before making new downloads.
-        Selenium offers no built-in way of retrieving this information.
-
-        Only returns new entries, duplicates of main download folder are ignored.
-        :param old_downloads:
-        """
-
-        downloads = self._get_download_dir()
-
-        downloaded_filenames = []
-        for filename in downloads:
-            if filename not in old_downloads and filename.endswith(
-                self.valid_extensions
-            ):
-                downloaded_filenames.append(filename)
-
-        file_paths = [
-            os.path.join(self.download_path, f_name) for f_name in downloaded_filenames
-        ]
-
-        return file_paths
-
-    def _parse_html(self) -> BeautifulSoup:
+    def _parse_html(self) -> lxml_html.HtmlElement:
         # Wait until page is loaded.
         info_element_locator = (By.CSS_SELECTOR, ".SerieAut")
         WebDriverWait(self.driver, 3).until(
             EC.visibility_of_element_located(info_element_locator)
         )
-        soup = BeautifulSoup(self.driver.page_source, "lxml")
-
-        return soup
-
-    @staticmethod
-    def _are_chrome_downloads_done(downloads_list: list[dict]):
-        for download in downloads_list:
-            d_state = download.get("state")
-            if d_state == "IN_PROGRESS":
-                return False
-
-            return True
-
-    def _monitor_chrome_downloads(self):
-        """
-        Checks if downloads are done.
-        Chrome uses shadow root in the downloads list, so while possible i don't find it useful to implement
-        a resume function. A lot of in-string JS would be necessary.
-
-        The handle parameter determines the window in which to watch for chrome downloads.
-        Get it using driver.window_handlers.
-
-        """
-
-        download_url = "chrome://downloads/"
-
-        if self.driver.current_url != download_url:
-            self.driver.get(download_url)
-
-        # The only way to get elements from chrome's downloads list reasonably.
-        downloads: list[dict] = self.driver.execute_script(
-            """
-        var items = document.querySelector('downloads-manager')
-            .shadowRoot.getElementById('downloadsList').items;
-        return items;
-        
-        """
-        )
-
-        if len(downloads) == 0:
-            raise ScraperError("No downloads where started.")
-
-        return self._are_chrome_downloads_done(downloads)
-
-    def get_book_info(self, soup: BeautifulSoup) -> LibgenMetadata:
-        try:
-            book_info_div = soup.select_one(".info")
-            authors_series_info = book_info_div.select(".SerieAut > ul > li")
-        except AttributeError as e:
-            logging.error(e, exc_info=True)
-            raise ScraperError(e)
-        series_el = None
-        authors_el = None
-        pages_el = None
-        try:
-            if len(authors_series_info) == 1:
-                authors_el = authors_series_info[0]
-            elif len(authors_series_info) == 2:
-                authors_el = authors_series_info[0]
-                pages_el = authors_series_info[1]
-            elif len(authors_series_info) > 2:
-                first_el_text = authors_series_info[0].get_text()
-                if first_el_text.count("Vol:") == 0:
-                    logging.error("Tried to add non-series value to series field.")
-                    logging.error(f"Invalid value: {first_el_text}, other values:")
-                    logging.error(
-                        f"Authors: {authors_series_info[1].get_text()}, Pages: {authors_series_info[2].get_text()}"
-                    )
-                    logging.error(f"Number of elements: {len(authors_series_info)}")
-                    series_el = None
-                else:
-                    series_el = authors_series_info[0]
-
-                authors_el = authors_series_info[1]
-                pages_el = authors_series_info[2]
-
-        except (KeyError, AttributeError, ValueError) as e:
-            logging.error(e, exc_info=True)
-            raise ScraperError(e)
-
-        title_el = book_info_div.select_one("h1")
-        topic_el = soup.select_one("#content > article > ul > li:nth-child(2) > a")
-        topic_text = topic_el.get_text()
-
-        # By default, a book is considered non-fiction.
-        topic = ValidTopics.scitech
-
-        # If the category is a part of any string inside self.fiction_categories, then it's fiction.
-        for cat in self.fiction_categories:
-            if topic_text.find(cat) != -1:
-                topic = ValidTopics.fiction
-
-        if series_el is not None:
-            series_el = series_el.get_text()
-        if pages_el is not None:
-            pages_text = pages_el.get_text()
-            pages_text = re.sub("Páginas", "", pages_text)
-            try:
-                pages_text = int(pages_text)
-            except (TypeError, ValueError):
-                logging.error("Tried to convert invalid element to page int.")
-                logging.error("Elements are:")
-                logging.error(
-                    f"Title is: {title_el.get_text()}, "
-                    f"authors is: {authors_el.get_text()}, "
-                    f"pages is: {pages_el.get_text()}, "
-                    f"series is: {series_el}, "
-                    f"and number of elements is {len(authors_series_info)}"
-                )
-                raise ScraperError(
-                    "Invalid order for elements. Page element is not int. "
-                    "Check logs for more info."
-                )
-        else:
-            pages_text = None
+        page_source = self.driver.page_source
+        self.page_cache.put(self.driver.current_url, page_source)
+        document = self.parser.parse_document(page_source)
 
-        book_descr_el = soup.select_one("div.description > div.sinopse")
+        return document
 
-        try:
-            metadata = LibgenMetadata(
-                title=title_el.get_text(),
-                authors=authors_el.get_text(),
-                language="Portuguese",
-                series=series_el,
-                description=book_descr_el.get_text(),
-                pages=pages_text,
-                topic=topic,
-                source=AvailableSources.elivros,
-            )
-        except ValidationError as e:
-            logging.error(e, exc_info=True)
-            raise ScraperError(e)
-
-        return metadata
+    def get_book_info(self, document: lxml_html.HtmlElement) -> LibgenMetadata:
+        return self.parser.parse_book_page(document)
 
     def _get_random_page(self):
         WebDriverWait(self.driver, 5).until(
@@ -237,11 +76,17 @@ class ELivrosDownloader:
 
     def navigate(self):
         # Takes the driver to the correct url for downloading.
-        self.driver.get(self._rand_book_url)
-        if self.first_run:
+        with self.rate_limiter.request(self._rand_book_url):
             self.driver.get(self._rand_book_url)
+        if self.first_run:
+            with self.rate_limiter.request(self._rand_book_url):
+                self.driver.get(self._rand_book_url)
 
-    def _start_downloading(self):
+    def _start_downloading(self) -> int:
+        """
+        Clicks the download link of every format.
+        :return: number of downloads started.
+        """
         WebDriverWait(self.driver, 3).until(
             EC.element_to_be_clickable(
                 (
@@ -267,98 +112,112 @@ class ELivrosDownloader:
             "#bookinfo > div.info > div.downloads > a.mainDirectLink.mobi",
         )
 
-        for index, el in enumerate([epub_el, pdf_el, mobi_el]):
+        started = 0
+        for el in [epub_el, pdf_el, mobi_el]:
+            # Each click is a request to the download service.
             try:
-                el.send_keys(Keys.RETURN)
-                time.sleep(4)
+                with self.rate_limiter.request(el.get_attribute("href") or self._base_url):
+                    el.send_keys(Keys.RETURN)
+                started += 1
 
-            except:
+            except WebDriverException:
                 pass
 
+        return started
+
     def get_metadata(self) -> LibgenMetadata:
         return self.metadata
 
-    def make_download(self, driver: WebDriver):
-        """
-        Main method. Makes the actual downloading.
+    def discover(self) -> ScrapedBook:
+        self.navigate()
+        return ScrapedBook(url=self.driver.current_url)
 
-        Automatically builds and appends an entry to upload queue.
+    def open_book(self, url: str) -> ScrapedBook:
+        """
+        Takes the driver to a known book page, instead of a random one.
+        """
+        with self.rate_limiter.request(url):
+            self.driver.get(url)
+        return ScrapedBook(url=self.driver.current_url)
+
+    def fetch_metadata(self, book: ScrapedBook) -> LibgenMetadata:
+        book.document = self._parse_html()
+        return self.get_book_info(book.document)
+
+    def fetch_files(self, book: ScrapedBook) -> list[str]:
+        # Chrome writes into a directory of this book only, finished files are then moved to downloads.
+        with DownloadJob(self.settings.temp_downloads_path, self.download_path) as job:
+            tracker = ChromeDownloadTracker(self.driver, job.path)
+            tracker.enable()
+            start_time = time.monotonic()
+            started = self._start_downloading()
+            completed_downloads = tracker.wait(expected_downloads=started)
+            self.elapsed_time = round(time.monotonic() - start_time)
+
+            file_paths = job.promote_all(
+                [
+                    download.file_path
+                    for download in completed_downloads
+                    if download.file_path.endswith(self.valid_extensions)
+                ]
+            )
 
-        Returns metadata relevant to the current file.
+        logging.info(
+            f"Downloaded files '{file_paths}' from {book.url} in {self.elapsed_time} seconds."
+        )
+        return file_paths
 
-        throws ScraperError
+    def register(self, book: ScrapedBook, file_paths: list[str]) -> int:
         """
+        Queues the downloaded files for history, see RegistrationStage. Chrome doesn't hand over hashes,
+        so the files are hashed in background while the browser moves on to the next book.
+        The book stays leased until its files are in history, so it keeps counting towards the limit.
+        :return: number of files queued. the number added is given by last_registration.
+        """
+        lease_key = book.lease_key
+        book.lease_key = None
 
-        self.driver = driver
-        self.old_downloads = self._get_download_dir()
-
-        with yaspin(text=f"Downloading book") as spinner:
+        def on_done():
+            if lease_key is not None:
+                self.leases.release(lease_key)
 
-            spinner.write("Navigating to random")
-            self.navigate()
-            navigated_url = self.driver.current_url
-            spinner.write(f"Downloading from {navigated_url}")
-            spinner.write("Retrieving metadata")
-            soup = self._parse_html()
-            self.metadata = self.get_book_info(soup)
-
-            spinner.write("Checking for duplicates")
-            if self.history_service.check_duplicate(self.metadata):
-                logging.warning(
-                    f"URL '{navigated_url}' points to a metadata in queue or upload history. Skipping."
-                )
-                raise ScraperError(
-                    "Current URL points to a metadata in queue or upload history. Skipping."
-                )
+        self.last_registration = self.registrations.submit(
+            book.metadata, file_paths, book.url, book.file_hashes, on_done
+        )
+        return len(file_paths)
 
-            spinner.write("Starting download...")
-            self._start_downloading()
-            time.sleep(6)
+    def close(self):
+        self.registrations.shutdown()
 
-            elapsed_time = 0
-            seconds_per_iteration = 2
-            done = False
+    def use_driver(self, driver: WebDriver):
+        self.driver = driver
 
-            while not done:
-                time.sleep(seconds_per_iteration)
-                done = self._monitor_chrome_downloads()
+    def make_download(self, driver: WebDriver, url: str | None = None) -> int:
+        """
+        Main method. Makes the actual downloading.
 
-                elapsed_time += seconds_per_iteration
+        Automatically builds and appends an entry to upload queue, in background, see register.
 
-            self.elapsed_time = elapsed_time
+        Downloads a random book, or the book at url.
 
-            self.downloaded_filepaths = self._find_newly_added_files(self.old_downloads)
+        Returns the number of files queued for history.
 
-            if len(self.downloaded_filepaths) == 0:
-                logging.error(rf"Downloading failed for URL: {navigated_url}.")
-                spinner.fail("Downloading failed. Check logs for more info.")
-                raise ScraperError(rf"Downloading failed for URL: {navigated_url}.")
+        throws ScraperError
+        """
 
-            spinner.write(
-                f"Finished downloading {len(self.downloaded_filepaths)} files in {self.elapsed_time} seconds."
-            )
+        self.use_driver(driver)
 
-            logging.info(
-                f"Downloaded files '{self.downloaded_filepaths}' from {navigated_url} in "
-                f"{self.elapsed_time} seconds."
-            )
-            logging.info(f"Files have been stored in {self.downloaded_filepaths}.")
-
-            successful_attempts = 0
-            for path in self.downloaded_filepaths:
-                try:
-                    self.history_service.add_to_history(self.metadata, path)
-                    spinner.write(f"Added {path} to history.")
-                    successful_attempts += 1
-                except Exception as e:
-                    logging.error(f"Failed to add {path} to history.")
-                    logging.error(e, exc_info=True)
-                    self._remove_invalid_file(path)
-                    spinner.write(
-                        f"Warning: Failed to add {path} to history. Check logs."
-                    )
-
-            if successful_attempts == 0:
+        with yaspin(text=f"Downloading book") as spinner:
+            try:
+                book = self.open_book(url) if url is not None else None
+                successful_attempts = self.scrape_book(book, report=spinner.write)
+            except ScraperError as e:
+                spinner.write(str(e))
                 spinner.fail("❌")
+                raise
 
+            spinner.write(
+                f"Queued {successful_attempts} files for history after {self.elapsed_time} seconds."
+            )
             spinner.ok("✔")
+            return successful_attempts
@@ -0,0 +1,63 @@
+from unittest import TestCase
+import json
+import os
+import tempfile
+
+import keys
+from config.data_config import reload_user_settings
+from history import HistoryHandler
+from models.uploader_models import LibgenMetadata, ValidTopics, AvailableSources
+
+
+def build_metadata(
+    title: str,
+    topic: ValidTopics = ValidTopics.fiction,
+    authors: str = "Machado de Assis",
+) -> LibgenMetadata:
+    return LibgenMetadata(
+        topic=topic,
+        title=title,
+        authors=authors,
+        language="Portuguese",
+        source=AvailableSources.elivros,
+    )
+
+
+class HistoryTestCase(TestCase):
+    """
+    Runs each test against its own settings, downloads folder and history.db in a temporary directory.
+    """
+
+    # Settings written along with the paths, for tests that need other values than the defaults.
+    extra_settings: dict = {}
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.previous_cwd = os.getcwd()
+        self.downloads_path = os.path.join(self.temp_dir.name, "downloads")
+        os.mkdir(self.downloads_path)
+        with open(os.path.join(self.temp_dir.name, "spp_settings.json"), "w") as f:
+            json.dump(
+                {
+                    "downloads_path": self.downloads_path,
+                    "temp_downloads_path": os.path.join(self.temp_dir.name, "temp_downloads"),
+                    "history_db_path": os.path.join(self.temp_dir.name, "history.db"),
+                }
+                | self.extra_settings,
+                f,
+            )
+        os.chdir(self.temp_dir.name)
+        reload_user_settings()
+        self.history = HistoryHandler()
+
+    def tearDown(self) -> None:
+        keys._sqlite_manager.close_all()
+        keys._sqlite_manager = None
+        os.chdir(self.previous_cwd)
+        self.temp_dir.cleanup()
+
+    def _write_file(self, file_name: str, content: str | None = None) -> str:
+        file_path = os.path.join(self.downloads_path, file_name)
+        with open(file_path, "w") as f:
+            f.write(content if content is not None else f"content of {file_name}")
+        return file_path
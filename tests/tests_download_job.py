@@ -0,0 +1,119 @@
+from unittest import mock
+import os
+
+from exceptions.exceptions import ScraperDuplicateError, ScraperLimitError
+from history import LeaseHandler
+from history.leases import get_owner_id
+from history_test_case import HistoryTestCase, build_metadata
+from scrapers.download_job import DownloadJob, claim_book
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-helena"
+
+
+class TestDownloadJob(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.temp_downloads_path = os.path.join(self.temp_dir.name, "temp_downloads")
+        self.job = DownloadJob(self.temp_downloads_path, self.downloads_path)
+
+    def tearDown(self) -> None:
+        self.job.cleanup()
+        super().tearDown()
+
+    def _write_job_file(self, file_name: str) -> str:
+        file_path = os.path.join(self.job.path, file_name)
+        with open(file_path, "w") as f:
+            f.write(f"content of {file_name}")
+        return file_path
+
+    def test_jobs_get_their_own_directory(self):
+        other_job = DownloadJob(self.temp_downloads_path, self.downloads_path)
+        self._write_job_file("Helena.epub")
+
+        self.assertNotEqual(other_job.path, self.job.path)
+        self.assertEqual(os.path.dirname(self.job.path), self.temp_downloads_path)
+        self.assertEqual(other_job.list_files(), [])
+        other_job.cleanup()
+
+    def test_list_files_skips_partial_downloads(self):
+        file_path = self._write_job_file("Helena.epub")
+        for file_name in ("Helena.pdf.crdownload", "Helena.mobi.part", "Helena.azw3.tmp"):
+            self._write_job_file(file_name)
+        os.mkdir(os.path.join(self.job.path, "folder.epub"))
+
+        self.assertEqual(self.job.list_files(), [file_path])
+
+    def test_promote_numbers_taken_names(self):
+        self._write_file("Helena.epub", "content of another Helena")
+        self._write_file("Helena (1).epub", "content of yet another Helena")
+
+        promoted_path = self.job.promote(self._write_job_file("Helena.epub"))
+
+        self.assertEqual(promoted_path, os.path.join(self.downloads_path, "Helena (2).epub"))
+        with open(promoted_path) as f:
+            self.assertEqual(f.read(), "content of Helena.epub")
+        with open(os.path.join(self.downloads_path, "Helena.epub")) as f:
+            self.assertEqual(f.read(), "content of another Helena")
+        self.assertEqual(self.job.list_files(), [])
+
+    def test_promote_without_hard_links(self):
+        self._write_file("Helena.epub", "content of another Helena")
+
+        with mock.patch("os.link", side_effect=OSError("Operation not permitted")):
+            promoted_path = self.job.promote(self._write_job_file("Helena.epub"))
+
+        self.assertEqual(promoted_path, os.path.join(self.downloads_path, "Helena (1).epub"))
+        self.assertTrue(os.path.isfile(promoted_path))
+        self.assertEqual(self.job.list_files(), [])
+
+    def test_promote_all_skips_failed_files(self):
+        file_path = self._write_job_file("Helena.epub")
+        missing_path = os.path.join(self.job.path, "Helena.pdf")
+
+        self.assertEqual(
+            self.job.promote_all([missing_path, file_path]),
+            [os.path.join(self.downloads_path, "Helena.epub")],
+        )
+
+    def test_cleanup_removes_leftovers(self):
+        with DownloadJob(self.temp_downloads_path, self.downloads_path) as job:
+            with open(os.path.join(job.path, "Helena.pdf.crdownload"), "w") as f:
+                f.write("partial")
+
+        self.assertFalse(os.path.exists(job.path))
+        # Cleaning up twice is harmless.
+        job.cleanup()
+
+
+class TestClaimBook(HistoryTestCase):
+
+    extra_settings = {"max_downloads": 1}
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.leases = LeaseHandler(get_owner_id(worker="a"))
+        self.other_leases = LeaseHandler(get_owner_id(worker="b"))
+
+    def test_book_leased_by_another_scraper(self):
+        key = claim_book(self.leases, BOOK_URL, max_downloads=0)
+
+        with self.assertRaises(ScraperDuplicateError):
+            claim_book(self.other_leases, BOOK_URL, max_downloads=0)
+        self.leases.release(key)
+        claim_book(self.other_leases, BOOK_URL, max_downloads=0)
+
+    def test_max_downloads(self):
+        self.history.add_many_to_history([(build_metadata("Dom Casmurro"), self._write_file("dom.epub"))])
+        claim_book(self.leases, f"{BOOK_URL}-1", max_downloads=2)
+
+        with self.assertRaises(ScraperLimitError):
+            claim_book(self.other_leases, f"{BOOK_URL}-2", max_downloads=2)
+        # 0 means no limit.
+        claim_book(self.other_leases, f"{BOOK_URL}-2", max_downloads=0)
+
+    def test_max_downloads_from_settings(self):
+        self.history.add_many_to_history([(build_metadata("Dom Casmurro"), self._write_file("dom.epub"))])
+
+        with self.assertRaises(ScraperLimitError):
+            claim_book(self.leases, BOOK_URL)
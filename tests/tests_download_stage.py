@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from history_test_case import HistoryTestCase
+from ratelimit import RateLimiter
+from scrapers.download_stage import DownloadStage
+
+BOOK_CONTENT = os.urandom(300 * 1024)
+
+
+class FileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FileRequestHandler)
+        self.lock = threading.Lock()
+        self.in_flight: Counter[str] = Counter()
+        self.max_in_flight: Counter[str] = Counter()
+        self.max_total_in_flight = 0
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    server: FileServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self, content_type: str, length: int):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _send_slowly(self):
+        host = self.headers["Host"].split(":")[0]
+        with self.server.lock:
+            self.server.in_flight[host] += 1
+            self.server.max_in_flight[host] = max(self.server.max_in_flight[host], self.server.in_flight[host])
+            self.server.max_total_in_flight = max(
+                self.server.max_total_in_flight, sum(self.server.in_flight.values())
+            )
+        time.sleep(0.3)
+        with self.server.lock:
+            self.server.in_flight[host] -= 1
+        self._send_headers("application/epub+zip", 4)
+        self.wfile.write(b"book")
+
+    def do_GET(self):
+        if self.path.startswith("/slow/"):
+            self._send_slowly()
+        elif self.path == "/book.pdf":
+            self._send_headers("application/pdf", len(BOOK_CONTENT))
+            self.wfile.write(BOOK_CONTENT)
+        elif self.path == "/broken.epub":
+            # The connection drops before the announced length was sent.
+            self._send_headers("application/epub+zip", 1024 * 1024)
+            self.wfile.write(b"x" * 1024)
+            self.wfile.flush()
+            self.close_connection = True
+        elif self.path == "/notes.txt":
+            self._send_headers("text/plain", 5)
+            self.wfile.write(b"notes")
+        else:
+            self.send_error(404)
+
+
+class TestDownloadStage(HistoryTestCase):
+    # Pacing isn't under test, requests go through as fast as they're sent.
+    extra_settings = {"default_rate_limit": 1000}
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.server = FileServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.port = self.server.server_address[1]
+        self.session = requests.Session()
+        self.stage = DownloadStage(
+            self.session, max_concurrent_downloads=6, max_downloads_per_host=2, rate_limiter=RateLimiter()
+        )
+
+    def tearDown(self) -> None:
+        self.stage.shutdown()
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def _download(self, path: str, host: str = "127.0.0.1"):
+        return self.stage.submit(f"http://{host}:{self.port}{path}", self.downloads_path).result(10)
+
+    def test_limits_downloads_per_host(self):
+        futures = [
+            self.stage.submit(f"http://{host}:{self.port}/slow/{index}.epub", self.downloads_path)
+            for index in range(4)
+            for host in ("127.0.0.1", "localhost")
+        ]
+        results = [future.result(10) for future in futures]
+
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(self.server.max_in_flight, {"127.0.0.1": 2, "localhost": 2})
+        # Each host has its own limit, they're downloaded from at the same time.
+        self.assertGreater(self.server.max_total_in_flight, 2)
+        # Files with the same name don't overwrite each other.
+        self.assertEqual(len({result.file_path for result in results}), 8)
+
+    def test_counts_bytes_and_hashes(self):
+        result = self._download("/book.pdf")
+
+        self.assertIsNone(result.error)
+        self.assertEqual(result.file_path, os.path.join(self.downloads_path, "book.pdf"))
+        self.assertEqual(result.bytes, len(BOOK_CONTENT))
+        self.assertEqual(result.hashes.size, len(BOOK_CONTENT))
+        self.assertEqual(result.hashes.md5, hashlib.md5(BOOK_CONTENT).hexdigest())
+        with open(result.file_path, "rb") as f:
+            self.assertEqual(f.read(), BOOK_CONTENT)
+
+    def test_removes_partial_files(self):
+        result = self._download("/broken.epub")
+
+        self.assertIsNotNone(result.error)
+        self.assertIsNone(result.file_path)
+        self.assertEqual(os.listdir(self.downloads_path), [])
+
+    def test_skips_invalid_extensions(self):
+        result = self._download("/notes.txt")
+
+        self.assertEqual(result.error, "Link doesn't point to a file with a valid extension.")
+        self.assertIsNone(result.file_path)
+        self.assertGreater(result.duration, 0)
+        self.assertEqual(os.listdir(self.downloads_path), [])
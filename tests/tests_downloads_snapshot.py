@@ -0,0 +1,62 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+
+from history.downloads_snapshot import DownloadsSnapshot
+
+
+class TestDownloadsSnapshot(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.downloads_path = os.path.join(self.temp_dir.name, "downloads")
+        os.mkdir(self.downloads_path)
+        os.mkdir(os.path.join(self.downloads_path, "folder.epub"))
+        self.file_path = self._write_file(self.downloads_path, "Dom Casmurro.epub")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def _write_file(directory: str, file_name: str) -> str:
+        file_path = os.path.join(directory, file_name)
+        with open(file_path, "w") as f:
+            f.write(file_name)
+        return file_path
+
+    def test_lists_files_once(self):
+        snapshot = DownloadsSnapshot(self.downloads_path)
+        added_path = self._write_file(self.downloads_path, "Helena.epub")
+        os.remove(self.file_path)
+
+        with mock.patch("os.path.isfile") as isfile:
+            # Paths are compared once normalized.
+            self.assertTrue(snapshot.is_file(os.path.join(self.downloads_path, ".", "Dom Casmurro.epub")))
+            self.assertFalse(snapshot.is_file(os.path.join(self.downloads_path, "folder.epub")))
+            self.assertFalse(snapshot.is_file(added_path))
+        isfile.assert_not_called()
+
+    def test_checks_paths_elsewhere(self):
+        snapshot = DownloadsSnapshot(self.downloads_path)
+        nested_path = os.path.join(self.downloads_path, "folder.epub", "Helena.epub")
+        outside_path = os.path.join(self.temp_dir.name, "Helena.epub")
+
+        self.assertFalse(snapshot.is_file(nested_path))
+        self.assertFalse(snapshot.is_file(outside_path))
+        self._write_file(os.path.dirname(nested_path), "Helena.epub")
+        self._write_file(self.temp_dir.name, "Helena.epub")
+        self.assertTrue(snapshot.is_file(nested_path))
+        self.assertTrue(snapshot.is_file(outside_path))
+
+    def test_missing_directory(self):
+        snapshot = DownloadsSnapshot(os.path.join(self.temp_dir.name, "missing"))
+
+        self.assertEqual(snapshot.file_paths, set())
+        self.assertFalse(snapshot.is_file(os.path.join(self.temp_dir.name, "missing", "Helena.epub")))
+
+    def test_case_insensitive_file_systems(self):
+        # Windows normcase, paths differing only in case are the same file.
+        with mock.patch("os.path.normcase", str.lower):
+            snapshot = DownloadsSnapshot(self.downloads_path)
+            self.assertTrue(snapshot.is_file(os.path.join(self.downloads_path, "DOM CASMURRO.EPUB")))
+            self.assertFalse(snapshot.is_file(os.path.join(self.downloads_path, "helena.epub")))
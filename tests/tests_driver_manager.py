@@ -0,0 +1,166 @@
+from unittest import TestCase, mock, skipUnless
+import os
+import subprocess
+import sys
+import time
+
+from selenium.common import WebDriverException
+
+from config import driver_config
+from config.data_config import load_user_settings
+from config.driver_config import DriverManager, _process_tree
+from history_test_case import HistoryTestCase
+from models.settings_models import DriverProfiles
+
+
+class FakeService:
+    def __init__(self, process: subprocess.Popen | None):
+        self.process = process
+
+
+class FakeDriver:
+    def __init__(self, process: subprocess.Popen | None = None):
+        self.service = FakeService(process)
+        self.responding = True
+        self.quit_calls = 0
+
+    @property
+    def window_handles(self) -> list[str]:
+        return ["window"]
+
+    def execute_script(self, script: str):
+        if not self.responding:
+            raise WebDriverException("chrome not reachable")
+        return 1
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class TestDriverManager(TestCase):
+
+    def setUp(self) -> None:
+        self.drivers_created: list[FakeDriver] = []
+
+    def _create_driver(self) -> FakeDriver:
+        driver = FakeDriver()
+        self.drivers_created.append(driver)
+        return driver
+
+    def _manager(self, **limits) -> DriverManager:
+        limits = {"max_pages": 0, "max_age": 0, "max_rss_mb": 0, **limits}
+        return DriverManager(driver_factory=self._create_driver, **limits)
+
+    def test_recycles_after_max_pages(self):
+        with self._manager(max_pages=2) as drivers:
+            for _ in range(5):
+                drivers.get()
+
+            self.assertEqual(len(self.drivers_created), 3)
+            self.assertEqual(drivers.get_stats().restarts, 2)
+            # Every replaced driver was quit before the next one started.
+            self.assertEqual([d.quit_calls for d in self.drivers_created], [1, 1, 0])
+
+        self.assertEqual(self.drivers_created[-1].quit_calls, 1)
+
+    def test_replaces_unresponsive_driver(self):
+        drivers = self._manager()
+        first = drivers.get()
+        first.responding = False
+
+        second = drivers.get()
+        self.assertIsNot(first, second)
+        self.assertEqual(first.quit_calls, 1)
+        self.assertEqual(drivers.get_stats().failed_health_checks, 1)
+        drivers.quit()
+
+    @skipUnless(os.path.isdir("/proc"), "process trees are read from /proc")
+    def test_kills_processes_left_after_quit(self):
+        # A process tree standing in for chromedriver and a Chrome child that ignores quit().
+        process = subprocess.Popen(
+            [sys.executable, "-c", "import subprocess, sys, time; "
+             "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); time.sleep(60)"]
+        )
+        drivers = DriverManager(
+            driver_factory=lambda: FakeDriver(process), max_pages=0, max_age=0, max_rss_mb=0
+        )
+        drivers.get()
+        for _ in range(50):
+            if len(_process_tree(process.pid)) == 2:
+                break
+            time.sleep(0.1)
+
+        pids = _process_tree(process.pid)
+        self.assertEqual(len(pids), 2)
+        self.assertGreater(drivers.get_stats().rss_mb, 0)
+
+        drivers.quit()
+        process.wait(5)
+        self.assertEqual(drivers.get_stats().orphans_killed, 2)
+        self.assertEqual(_process_tree(process.pid), {})
+
+
+def setup_driver(**kwargs) -> tuple[dict, mock.Mock]:
+    """
+    :return: capabilities Chrome was started with, and the driver.
+    """
+    with mock.patch.object(driver_config.webdriver, "Chrome") as chrome:
+        driver = driver_config.driver_setup(headless=True, **kwargs)
+    return chrome.call_args.kwargs["options"].to_capabilities(), driver
+
+
+class TestDriverSetup(HistoryTestCase):
+
+    def _capabilities(self, **kwargs) -> dict:
+        return setup_driver(**kwargs)[0]
+
+    def test_download_events_only_when_asked(self):
+        capabilities = self._capabilities()
+        self.assertNotIn("goog:loggingPrefs", capabilities)
+        self.assertNotIn("perfLoggingPrefs", capabilities["goog:chromeOptions"])
+
+        capabilities = self._capabilities(download_events=True)
+        self.assertEqual(capabilities["goog:loggingPrefs"], {"performance": "ALL"})
+        self.assertEqual(capabilities["goog:chromeOptions"]["perfLoggingPrefs"], {"enableNetwork": False})
+
+    def test_default_profile_is_plain_chrome(self):
+        capabilities, driver = setup_driver()
+
+        self.assertEqual(capabilities["pageLoadStrategy"], "normal")
+        self.assertNotIn(
+            "profile.managed_default_content_settings.images", capabilities["goog:chromeOptions"]["prefs"]
+        )
+        self.assertNotIn("--blink-settings=imagesEnabled=false", capabilities["goog:chromeOptions"]["args"])
+        driver.execute_cdp_cmd.assert_not_called()
+
+    def test_performance_profile(self):
+        capabilities, driver = setup_driver(profile=DriverProfiles.performance)
+
+        self.assertEqual(capabilities["pageLoadStrategy"], "eager")
+        prefs = capabilities["goog:chromeOptions"]["prefs"]
+        self.assertEqual(prefs["profile.managed_default_content_settings.images"], 2)
+        # Download settings are kept.
+        self.assertEqual(prefs["download.default_directory"], self.downloads_path)
+        self.assertIn("--blink-settings=imagesEnabled=false", capabilities["goog:chromeOptions"]["args"])
+        driver.execute_cdp_cmd.assert_any_call(
+            "Network.setBlockedURLs",
+            {"urls": driver_config.HEAVY_RESOURCE_URLS + load_user_settings().driver_blocked_urls},
+        )
+
+
+class TestDriverSetupFromSettings(HistoryTestCase):
+
+    extra_settings = {"driver_profile": "performance", "driver_blocked_urls": ["*ads.example.com*"]}
+
+    def test_profile_from_settings(self):
+        capabilities, driver = setup_driver()
+
+        self.assertEqual(capabilities["pageLoadStrategy"], "eager")
+        driver.execute_cdp_cmd.assert_any_call(
+            "Network.setBlockedURLs", {"urls": driver_config.HEAVY_RESOURCE_URLS + ["*ads.example.com*"]}
+        )
+
+        # The profile passed in wins.
+        capabilities, driver = setup_driver(profile=DriverProfiles.default)
+        self.assertEqual(capabilities["pageLoadStrategy"], "normal")
+        driver.execute_cdp_cmd.assert_not_called()
@@ -0,0 +1,60 @@
+from unittest import mock
+
+from exceptions.exceptions import ScraperEngineError
+from history_test_case import HistoryTestCase
+from models.frontier_models import FrontierKinds
+from models.settings_models import ScraperEngines
+from routines import scraper_routines
+from scrapers.elivros_crawler import ELivrosCrawler
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-helena"
+
+LISTING_PAGE = b"""
+<html><body>
+    <a href="http://elivros.love/livro/baixar-livro-helena">Helena</a>
+    <a href="https://www.elivros.love/livro/baixar-livro-helena#comments">Comments</a>
+    <a href="/livro/baixar-livro-helena">Helena</a>
+    <a href="HTTPS://ELIVROS.LOVE/livro/baixar-livro-dom-casmurro">Dom Casmurro</a>
+    <a href="/categoria/romance/page/2">Next</a>
+    <a href="http://www.elivros.love/categoria/romance/page/2">Next</a>
+    <a href="https://example.com/livro/baixar-livro-helena">Elsewhere</a>
+    <a href="/sobre">About</a>
+</body></html>
+"""
+
+
+class TestELivrosCrawler(HistoryTestCase):
+
+    def test_extract_links_normalizes_urls(self):
+        crawler = ELivrosCrawler(session=None)
+        links = crawler.extract_links(LISTING_PAGE, "http://elivros.love/categoria/romance")
+
+        self.assertEqual(
+            links[FrontierKinds.book],
+            {BOOK_URL, "https://elivros.love/livro/baixar-livro-dom-casmurro"},
+        )
+        self.assertEqual(links[FrontierKinds.listing], {"https://elivros.love/categoria/romance/page/2"})
+
+    def test_falls_back_to_selenium(self):
+        http_scraper = mock.Mock()
+        http_scraper.start_download.side_effect = ScraperEngineError("RandomBook keeps refusing requests.")
+        books_done = []
+
+        with mock.patch.object(scraper_routines, "ELivrosDownloader") as selenium_scraper, mock.patch.object(
+            scraper_routines, "DriverManager"
+        ) as drivers:
+            books = scraper_routines._CrawlerBooks(http_scraper, None, books_done.append)
+            books.engine = ScraperEngines.http
+            with self.assertRaises(ScraperEngineError) as error:
+                books.download(BOOK_URL)
+            books.fall_back(error.exception)
+
+            books.download(BOOK_URL)
+            selenium_scraper.return_value.make_download.assert_called_once_with(
+                drivers.return_value.get.return_value, BOOK_URL
+            )
+            # Browsers of the crawler follow their downloads.
+            drivers.assert_called_once_with(download_events=True)
+
+            books.close()
+            selenium_scraper.return_value.close.assert_called_once()
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import Future
+
+from exceptions.exceptions import ScraperDownloadError
+from history_test_case import HistoryTestCase, build_metadata
+from models.scraper_models import DownloadResult, PendingBook
+from scrapers import ELivrosHTTPDownloader
+from scrapers.download_job import DownloadJob
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-helena"
+
+
+def completed(result: DownloadResult) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TestELivrosHTTPDownloader(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.scraper = ELivrosHTTPDownloader()
+
+    def tearDown(self) -> None:
+        self.scraper.close()
+        super().tearDown()
+
+    def _pending_book(self, results: list[DownloadResult]) -> PendingBook:
+        job = DownloadJob(os.path.join(self.temp_dir.name, "temp_downloads"), self.downloads_path)
+        return PendingBook(
+            url=BOOK_URL,
+            metadata=build_metadata("Helena"),
+            job=job,
+            downloads=[completed(result) for result in results],
+        )
+
+    def test_failed_book_is_not_a_source_failure(self):
+        pending = self._pending_book(
+            [
+                DownloadResult(url=f"{BOOK_URL}.epub", error="404 Client Error", duration=1),
+                DownloadResult(url=f"{BOOK_URL}.pdf", error="404 Client Error", duration=2),
+            ]
+        )
+
+        with self.assertRaises(ScraperDownloadError):
+            self.scraper._collect_files(pending)
+        self.assertEqual(self.scraper.elapsed_time, 2)
+        self.assertFalse(os.path.exists(pending.job.path))
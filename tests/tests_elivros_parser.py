@@ -0,0 +1,56 @@
+from unittest import TestCase
+import glob
+import os
+
+from bs4 import BeautifulSoup
+
+from exceptions import ScraperError
+from scrapers.elivros_parser import ELivrosParser
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "elivros")
+
+# Pages neither path can get metadata from.
+INVALID_FIXTURES = ("invalid_pages.html", "missing_info.html")
+
+
+def load_fixtures() -> dict[str, bytes]:
+    fixtures = {}
+    for file_path in sorted(glob.glob(os.path.join(FIXTURES_PATH, "*.html"))):
+        with open(file_path, "rb") as f:
+            fixtures[os.path.basename(file_path)] = f.read()
+    return fixtures
+
+
+class TestELivrosParser(TestCase):
+
+    def setUp(self) -> None:
+        self.parser = ELivrosParser()
+        self.fixtures = load_fixtures()
+
+    def test_fast_path_matches_soup(self):
+        for name, page in self.fixtures.items():
+            if name in INVALID_FIXTURES:
+                continue
+            with self.subTest(name):
+                expected = self.parser.get_book_info(BeautifulSoup(page, "lxml"))
+                self.assertEqual(self.parser.parse_book_page(page).json(), expected.json())
+                # Selenium hands over the page source already decoded.
+                page_source = str(BeautifulSoup(page, "lxml"))
+                self.assertEqual(
+                    self.parser.parse_book_page(page_source).json(), expected.json()
+                )
+
+    def test_invalid_pages(self):
+        for name in INVALID_FIXTURES:
+            page = self.fixtures[name]
+            with self.subTest(name):
+                with self.assertRaises(ScraperError):
+                    self.parser.get_book_info(BeautifulSoup(page, "lxml"))
+                with self.assertRaises(ScraperError):
+                    self.parser.parse_book_page(page)
+
+    def test_empty_page(self):
+        for page in (b"", ""):
+            with self.subTest(repr(page)):
+                with self.assertRaises(ScraperError):
+                    self.parser.parse_book_page(page)
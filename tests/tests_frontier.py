@@ -0,0 +1,69 @@
+import threading
+
+from history import FrontierHandler
+from history.frontier import MAX_FRONTIER_ATTEMPTS
+from history.leases import get_owner_id
+from history_test_case import HistoryTestCase
+from models.frontier_models import FrontierKinds
+
+LISTING_URL = "https://elivros.love/categoria/romance"
+
+
+def book_url(index: int) -> str:
+    return f"https://elivros.love/livro/baixar-livro-{index}"
+
+
+class TestFrontier(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.frontier = FrontierHandler()
+
+    def test_books_are_claimed_before_listings(self):
+        self.frontier.add_urls([LISTING_URL], FrontierKinds.listing)
+        self.assertEqual(self.frontier.add_urls([book_url(1), book_url(2)], FrontierKinds.book), 2)
+        # Pages already in the frontier are ignored.
+        self.assertEqual(self.frontier.add_urls([book_url(1), LISTING_URL], FrontierKinds.book), 0)
+
+        claimed = [self.frontier.claim() for _ in range(4)]
+        self.assertEqual([entry.url for entry in claimed[:3]], [book_url(1), book_url(2), LISTING_URL])
+        self.assertIsNone(claimed[3])
+        self.assertEqual(self.frontier.counts()["in_progress"], 3)
+
+        for entry in claimed[:3]:
+            self.frontier.complete(entry)
+        self.assertEqual(self.frontier.counts()["done"], 3)
+
+    def test_concurrent_claims_never_share_a_page(self):
+        self.frontier.add_urls([book_url(index) for index in range(50)], FrontierKinds.book)
+        claimed_urls = []
+        lock = threading.Lock()
+
+        def crawl(worker: str):
+            frontier = FrontierHandler(get_owner_id(worker=worker))
+            while (entry := frontier.claim()) is not None:
+                with lock:
+                    claimed_urls.append(entry.url)
+                frontier.complete(entry)
+            frontier.db_manager.release_current()
+
+        threads = [threading.Thread(target=crawl, args=(str(index),)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(claimed_urls), sorted(book_url(index) for index in range(50)))
+
+    def test_failed_pages_are_retried(self):
+        self.frontier.add_urls([book_url(1)], FrontierKinds.book)
+        # Released pages don't count the attempt.
+        self.frontier.release(self.frontier.claim())
+
+        for attempt in range(1, MAX_FRONTIER_ATTEMPTS + 1):
+            entry = self.frontier.claim()
+            self.assertEqual(entry.attempts, attempt)
+            self.frontier.fail(entry, "404 Client Error")
+
+        self.assertIsNone(self.frontier.claim())
+        self.assertEqual(self.frontier.counts()["failed"], 1)
@@ -0,0 +1,91 @@
+from unittest import TestCase, mock
+import os
+import sqlite3
+import tempfile
+
+from config.data_config import run_migrations
+from history_test_case import HistoryTestCase, build_metadata
+from models.uploader_models import ValidTopics
+
+
+class TestDedupKey(TestCase):
+
+    def test_ignores_case_and_whitespace(self):
+        key = build_metadata("Dom Casmurro").dedup_key()
+
+        self.assertEqual(build_metadata("  dom   CASMURRO ").dedup_key(), key)
+        self.assertEqual(build_metadata("Dom Casmurro", authors="machado  de\tassis").dedup_key(), key)
+        self.assertEqual(len(key), 40)
+
+    def test_only_identifying_fields_count(self):
+        metadata = build_metadata("Dom Casmurro")
+        key = metadata.dedup_key()
+
+        other_edition = metadata.copy(update={"description": "Outra edição", "year": "1899"})
+        self.assertEqual(other_edition.dedup_key(), key)
+        self.assertNotEqual(build_metadata("Dom Casmurro", topic=ValidTopics.scitech).dedup_key(), key)
+        self.assertNotEqual(build_metadata("Dom Casmurro", authors="José de Alencar").dedup_key(), key)
+        self.assertNotEqual(build_metadata("Memórias Póstumas").dedup_key(), key)
+
+    def test_fields_dont_run_into_each_other(self):
+        self.assertNotEqual(
+            build_metadata("Dom", authors="Casmurro").dedup_key(),
+            build_metadata("Dom Casmurro", authors="").dedup_key(),
+        )
+
+
+class TestCheckDuplicate(HistoryTestCase):
+
+    def test_finds_pending_and_uploaded_entries(self):
+        file_path = self._write_file("dom_casmurro.epub")
+        self.history.add_to_history(build_metadata("Dom Casmurro"), file_path)
+
+        # A book not downloaded yet is a duplicate of any entry of the same book.
+        self.assertTrue(self.history.check_duplicate(build_metadata("DOM  casmurro")))
+        self.assertFalse(self.history.check_duplicate(build_metadata("Memórias Póstumas")))
+        # A downloaded file only is if it's the same file, other formats of a pending book are welcome.
+        self.assertTrue(self.history.check_duplicate(build_metadata("Dom Casmurro"), file_path))
+        other_path = self._write_file("dom_casmurro.pdf")
+        self.assertFalse(self.history.check_duplicate(build_metadata("Dom Casmurro"), other_path))
+
+        entries, _, _ = self.history.get_uploadable_page()
+        self.history.mark_as_uploaded(entries[0].entry_id)
+        self.assertTrue(self.history.check_duplicate(build_metadata("Dom Casmurro"), other_path))
+
+    def test_uses_dedup_key_index(self):
+        with self.history.db_manager.connection() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT filepath, uploaded FROM spp WHERE dedup_key=?",
+                (build_metadata("Dom Casmurro").dedup_key(),),
+            ).fetchall()
+
+        self.assertIn("spp_dedup_key_idx", " ".join(row[-1] for row in plan))
+
+
+class TestDedupKeyBackfill(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.temp_dir.name, "history.db"))
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.temp_dir.cleanup()
+
+    def test_backfills_every_batch(self):
+        titles = [f"Livro {number}" for number in range(7)]
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE spp(id INTEGER PRIMARY KEY, metadata TEXT, filepath TEXT, "
+                "uploaded INTEGER DEFAULT 0, uploaded_at TEXT DEFAULT NULL)"
+            )
+            self.conn.executemany(
+                "INSERT INTO spp (metadata, filepath) VALUES (?, ?)",
+                [(build_metadata(title).json(), f"/downloads/{title}.epub") for title in titles],
+            )
+
+        with mock.patch("config.migrations.MIGRATION_BATCH_SIZE", 3):
+            run_migrations(self.conn)
+
+        keys = [row[0] for row in self.conn.execute("SELECT dedup_key FROM spp ORDER BY id")]
+        self.assertEqual(keys, [build_metadata(title).dedup_key() for title in titles])
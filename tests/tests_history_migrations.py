@@ -0,0 +1,93 @@
+from unittest import TestCase
+import json
+import os
+import sqlite3
+import tempfile
+
+from config.data_config import get_schema_version, run_migrations
+from config.migrations import SCHEMA_MIGRATIONS
+from exceptions.exceptions import HistoryError
+from models.uploader_models import LibgenMetadata, ValidTopics, AvailableSources
+
+
+def build_metadata(title: str, authors: str = "Aluísio Azevedo") -> LibgenMetadata:
+    return LibgenMetadata(
+        topic=ValidTopics.fiction,
+        title=title,
+        authors=authors,
+        language="Portuguese",
+        publisher="Garnier",
+        source=AvailableSources.elivros,
+    )
+
+
+class TestHistoryMigrations(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "history.db")
+        self.conn = sqlite3.connect(self.db_path)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.temp_dir.cleanup()
+
+    def _create_baseline_database(self):
+        # Schema of history databases created before migrations were versioned.
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE spp(id INTEGER PRIMARY KEY, metadata TEXT, filepath TEXT, "
+                "uploaded INTEGER DEFAULT 0, uploaded_at TEXT DEFAULT NULL)"
+            )
+            self.conn.executemany(
+                "INSERT INTO spp (metadata, filepath, uploaded) VALUES (?, ?, ?)",
+                [
+                    (build_metadata("O Cortiço").json(), "/downloads/o-cortico.epub", 0),
+                    (build_metadata("Dom Casmurro", "Machado de Assis").json(), "/downloads/dom.pdf", 1),
+                    (json.dumps({"title": "No topic"}), "/downloads/invalid.epub", 0),
+                ],
+            )
+
+    def test_migrates_baseline_database(self):
+        self._create_baseline_database()
+        run_migrations(self.conn)
+
+        self.assertEqual(get_schema_version(self.conn), len(SCHEMA_MIGRATIONS))
+        rows = self.conn.execute(
+            "SELECT title, authors, topic, source, dedup_key FROM spp ORDER BY id"
+        ).fetchall()
+        self.assertEqual(
+            rows[0],
+            ("O Cortiço", "Aluísio Azevedo", "fiction", "elivros.love", build_metadata("O Cortiço").dedup_key()),
+        )
+        self.assertEqual(rows[1][0], "Dom Casmurro")
+        # Invalid metadata is left as it is, without failing the migration.
+        self.assertEqual(rows[2], (None, None, None, None, None))
+
+        stats = dict(self.conn.execute("SELECT name, value FROM spp_stats"))
+        self.assertEqual(stats["total"], 3)
+        self.assertEqual(stats["uploaded"], 1)
+        # Entries with invalid metadata are never uploaded, they aren't pending.
+        self.assertEqual((stats["pending"], stats["invalid"]), (1, 1))
+        self.assertEqual(stats["source:elivros.love"], 2)
+
+    def test_migrations_run_once(self):
+        self._create_baseline_database()
+        run_migrations(self.conn)
+        run_migrations(self.conn)
+
+        self.assertEqual(get_schema_version(self.conn), len(SCHEMA_MIGRATIONS))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM spp").fetchone()[0], 3)
+
+    def test_creates_new_database(self):
+        run_migrations(self.conn)
+
+        self.assertEqual(get_schema_version(self.conn), len(SCHEMA_MIGRATIONS))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM spp").fetchone()[0], 0)
+
+    def test_rejects_newer_schema(self):
+        with self.conn:
+            self.conn.execute(f"PRAGMA user_version={len(SCHEMA_MIGRATIONS) + 1}")
+
+        with self.assertRaises(HistoryError):
+            run_migrations(self.conn)
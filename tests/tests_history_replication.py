@@ -0,0 +1,162 @@
+from unittest import TestCase
+import json
+import os
+import shutil
+import tempfile
+
+import keys
+from config.data_config import reload_user_settings
+from history import HistoryHandler
+from history.replication import export_history, import_history
+from models.uploader_models import LibgenMetadata, ValidTopics, AvailableSources
+
+
+def build_metadata(title: str) -> LibgenMetadata:
+    return LibgenMetadata(
+        topic=ValidTopics.fiction,
+        title=title,
+        authors="Machado de Assis",
+        language="Portuguese",
+        source=AvailableSources.elivros,
+    )
+
+
+class TestHistoryReplication(TestCase):
+    """
+    Two nodes, each with its own settings, downloads folder and history.db in a temporary directory.
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.previous_cwd = os.getcwd()
+        self.export_path = os.path.join(self.temp_dir.name, "history.jsonl.gz")
+        self.node_paths = {}
+        for node in ("a", "b"):
+            node_path = os.path.join(self.temp_dir.name, node)
+            os.makedirs(os.path.join(node_path, "downloads"))
+            with open(os.path.join(node_path, "spp_settings.json"), "w") as f:
+                json.dump(
+                    {
+                        "downloads_path": os.path.join(node_path, "downloads"),
+                        "temp_downloads_path": os.path.join(node_path, "temp_downloads"),
+                        "history_db_path": os.path.join(node_path, "history.db"),
+                    },
+                    f,
+                )
+            self.node_paths[node] = node_path
+
+    def tearDown(self) -> None:
+        self._close_node()
+        os.chdir(self.previous_cwd)
+        self.temp_dir.cleanup()
+
+    def _close_node(self):
+        if keys._sqlite_manager is not None:
+            keys._sqlite_manager.close_all()
+            keys._sqlite_manager = None
+
+    def _use_node(self, node: str) -> HistoryHandler:
+        self._close_node()
+        os.chdir(self.node_paths[node])
+        reload_user_settings()
+        return HistoryHandler()
+
+    def _write_file(self, node: str, file_name: str, content: str | None = None) -> str:
+        file_path = os.path.join(self.node_paths[node], "downloads", file_name)
+        with open(file_path, "w") as f:
+            f.write(content if content is not None else f"content of {file_name}")
+        return file_path
+
+    def _copy_file(self, file_name: str):
+        shutil.copy(
+            os.path.join(self.node_paths["a"], "downloads", file_name),
+            os.path.join(self.node_paths["b"], "downloads", file_name),
+        )
+
+    def _export_node_a(self) -> int:
+        self._use_node("a")
+        return export_history(self.export_path)
+
+    def test_round_trip(self):
+        history = self._use_node("a")
+        history.add_many_to_history(
+            [
+                (build_metadata("Dom Casmurro"), self._write_file("a", "dom-casmurro.epub")),
+                (build_metadata("Helena"), self._write_file("a", "helena.epub")),
+                (build_metadata("Iaiá Garcia"), self._write_file("a", "iaia-garcia.pdf")),
+            ]
+        )
+        history.mark_as_uploaded(3)
+        self.assertEqual(self._export_node_a(), 3)
+
+        # Only the file of Helena was copied to node b.
+        self._copy_file("helena.epub")
+        history = self._use_node("b")
+        report = import_history(self.export_path)
+        self.assertEqual((report.read, report.inserted, report.duplicates, report.invalid), (3, 3, 0, 0))
+
+        stats = history.stats()
+        self.assertEqual((stats.pending, stats.uploaded, stats.remote), (1, 1, 1))
+        self.assertEqual(history.get_num_uploadable_entries(), 1)
+        self.assertEqual(
+            [entry.metadata.title for entry in history.get_uploadable_history()], ["Helena"]
+        )
+        # Books whose files are on node a aren't downloaded again.
+        self.assertTrue(history.check_duplicate(build_metadata("Dom Casmurro")))
+
+        report = import_history(self.export_path)
+        self.assertEqual((report.inserted, report.duplicates, report.updated, report.queued), (0, 3, 0, 0))
+
+        # Dom Casmurro was uploaded by node a, and its file copied here meanwhile.
+        history = self._use_node("a")
+        history.mark_as_uploaded(1)
+        self._export_node_a()
+        self._copy_file("dom-casmurro.epub")
+        history = self._use_node("b")
+        report = import_history(self.export_path)
+        self.assertEqual((report.inserted, report.updated, report.queued), (0, 1, 0))
+
+        stats = history.stats()
+        self.assertEqual((stats.pending, stats.uploaded, stats.remote), (1, 2, 0))
+
+    def test_queues_copied_files(self):
+        history = self._use_node("a")
+        history.add_many_to_history(
+            [(build_metadata("Helena"), self._write_file("a", "helena.epub"))]
+        )
+        self._export_node_a()
+
+        history = self._use_node("b")
+        import_history(self.export_path)
+        self.assertEqual(history.get_num_uploadable_entries(), 0)
+
+        self._copy_file("helena.epub")
+        report = import_history(self.export_path)
+        self.assertEqual(report.queued, 1)
+        self.assertEqual(history.get_num_uploadable_entries(), 1)
+
+    def test_checks_copied_files_content(self):
+        history = self._use_node("a")
+        history.add_many_to_history(
+            [(build_metadata("Helena"), self._write_file("a", "helena.epub"))]
+        )
+        self._export_node_a()
+
+        # Node b has another file with the same name, it isn't the file of node a's entry.
+        self._write_file("b", "helena.epub", "another edition of helena")
+        history = self._use_node("b")
+        report = import_history(self.export_path)
+        self.assertEqual((report.inserted, report.queued), (1, 0))
+        stats = history.stats()
+        self.assertEqual((stats.pending, stats.remote), (0, 1))
+
+        # Same size, different content.
+        self._write_file("b", "helena.epub", "CONTENT OF HELENA.EPUB")
+        report = import_history(self.export_path)
+        self.assertEqual((report.duplicates, report.queued), (1, 0))
+        self.assertEqual(history.get_num_uploadable_entries(), 0)
+
+        self._copy_file("helena.epub")
+        report = import_history(self.export_path)
+        self.assertEqual(report.queued, 1)
+        self.assertEqual(history.get_num_uploadable_entries(), 1)
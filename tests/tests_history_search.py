@@ -0,0 +1,32 @@
+from history_test_case import HistoryTestCase, build_metadata
+from models.history_models import UploadStates
+
+
+class TestHistorySearch(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.history.add_many_to_history(
+            [
+                (build_metadata("Dom Casmurro"), self._write_file("dom-casmurro.epub")),
+                (build_metadata("Memórias Póstumas de Brás Cubas"), self._write_file("bras-cubas.epub")),
+                (build_metadata("O Cortiço", authors="Aluísio Azevedo"), self._write_file("o-cortico.epub")),
+            ]
+        )
+
+    def test_matches_every_word(self):
+        results = self.history.search("machado mem")
+        self.assertEqual([result.metadata.title for result in results], ["Memórias Póstumas de Brás Cubas"])
+        self.assertEqual(self.history.search("azevedo dom"), [])
+        # Quotes in user input don't break the query.
+        self.assertEqual(self.history.search('"'), [])
+
+    def test_keeps_upload_states(self):
+        self.history.mark_as_uploaded(1)
+        with self.history.db_manager.connection() as conn:
+            # Imported from another node, its file isn't here.
+            conn.execute("UPDATE spp SET uploaded=2 WHERE id=2")
+
+        results = {result.entry_id: result.status for result in self.history.search("machado")}
+        self.assertEqual(results, {1: UploadStates.uploaded, 2: UploadStates.remote})
+        self.assertEqual(self.history.search("cortiço")[0].status, UploadStates.pending)
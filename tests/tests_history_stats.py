@@ -0,0 +1,71 @@
+from history_test_case import HistoryTestCase, build_metadata
+from models.uploader_models import AvailableSources, ValidTopics
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-dom-casmurro"
+
+
+class TestHistoryStats(HistoryTestCase):
+
+    def _assert_stats_match_history(self):
+        with self.history.db_manager.connection() as conn:
+
+            def count(where: str) -> int:
+                return conn.execute(f"SELECT COUNT(*) FROM spp WHERE {where}").fetchone()[0]
+
+            expected = {
+                "total": count("1"),
+                "pending": count("uploaded=0 AND source IS NOT NULL"),
+                "uploaded": count("uploaded=1"),
+                "remote": count("uploaded NOT IN (0, 1)"),
+                "invalid": count("uploaded=0 AND source IS NULL"),
+                "bytes": conn.execute("SELECT COALESCE(SUM(file_size), 0) FROM spp").fetchone()[0],
+                "topics": dict(
+                    conn.execute("SELECT topic, COUNT(*) FROM spp WHERE topic IS NOT NULL GROUP BY topic")
+                ),
+            }
+
+        stats = self.history.stats()
+        topics = {topic: value for topic, value in stats.topics.items() if value != 0}
+        self.assertEqual(
+            {name: getattr(stats, name) for name in expected if name != "topics"} | {"topics": topics},
+            expected,
+        )
+        # The unfiltered count comes from the stats, it must agree with the upload queue's filter.
+        self.assertEqual(
+            self.history.get_num_uploadable_entries(),
+            self.history.get_num_uploadable_entries(source=AvailableSources.elivros),
+        )
+
+    def test_stats_follow_history(self):
+        added = self.history.add_many_to_history(
+            [
+                (build_metadata("Dom Casmurro"), self._write_file("dom-casmurro.epub")),
+                (build_metadata("Dom Casmurro"), self._write_file("dom-casmurro.pdf")),
+                (build_metadata("Helena"), self._write_file("helena.epub")),
+            ],
+            source_url=BOOK_URL,
+        )
+        self.assertEqual(added, 3)
+        # An entry whose metadata couldn't be migrated into columns.
+        with self.history.db_manager.connection() as conn:
+            conn.execute(
+                "INSERT INTO spp (metadata, filepath) VALUES (?, ?)",
+                ("{}", self._write_file("invalid.epub")),
+            )
+        self._assert_stats_match_history()
+        self.assertEqual(self.history.stats().pending, 3)
+        # Both formats of Dom Casmurro are one book.
+        self.assertEqual(self.history.get_num_uploadable_books(AvailableSources.elivros), 2)
+
+        self.assertEqual(self.history.mark_many_as_uploaded([3]), 1)
+        self._assert_stats_match_history()
+
+        self.assertEqual(
+            self.history.update_metadata(BOOK_URL, build_metadata("Dom Casmurro", ValidTopics.scitech)), 2
+        )
+        self._assert_stats_match_history()
+        self.assertEqual(self.history.stats().topics[ValidTopics.scitech.value], 2)
+
+        self.history.remove_from_history(1)
+        self._assert_stats_match_history()
+        self.assertEqual(self.history.stats().pending, 1)
@@ -0,0 +1,100 @@
+import os
+
+from exceptions.exceptions import HistoryError
+from history_test_case import HistoryTestCase, build_metadata
+
+
+class TestHistoryWrites(HistoryTestCase):
+
+    def _trace_statements(self) -> list[str]:
+        statements = []
+        self.history.db_manager.get_connection().set_trace_callback(statements.append)
+        return statements
+
+    def _count_entries(self) -> int:
+        with self.history.db_manager.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM spp").fetchone()[0]
+
+    def test_add_many_skips_invalid_and_duplicated_entries(self):
+        entries = [
+            (build_metadata("Dom Casmurro"), self._write_file("dom_casmurro.epub")),
+            (build_metadata("Dom Casmurro"), self._write_file("dom_casmurro.pdf")),
+            (build_metadata("Quincas Borba"), self._write_file("quincas_borba.epub")),
+            # Byte-identical to another file of the batch.
+            (build_metadata("Helena"), self._write_file("helena.epub", "content of quincas_borba.epub")),
+            (build_metadata("Iaiá Garcia"), self._write_file("iaia_garcia.txt")),
+            (build_metadata("Ressurreição"), "ressurreicao.epub"),
+        ]
+
+        self.assertEqual(self.history.add_many_to_history(entries), 3)
+        self.assertEqual(self._count_entries(), 3)
+        # Everything is in history already.
+        self.assertEqual(self.history.add_many_to_history(entries), 0)
+        self.assertEqual(self._count_entries(), 3)
+
+    def test_add_many_uses_one_transaction(self):
+        entries = [
+            (build_metadata(f"Livro {number}"), self._write_file(f"livro_{number}.epub"))
+            for number in range(5)
+        ]
+        statements = self._trace_statements()
+
+        self.assertEqual(self.history.add_many_to_history(entries), 5)
+        self.assertEqual(statements.count("BEGIN "), 1)
+        self.assertEqual(statements.count("COMMIT"), 1)
+
+    def test_add_many_without_valid_entries(self):
+        statements = self._trace_statements()
+
+        self.assertEqual(self.history.add_many_to_history([(build_metadata("Helena"), "helena.epub")]), 0)
+        self.assertEqual(self.history.add_many_to_history([]), 0)
+        self.assertEqual(statements, [])
+
+    def test_add_to_history_rejects_duplicates(self):
+        file_path = self._write_file("dom_casmurro.epub")
+        self.history.add_to_history(build_metadata("Dom Casmurro"), file_path)
+
+        with self.assertRaises(HistoryError):
+            self.history.add_to_history(build_metadata("Dom Casmurro"), file_path)
+        with self.assertRaises(HistoryError):
+            self.history.add_to_history(build_metadata("Helena"), os.path.basename(file_path))
+
+    def test_register_removes_rejected_files(self):
+        kept_path = self._write_file("dom_casmurro.epub")
+        invalid_path = self._write_file("dom_casmurro.txt")
+        self.history.add_to_history(build_metadata("Dom Casmurro"), kept_path)
+        copy_path = self._write_file("dom_casmurro_copy.epub", "content of dom_casmurro.epub")
+
+        added = self.history.register_downloaded_files(
+            build_metadata("Dom Casmurro"), [invalid_path, copy_path]
+        )
+
+        self.assertEqual(added, 0)
+        self.assertTrue(os.path.exists(kept_path))
+        self.assertFalse(os.path.exists(invalid_path))
+        self.assertFalse(os.path.exists(copy_path))
+
+    def test_mark_many_as_uploaded(self):
+        entries = [
+            (build_metadata(f"Livro {number}"), self._write_file(f"livro_{number}.epub"))
+            for number in range(3)
+        ]
+        self.history.add_many_to_history(entries)
+        with self.history.db_manager.connection() as conn:
+            entry_ids = [row[0] for row in conn.execute("SELECT id FROM spp ORDER BY id")]
+        statements = self._trace_statements()
+
+        # Unknown ids aren't counted.
+        self.assertEqual(self.history.mark_many_as_uploaded([*entry_ids[:2], 1000], "2024-01-01"), 2)
+        self.assertEqual((statements.count("BEGIN "), statements.count("COMMIT")), (1, 1))
+        # Marking again keeps the date they were uploaded at.
+        self.assertEqual(self.history.mark_many_as_uploaded(entry_ids), 3)
+
+        with self.history.db_manager.connection() as conn:
+            rows = conn.execute("SELECT uploaded, uploaded_at FROM spp ORDER BY id").fetchall()
+        self.assertEqual(rows, [(1, "2024-01-01"), (1, "2024-01-01"), (1, None)])
+        self.assertEqual(self.history.get_num_uploadable_entries(), 0)
+
+    def test_mark_as_uploaded_unknown_entry(self):
+        with self.assertRaises(HistoryError):
+            self.history.mark_as_uploaded(1000)
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+import time
+
+from history import FrontierHandler, LeaseHandler
+from history.leases import book_lease_key, get_owner_id, is_owner_alive
+from history_test_case import HistoryTestCase, build_metadata
+from models.frontier_models import FrontierKinds
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-helena"
+
+
+def get_dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestLeases(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.worker_a = LeaseHandler(get_owner_id(worker="a"))
+        self.worker_b = LeaseHandler(get_owner_id(worker="b"))
+        self.key = book_lease_key(BOOK_URL)
+
+    def test_lease_is_exclusive_until_released(self):
+        self.assertTrue(self.worker_a.acquire(self.key))
+        self.assertFalse(self.worker_b.acquire(self.key))
+        self.assertTrue(self.worker_b.is_held_by_other(self.key))
+        self.assertFalse(self.worker_a.is_held_by_other(self.key))
+        # The owner renews its own lease.
+        self.assertTrue(self.worker_a.acquire(self.key))
+        self.assertEqual(self.worker_a.count_active(), 1)
+
+        self.worker_a.release(self.key)
+        self.assertTrue(self.worker_b.acquire(self.key))
+
+    def test_expired_lease_is_taken_over(self):
+        self.assertTrue(self.worker_a.acquire(self.key, ttl=0.05))
+        time.sleep(0.1)
+
+        self.assertEqual(self.worker_b.count_active(), 0)
+        self.assertFalse(self.worker_b.is_held_by_other(self.key))
+        self.assertTrue(self.worker_b.acquire(self.key))
+        # The previous owner's release doesn't free the new owner's lease.
+        self.worker_a.release(self.key)
+        self.assertTrue(self.worker_a.is_held_by_other(self.key))
+
+    def test_max_pending_counts_history_and_leases(self):
+        self.history.add_many_to_history([(build_metadata("Dom Casmurro"), self._write_file("dom.epub"))])
+        self.assertTrue(self.worker_a.acquire(book_lease_key(f"{BOOK_URL}-1"), max_pending=3))
+        self.assertTrue(self.worker_b.acquire(book_lease_key(f"{BOOK_URL}-2"), max_pending=3))
+
+        self.assertFalse(self.worker_b.acquire(self.key, max_pending=3))
+        self.assertTrue(self.worker_b.acquire(self.key, max_pending=4))
+
+    def test_releases_dead_owners(self):
+        dead_owner = get_owner_id(get_dead_pid(), worker="a")
+        dead_worker = LeaseHandler(dead_owner)
+        self.assertTrue(dead_worker.acquire(self.key))
+        dead_frontier = FrontierHandler(dead_owner)
+        dead_frontier.add_urls([BOOK_URL], FrontierKinds.book)
+        self.assertIsNotNone(dead_frontier.claim())
+        self.assertTrue(self.worker_b.acquire(book_lease_key(f"{BOOK_URL}-2")))
+
+        self.assertFalse(is_owner_alive(dead_owner))
+        self.assertTrue(is_owner_alive(get_owner_id()))
+        # Processes of other machines can't be checked, their leases expire on their own.
+        self.assertTrue(is_owner_alive("another-host:1#a"))
+
+        self.assertEqual(LeaseHandler().release_dead_owners(), 2)
+        self.assertTrue(self.worker_b.acquire(self.key))
+        self.assertEqual(FrontierHandler().counts()["pending"], 1)
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from config.driver_config import DriverManager
+from history_test_case import HistoryTestCase, build_metadata
+from upload import LibgenUploadHandler
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+class TestLibgenUploader(HistoryTestCase):
+
+    def test_takes_a_driver_for_each_file(self):
+        self.history.add_many_to_history(
+            [
+                (build_metadata(f"Book {index}"), self._write_file(f"book-{index}.epub"))
+                for index in range(3)
+            ]
+        )
+        created = []
+
+        def create_driver() -> FakeDriver:
+            created.append(FakeDriver())
+            return created[-1]
+
+        uploader = LibgenUploadHandler()
+        used = []
+        # The browser is replaced after every 2 pages.
+        drivers = DriverManager(driver_factory=create_driver, max_pages=2, max_age=0, max_rss_mb=0)
+        with mock.patch.object(uploader, "navigate", lambda: used.append(uploader.driver)), mock.patch.object(
+            uploader, "_send_file"
+        ), mock.patch.object(uploader, "_provide_metadata"), mock.patch.object(
+            uploader, "_finish_upload", return_value=None
+        ), mock.patch.object(
+            DriverManager, "is_healthy", return_value=True
+        ):
+            uploader.start_uploading(drivers)
+
+        self.assertEqual(used, [created[0], created[0], created[1]])
+        self.assertEqual(self.history.stats().uploaded, 3)
@@ -0,0 +1,137 @@
+import os
+import time
+
+from history import PageCache
+from history_test_case import HistoryTestCase, build_metadata
+from routines.page_cache_routines import reparse_cached_pages
+from scrapers.elivros_parser import ELivrosParser
+from tests_elivros_parser import load_fixtures
+
+BOOK_URL = "https://elivros.love/livro/baixar-livro-dom-casmurro"
+
+
+def build_page(size: int) -> bytes:
+    # Random bytes don't compress, so each page takes about its size in the cache.
+    return os.urandom(size)
+
+
+class TestPageCache(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.cache = PageCache(os.path.join(self.temp_dir.name, "page_cache"))
+
+    def _put(self, url: str, page: bytes | str):
+        self.cache.put(url, page)
+        # Pages are ordered by their last use, keep uses apart.
+        time.sleep(0.01)
+
+    def _assert_size_matches_blobs(self):
+        with self.history.db_manager.connection() as conn:
+            indexed = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM spp_pages)"
+            ).fetchone()[0]
+        on_disk = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(self.cache.cache_path)
+            for name in names
+        )
+        self.assertEqual(self.cache.size(), indexed)
+        self.assertEqual(self.cache.size(), on_disk)
+
+    def test_get_returns_what_was_put(self):
+        self._put(f"{BOOK_URL}-1", b"<html>bytes</html>")
+        self._put(f"{BOOK_URL}-2", "<html>texto</html>")
+
+        self.assertEqual(self.cache.get(f"{BOOK_URL}-1"), b"<html>bytes</html>")
+        self.assertEqual(self.cache.get(f"{BOOK_URL}-2"), "<html>texto</html>")
+        self.assertIsNone(self.cache.get(f"{BOOK_URL}-3"))
+
+    def test_evicts_least_recently_used_pages(self):
+        for number in range(4):
+            self._put(f"{BOOK_URL}-{number}", build_page(4096))
+        # Reading the oldest page makes it the most recently used.
+        self.cache.get(f"{BOOK_URL}-0")
+        time.sleep(0.01)
+
+        self.cache.max_bytes = self.cache.size()
+        self._put(f"{BOOK_URL}-4", build_page(4096))
+
+        self.assertIsNotNone(self.cache.get(f"{BOOK_URL}-0"))
+        self.assertIsNone(self.cache.get(f"{BOOK_URL}-1"))
+        self.assertIsNotNone(self.cache.get(f"{BOOK_URL}-4"))
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+        self._assert_size_matches_blobs()
+
+    def test_size_follows_pages(self):
+        shared_page = build_page(2048)
+        self._put(f"{BOOK_URL}-1", shared_page)
+        # Identical pages are stored and counted once.
+        self._put(f"{BOOK_URL}-2", shared_page)
+        self._put(f"{BOOK_URL}-3", build_page(2048))
+        self._assert_size_matches_blobs()
+
+        # Replaced pages give their space back, unless another url still uses their copy.
+        self._put(f"{BOOK_URL}-1", build_page(1024))
+        self._put(f"{BOOK_URL}-3", build_page(1024))
+        self._assert_size_matches_blobs()
+
+        # Unreadable copies are dropped when read.
+        with self.history.db_manager.connection() as conn:
+            digest = conn.execute(
+                "SELECT digest FROM spp_pages WHERE url=?", (f"{BOOK_URL}-3",)
+            ).fetchone()[0]
+        with open(self.cache._blob_path(digest), "wb") as f:
+            f.write(b"not gzip")
+        self.assertIsNone(self.cache.get(f"{BOOK_URL}-3"))
+        self._assert_size_matches_blobs()
+
+        self.cache.max_bytes = 1
+        self.cache.evict()
+        self.assertEqual(self.cache.size(), 0)
+        self._assert_size_matches_blobs()
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = PageCache(self.cache.cache_path, max_mb=0)
+        cache.put(BOOK_URL, b"<html></html>")
+
+        self.assertIsNone(cache.get(BOOK_URL))
+        self.assertEqual(cache.size(), 0)
+
+
+class TestReparseCachedPages(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.fixtures = load_fixtures()
+        self.cache = PageCache()
+
+    def test_reparses_pages_offline(self):
+        self.cache.put(BOOK_URL, self.fixtures["romance_with_pages.html"])
+        self.cache.put(f"{BOOK_URL}-invalid", self.fixtures["invalid_pages.html"])
+        self.cache.put("https://example.com/livro", b"<html></html>")
+        file_path = self._write_file("dom_casmurro.epub")
+        self.history.register_downloaded_files(build_metadata("Wrong title"), [file_path], BOOK_URL)
+
+        report = reparse_cached_pages()
+        self.assertEqual(
+            (report.pages, report.parsed, report.failed, report.skipped, report.updated), (3, 1, 1, 1, 0)
+        )
+        self.assertTrue(self.history.check_duplicate(build_metadata("Wrong title")))
+
+        report = reparse_cached_pages(update_history=True)
+        self.assertEqual(report.updated, 1)
+        expected = ELivrosParser().parse_book_page(self.fixtures["romance_with_pages.html"])
+        self.assertTrue(self.history.check_duplicate(expected))
+        self.assertFalse(self.history.check_duplicate(build_metadata("Wrong title")))
+
+    def test_uploaded_entries_keep_their_metadata(self):
+        self.cache.put(BOOK_URL, self.fixtures["romance_with_pages.html"])
+        file_path = self._write_file("dom_casmurro.epub")
+        self.history.register_downloaded_files(build_metadata("Wrong title"), [file_path], BOOK_URL)
+        entries, _, _ = self.history.get_uploadable_page()
+        self.history.mark_as_uploaded(entries[0].entry_id)
+
+        report = reparse_cached_pages(update_history=True)
+        self.assertEqual((report.parsed, report.updated), (1, 0))
+        self.assertEqual([metadata.title for metadata in self.history.get_all_history()], ["Wrong title"])
@@ -0,0 +1,97 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from models.settings_models import SPPSettingsModel
+from ratelimit import rate_limiter
+from ratelimit.rate_limiter import HostLimiter, RateLimiter, classify_error
+
+
+def http_error(status: int, headers: dict | None = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+class MemoryHostStates:
+    # Stands in for history.host_states.HostStateHandler, shared by limiters of different "processes".
+
+    def __init__(self):
+        self.wait_times: dict[str, float] = {}
+
+    def get_wait_time(self, host: str) -> float:
+        return self.wait_times.get(host, 0)
+
+    def delay(self, host: str, wait_time: float):
+        self.wait_times[host] = max(self.wait_times.get(host, 0), wait_time)
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self) -> None:
+        self.limiter = HostLimiter("elivros.love", max_rate=2.0)
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(http_error(429)), "throttled")
+        self.assertEqual(classify_error(http_error(500)), "server")
+        self.assertEqual(classify_error(requests.ConnectTimeout()), "timeout")
+        self.assertEqual(classify_error(requests.ConnectionError()), "connection")
+        # Not the host's fault.
+        self.assertIsNone(classify_error(http_error(404)))
+        self.assertIsNone(classify_error(OSError("disk full")))
+
+    def test_backoff_grows_and_resets(self):
+        with patch.object(rate_limiter.random, "uniform", return_value=0):
+            delays = [self.limiter.record_failure(requests.ConnectionError()) for _ in range(3)]
+        self.assertEqual(delays, [2.5, 5.0, 10.0])
+
+        self.limiter.record_success()
+        self.assertEqual(self.limiter._wait_time(take_token=False), 0)
+
+    def test_retry_after_and_throttling(self):
+        delay = self.limiter.record_failure(http_error(429, {"Retry-After": "120"}))
+        self.assertEqual(delay, 120)
+        self.assertEqual(self.limiter.rate, 1.0)
+
+    def test_circuit_breaker(self):
+        for _ in range(rate_limiter.CIRCUIT_FAILURE_THRESHOLD):
+            self.limiter.record_failure(http_error(500))
+        self.assertEqual(self.limiter.breaker.state, "open")
+
+        # Once the cooldown is over, a single request probes the host.
+        self.limiter.breaker.opened_at -= rate_limiter.CIRCUIT_BASE_COOLDOWN
+        self.limiter._not_before = 0
+        self.assertEqual(self.limiter._wait_time(take_token=True), 0)
+        self.assertEqual(self.limiter.breaker.state, "half_open")
+        self.assertGreater(self.limiter._wait_time(take_token=True), 0)
+
+        # Still down, the next cooldown is twice as long.
+        self.limiter.record_failure(http_error(500))
+        self.assertEqual(self.limiter.breaker.state, "open")
+        self.assertEqual(self.limiter.breaker.cooldown, 2 * rate_limiter.CIRCUIT_BASE_COOLDOWN)
+
+        self.limiter.breaker.opened_at -= self.limiter.breaker.cooldown
+        self.limiter._not_before = 0
+        self.limiter._wait_time(take_token=True)
+        self.limiter.record_success()
+        self.assertEqual(self.limiter.breaker.state, "closed")
+
+    def test_shared_backoff(self):
+        shared = MemoryHostStates()
+        limiter = HostLimiter("elivros.love", max_rate=2.0, shared=shared)
+        other_limiter = HostLimiter("elivros.love", max_rate=2.0, shared=shared)
+
+        limiter.trip()
+        self.assertEqual(shared.get_wait_time("elivros.love"), rate_limiter.CIRCUIT_BASE_COOLDOWN)
+        other_limiter._refresh_shared_state()
+        self.assertGreater(other_limiter._wait_time(take_token=True), 0)
+
+    def test_rate_share(self):
+        limiter = RateLimiter()
+        with patch.object(rate_limiter, "load_user_settings", return_value=SPPSettingsModel()):
+            self.assertEqual(limiter.get_host_limiter("elivros.love").max_rate, 2.0)
+            limiter.set_rate_share(0.25)
+            self.assertEqual(limiter.get_host_limiter("https://elivros.love/livro/").max_rate, 0.5)
+            self.assertEqual(limiter.get_host_limiter("library.bz").max_rate, 0.125)
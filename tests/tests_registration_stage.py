@@ -0,0 +1,61 @@
+import os
+import threading
+from unittest import mock
+
+from history import RegistrationStage
+from history.file_hashing import hash_file
+from history_test_case import HistoryTestCase, build_metadata
+
+
+class TestRegistrationStage(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.stage = RegistrationStage(self.history)
+
+    def tearDown(self) -> None:
+        self.stage.shutdown()
+        super().tearDown()
+
+    def test_hashes_in_background(self):
+        hashing = threading.Event()
+        can_finish = threading.Event()
+
+        def slow_hash_files(file_paths: list[str]):
+            hashing.set()
+            can_finish.wait(5)
+            return {file_path: hash_file(file_path) for file_path in file_paths}
+
+        done = threading.Event()
+        with mock.patch.object(self.history.file_hasher, "hash_files", slow_hash_files):
+            registration = self.stage.submit(
+                build_metadata("Helena"),
+                [self._write_file("helena.epub"), self._write_file("helena.pdf")],
+                on_done=done.set,
+            )
+            # The caller is free while the files are hashed.
+            self.assertTrue(hashing.wait(5))
+            self.assertFalse(registration.done())
+            self.assertEqual(self.history.stats().total, 0)
+
+            can_finish.set()
+            self.assertEqual(registration.result(5), 2)
+
+        self.assertTrue(done.is_set())
+        self.assertEqual(self.history.stats().pending, 2)
+
+    def test_registers_in_order(self):
+        first = self.stage.submit(build_metadata("Helena"), [self._write_file("helena.epub")])
+        # Byte-identical to the first file, removed once the first one is in history.
+        duplicate_path = self._write_file("helena (1).epub", "content of helena.epub")
+        second = self.stage.submit(build_metadata("Helena"), [duplicate_path])
+
+        self.assertEqual((first.result(5), second.result(5)), (1, 0))
+        self.assertFalse(os.path.exists(duplicate_path))
+
+    def test_calls_on_done_after_failures(self):
+        done = threading.Event()
+        registration = self.stage.submit(build_metadata("Helena"), [None], on_done=done.set)
+
+        self.assertIsNotNone(registration.exception(5))
+        self.assertTrue(done.is_set())
@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import Future
+from enum import Enum
+from unittest import mock
+
+from exceptions.exceptions import ScraperEngineError
+from history_test_case import HistoryTestCase
+from models.settings_models import ScraperEngines
+from routines import scraper_scheduler
+from routines.scraper_scheduler import ScraperScheduler
+from scrapers import BaseScraper
+
+
+class FakeSources(str, Enum):
+    first = "first.test"
+    second = "second.test"
+
+
+class FakeScraper(BaseScraper):
+    """
+    Adds every book straight to history, in two formats.
+    """
+
+    books = 0
+    lock = threading.Lock()
+
+    def discover(self):
+        pass
+
+    def fetch_metadata(self, book):
+        pass
+
+    def fetch_files(self, book):
+        pass
+
+    def _add_book(self) -> int:
+        with FakeScraper.lock:
+            FakeScraper.books += 1
+            title = f"Book {FakeScraper.books}"
+        self.metadata = mock.Mock(title=title)
+        with self.history_service.db_manager.connection() as conn:
+            conn.executemany(
+                "INSERT INTO spp (metadata, filepath, dedup_key, source, topic, title, authors) "
+                "VALUES ('{}', ?, ?, ?, 'fiction', ?, 'Machado de Assis')",
+                [(f"/downloads/{title}.{extension}", title, self.source.value, title) for extension in ("epub", "pdf")],
+            )
+        return 2
+
+    def scrape_book(self, book=None, report=None) -> int:
+        # Long enough for the other scrapers of the source to be in flight too.
+        time.sleep(0.05)
+        return self._add_book()
+
+
+class FirstSourceScraper(FakeScraper):
+    source = FakeSources.first
+
+
+class SecondSourceScraper(FakeScraper):
+    source = FakeSources.second
+
+
+class RejectedScraper(FirstSourceScraper):
+    closed = 0
+
+    def scrape_book(self, book=None, report=None) -> int:
+        raise ScraperEngineError("RandomBook keeps refusing requests.")
+
+    def close(self):
+        RejectedScraper.closed += 1
+
+
+class BrowserScraper(FirstSourceScraper):
+    """
+    Adds files in background, like the Selenium scraper.
+    """
+
+    needs_browser = True
+
+    def use_driver(self, driver):
+        self.driver = driver
+
+    def __init__(self):
+        super().__init__()
+        self.registrations: list[threading.Timer] = []
+
+    def scrape_book(self, book=None, report=None) -> int:
+        registration = Future()
+        self.last_registration = registration
+        timer = threading.Timer(0.1, lambda: registration.set_result(self._add_book()))
+        timer.start()
+        self.registrations.append(timer)
+        return 2
+
+    def close(self):
+        for timer in self.registrations:
+            timer.join()
+
+
+class TestScraperScheduler(HistoryTestCase):
+    extra_settings = {
+        "scraper_engine": "http",
+        "source_concurrency": {"first.test": 2, "second.test": 3},
+        "source_quotas": {"first.test": 3, "second.test": 5},
+    }
+
+    def _run(self, source_scrapers: dict) -> ScraperScheduler:
+        scheduler = ScraperScheduler(sources=list(source_scrapers))
+        with mock.patch.object(scraper_scheduler, "SOURCE_SCRAPERS", source_scrapers), mock.patch.object(
+            scraper_scheduler, "DriverManager"
+        ) as self.drivers:
+            scheduler.run()
+        return scheduler
+
+    def _books_in_history(self, source: FakeSources) -> int:
+        return self.history.get_num_uploadable_books(source)
+
+    def test_quotas_are_kept_per_source(self):
+        scheduler = self._run(
+            {
+                FakeSources.first: {ScraperEngines.http: FirstSourceScraper},
+                FakeSources.second: {ScraperEngines.http: SecondSourceScraper},
+            }
+        )
+
+        # Several scrapers of each source ran at once, none of them went over its quota.
+        self.assertEqual(scheduler.books, {FakeSources.first: 3, FakeSources.second: 5})
+        self.assertEqual(scheduler.files, {FakeSources.first: 6, FakeSources.second: 10})
+        self.assertEqual(self._books_in_history(FakeSources.first), 3)
+        self.assertEqual(self._books_in_history(FakeSources.second), 5)
+
+    def test_falls_back_to_selenium(self):
+        RejectedScraper.closed = 0
+        scheduler = self._run(
+            {
+                FakeSources.first: {
+                    ScraperEngines.http: RejectedScraper,
+                    ScraperEngines.selenium: BrowserScraper,
+                },
+            }
+        )
+
+        self.assertEqual(RejectedScraper.closed, 2)
+        # Books registered in background counted towards the quota until they were in history.
+        self.assertEqual(scheduler.books, {FakeSources.first: 3})
+        self.assertEqual(self._books_in_history(FakeSources.first), 3)
+        self.drivers.assert_called_with(download_events=True)
+
+    def test_stops_without_another_engine(self):
+        scheduler = self._run({FakeSources.first: {ScraperEngines.http: RejectedScraper}})
+
+        self.assertEqual(scheduler.books, {})
+        self.assertEqual(self._books_in_history(FakeSources.first), 0)
@@ -0,0 +1,77 @@
+import queue
+import time
+from unittest import mock
+
+from history_test_case import HistoryTestCase
+from routines import scraper_workers
+from routines.scraper_workers import MAX_WORKER_RESTARTS, ScraperWorkerPool
+
+
+class FakeProcess:
+    def __init__(self, name: str, pid: int):
+        self.name = name
+        self.pid = pid
+        self.exitcode: int | None = None
+        self.terminated = False
+
+    def is_alive(self) -> bool:
+        return self.exitcode is None
+
+    def join(self, timeout: float | None = None):
+        if self.is_alive() and timeout is not None:
+            time.sleep(timeout)
+
+    def terminate(self):
+        self.terminated = True
+        self.exitcode = -15
+
+
+class FakeWorkerPool(ScraperWorkerPool):
+    def __init__(self, workers_num: int):
+        super().__init__(workers_num)
+        self._progress = queue.Queue()
+        self.started = 0
+
+    def _start_worker(self, slot: int):
+        self.started += 1
+        self._workers[slot] = FakeProcess(f"spp-scraper-{slot}", 100000 + self.started)
+
+
+class TestScraperWorkerPool(HistoryTestCase):
+
+    def test_workers_share_the_stop_deadline(self):
+        pool = FakeWorkerPool(3)
+        for slot in range(3):
+            pool._start_worker(slot)
+        workers = list(pool._workers.values())
+
+        start_time = time.monotonic()
+        with mock.patch.object(scraper_workers, "WORKER_STOP_TIMEOUT", 0.3):
+            pool._stop()
+
+        self.assertLess(time.monotonic() - start_time, 0.6)
+        self.assertTrue(all(worker.terminated for worker in workers))
+        self.assertEqual(pool._workers, {})
+
+    def test_restarts_are_counted_in_a_row(self):
+        pool = FakeWorkerPool(1)
+        pool._start_worker(0)
+
+        def crash():
+            pool._workers[0].exitcode = 1
+            pool._check_workers()
+
+        for _ in range(MAX_WORKER_RESTARTS):
+            crash()
+        # A finished book ends the streak.
+        pool._progress.put((0, 2))
+        pool._read_progress(timeout=0)
+        self.assertEqual((pool.books, pool.files), (1, 2))
+
+        for _ in range(MAX_WORKER_RESTARTS):
+            crash()
+        self.assertIn(0, pool._workers)
+
+        crash()
+        self.assertNotIn(0, pool._workers)
+        self.assertEqual(pool.started, 2 * MAX_WORKER_RESTARTS + 1)
@@ -0,0 +1,82 @@
+from unittest import TestCase
+import os
+import tempfile
+import threading
+
+from history.seen_urls import SeenURLFilter
+
+
+class TestSeenURLFilter(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, "seen_urls.bloom")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_persists_urls(self):
+        seen_urls = SeenURLFilter(self.file_path, capacity=1000)
+        self.assertTrue(seen_urls.open())
+        seen_urls.add("https://elivros.love/livro/baixar-livro-o-cortico/")
+        seen_urls.close()
+
+        seen_urls = SeenURLFilter(self.file_path)
+        self.assertFalse(seen_urls.open())
+        self.assertEqual(seen_urls.capacity, 1000)
+        self.assertIn("http://www.elivros.love/livro/baixar-livro-o-cortico", seen_urls)
+        self.assertNotIn("https://elivros.love/livro/baixar-livro-dom-casmurro", seen_urls)
+        seen_urls.close()
+
+    def test_false_positive_rate(self):
+        seen_urls = SeenURLFilter(self.file_path, capacity=10_000)
+        seen_urls.open()
+        seen_urls.add_many(f"https://elivros.love/livro/{i}" for i in range(10_000))
+        false_positives = sum(
+            f"https://elivros.love/outro/{i}" in seen_urls for i in range(10_000)
+        )
+        self.assertLess(false_positives, 50)
+        seen_urls.close()
+
+    def test_rebuilds_invalid_file(self):
+        with open(self.file_path, "wb") as f:
+            f.write(b"not a filter")
+
+        seen_urls = SeenURLFilter(self.file_path, capacity=1000)
+        self.assertTrue(seen_urls.open())
+        self.assertEqual(seen_urls.count, 0)
+        seen_urls.close()
+
+    def test_concurrent_open_and_reset(self):
+        seen_urls = SeenURLFilter(self.file_path, capacity=1000)
+        barrier = threading.Barrier(8)
+        created = []
+        errors = []
+
+        def open_filter():
+            barrier.wait()
+            created.append(seen_urls.open())
+
+        threads = [threading.Thread(target=open_filter) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Only one thread builds the filter, the others find it open.
+        self.assertEqual(created.count(True), 1)
+
+        def look_up():
+            try:
+                for i in range(2000):
+                    _ = f"https://elivros.love/livro/{i}" in seen_urls
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=look_up)
+        reader.start()
+        while reader.is_alive():
+            seen_urls.reset()
+            seen_urls.open()
+        reader.join()
+        self.assertEqual(errors, [])
+        seen_urls.close()
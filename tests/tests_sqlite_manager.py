@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+import os
+import sqlite3
+import tempfile
+
+from config.data_config import SQLiteConnectionManager
+
+
+class TestSQLiteConnectionManager(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manager = SQLiteConnectionManager(os.path.join(self.temp_dir.name, "history.db"))
+        with self.manager.connection() as conn:
+            conn.execute("CREATE TABLE books(title TEXT)")
+            conn.execute("INSERT INTO books VALUES ('Dom Casmurro')")
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+        self.manager.close_all()
+        self.temp_dir.cleanup()
+
+    def _in_other_thread(self, function):
+        return self.executor.submit(function).result(timeout=10)
+
+    def _count_books(self) -> int:
+        with self.manager.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def test_uses_wal(self):
+        conn = self.manager.get_connection()
+
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_one_connection_per_thread(self):
+        conn = self.manager.get_connection()
+
+        self.assertIs(self.manager.get_connection(), conn)
+        other_conn = self._in_other_thread(self.manager.get_connection)
+        self.assertIsNot(other_conn, conn)
+        # The pool keeps the same connection for the other thread too.
+        self.assertIs(self._in_other_thread(self.manager.get_connection), other_conn)
+
+    def test_connection_commits_or_rolls_back(self):
+        with self.assertRaises(ValueError):
+            with self.manager.connection() as conn:
+                conn.execute("INSERT INTO books VALUES ('Lost')")
+                raise ValueError()
+
+        self.assertEqual(self._count_books(), 1)
+        self.assertEqual(self._in_other_thread(self._count_books), 1)
+
+    def test_release_current(self):
+        conn = self.manager.get_connection()
+        other_conn = self._in_other_thread(self.manager.get_connection)
+
+        self.manager.release_current()
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        # Only the calling thread's connection is closed.
+        self.assertEqual(other_conn.execute("SELECT COUNT(*) FROM books").fetchone()[0], 1)
+        self.assertIsNot(self.manager.get_connection(), conn)
+        self.assertEqual(self._count_books(), 1)
+
+    def test_close_all(self):
+        conn = self.manager.get_connection()
+        other_conn = self._in_other_thread(self.manager.get_connection)
+
+        self.manager.close_all()
+
+        for closed_conn in (conn, other_conn):
+            with self.assertRaises(sqlite3.ProgrammingError):
+                closed_conn.execute("SELECT 1")
+        # Connections are opened again on next use.
+        self.assertEqual(self._count_books(), 1)
+        self.assertEqual(self._in_other_thread(self._count_books), 1)
+
+    def test_readers_and_writer_dont_wait_for_each_other(self):
+        def start_reading() -> int:
+            reader = self.manager.get_connection()
+            reader.execute("BEGIN")
+            return reader.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+        def keep_reading() -> int:
+            return self.manager.get_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+        def stop_reading():
+            self.manager.get_connection().commit()
+
+        def write():
+            with self.manager.connection() as conn:
+                conn.execute("INSERT INTO books VALUES ('Memórias Póstumas')")
+
+        self.assertEqual(self._in_other_thread(start_reading), 1)
+        # The write commits while the read transaction is still open.
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            writer.submit(write).result(timeout=10)
+
+        # The reader keeps the state it started with until its transaction ends.
+        self.assertEqual(self._in_other_thread(keep_reading), 1)
+        self._in_other_thread(stop_reading)
+        self.assertEqual(self._in_other_thread(keep_reading), 2)
@@ -0,0 +1,50 @@
+from unittest import TestCase
+import os
+import subprocess
+import sys
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for main.py, in microseconds.
+MAIN_IMPORT_BUDGET_US = 500_000
+
+# Only needed once scraping or uploading starts.
+HEAVY_MODULES = ("selenium", "bs4", "lxml", "pyfiglet", "fake_useragent", "yaspin")
+
+
+class TestStartup(TestCase):
+
+    def _import_times(self, module: str) -> dict[str, int]:
+        """
+        Imports module in a fresh interpreter and returns the cumulative import time of every module loaded.
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        import_times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or line.endswith("imported package"):
+                continue
+            _, cumulative, name = line.split("|")
+            import_times[name.strip()] = int(cumulative)
+
+        return import_times
+
+    def _assert_no_heavy_modules(self, import_times: dict[str, int]):
+        for name in import_times:
+            self.assertNotIn(name.split(".")[0], HEAVY_MODULES, f"{name} imported at startup")
+
+    def test_main_import_budget(self):
+        import_times = self._import_times("main")
+        self._assert_no_heavy_modules(import_times)
+        self.assertLess(import_times["main"], MAIN_IMPORT_BUDGET_US)
+
+    def test_menu_import_is_lazy(self):
+        self._assert_no_heavy_modules(self._import_times("menu"))
+
+    def test_history_import_is_lazy(self):
+        self._assert_no_heavy_modules(self._import_times("history"))
@@ -0,0 +1,42 @@
+import os
+
+from history.upload_queue import UploadQueueReader
+from history_test_case import HistoryTestCase, build_metadata
+
+
+class TestUploadQueueReader(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.history.add_many_to_history(
+            [
+                (build_metadata(f"Book {index}"), self._write_file(f"book-{index}.epub"))
+                for index in range(7)
+            ]
+        )
+
+    def test_reads_every_page_while_uploading(self):
+        # Entries are marked as uploaded on the main connection while the next page is prefetched.
+        read_ids = []
+        for entry in UploadQueueReader(self.history, page_size=2):
+            read_ids.append(entry.entry_id)
+            self.history.mark_as_uploaded(entry.entry_id)
+
+        self.assertEqual(read_ids, list(range(1, 8)))
+        self.assertEqual(self.history.stats().pending, 0)
+        self.assertEqual(self.history.get_num_uploadable_entries(), 0)
+
+    def test_reports_missing_files(self):
+        os.remove(os.path.join(self.downloads_path, "book-3.epub"))
+        reader = UploadQueueReader(self.history, page_size=3)
+
+        self.assertEqual(len(list(reader)), 6)
+        self.assertEqual(reader.missing_paths, [os.path.join(self.downloads_path, "book-3.epub")])
+
+    def test_stops_early(self):
+        reader = iter(UploadQueueReader(self.history, page_size=2))
+        self.assertEqual(next(reader).entry_id, 1)
+        reader.close()
+
+        # The prefetching thread released its connection, only the main thread's is left.
+        self.assertEqual(len(self.history.db_manager._connections), 1)
@@ -0,0 +1,45 @@
+import json
+import os
+
+from config.data_config import SETTINGS_FILE_NAME, load_user_settings, reload_user_settings
+from history_test_case import HistoryTestCase
+
+
+class TestUserSettings(HistoryTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.settings_path = os.path.join(self.temp_dir.name, SETTINGS_FILE_NAME)
+
+    def _update_settings(self, **values):
+        with open(self.settings_path) as f:
+            settings = json.load(f)
+        mtime = os.stat(self.settings_path).st_mtime_ns
+        with open(self.settings_path, "w") as f:
+            json.dump(settings | values, f)
+        # Coarse file system clocks could give the new file the same mtime.
+        os.utime(self.settings_path, ns=(mtime + 1_000_000, mtime + 1_000_000))
+
+    def test_cached_while_file_is_unchanged(self):
+        settings = load_user_settings()
+
+        self.assertIs(load_user_settings(), settings)
+        self.assertEqual(settings.downloads_path, self.downloads_path)
+
+    def test_reloaded_when_file_changes(self):
+        settings = load_user_settings()
+        self._update_settings(max_downloads=settings.max_downloads + 1)
+
+        updated_settings = load_user_settings()
+        self.assertIsNot(updated_settings, settings)
+        self.assertEqual(updated_settings.max_downloads, settings.max_downloads + 1)
+        self.assertIs(load_user_settings(), updated_settings)
+
+    def test_reload_reads_file_again(self):
+        settings = load_user_settings()
+
+        reloaded_settings = reload_user_settings()
+        self.assertIsNot(reloaded_settings, settings)
+        self.assertEqual(reloaded_settings, settings)
+        self.assertIs(load_user_settings(), reloaded_settings)
+
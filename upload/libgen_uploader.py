@@ -15,6 +15,7 @@ from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.wait import WebDriverWait
 from yaspin import yaspin
 
+from config.driver_config import DriverManager
 from exceptions import (
     HistoryError,
     HistoryFileError,
@@ -24,12 +25,13 @@ from exceptions import (
     UploaderFileError,
 )
 from history import HistoryHandler
+from models.upload_form_models import UploadMetadataElements
 from models.uploader_models import (
     LibgenMetadata,
     ValidTopics,
-    UploadMetadataElements,
     AvailableSources,
 )
+from ratelimit import get_rate_limiter
 
 
 class LibgenUploadHandler:
@@ -52,6 +54,7 @@ class LibgenUploadHandler:
         )
         self.valid_extensions = ("epub", "pdf", "mobi")
         self.history_handler = HistoryHandler()
+        self.rate_limiter = get_rate_limiter()
 
     def _handle_sending_errors(self, entry_id: int):
         """
@@ -86,12 +89,13 @@ class LibgenUploadHandler:
         driver = self.driver
 
         if self.current_metadata.topic == "fiction":
-            if self.driver.current_url != self.fiction_upload:
-                driver.get(self.fiction_upload)
-
+            upload_url = self.fiction_upload
         else:
-            if self.driver.current_url != self.scitech_upload:
-                driver.get(self.scitech_upload)
+            upload_url = self.scitech_upload
+
+        if self.driver.current_url != upload_url:
+            with self.rate_limiter.request(upload_url):
+                driver.get(upload_url)
 
     def _send_file(self):
 
@@ -113,7 +117,8 @@ class LibgenUploadHandler:
             By.CSS_SELECTOR,
             "body > div:nth-child(3) > form > input[" "type=submit]:nth-child(2)",
         )
-        upload_btn.click()
+        with self.rate_limiter.request(self.scitech_upload):
+            upload_btn.click()
 
     def _get_metadata_elements(self):
         form_element_locator = (By.CSS_SELECTOR, "#record_form")
@@ -266,14 +271,14 @@ class LibgenUploadHandler:
 
         return uploaded_url
 
-    def start_uploading(self, driver: WebDriver):
+    def start_uploading(self, drivers: DriverManager):
         """
         Main method.
         Upload to libgen the files available in the upload history.
+        A driver is taken from drivers for every file, so the browser is replaced once it's too old or
+        stops responding, in the middle of the queue too.
         """
 
-        self.driver = driver
-
         count_uploadable_entries = self.history_handler.get_num_uploadable_entries()
         if count_uploadable_entries == 0:
             logging.info("No uploadable entries in history.")
@@ -285,6 +290,15 @@ class LibgenUploadHandler:
             if entry is None:
                 continue
 
+            if self.history_handler.is_content_uploaded(entry):
+                # Libgen identifies files by md5, it would reject this one as a duplicate anyway.
+                logging.info(
+                    f"File {entry.file_path} is byte-identical to an uploaded file. Skipping."
+                )
+                self.history_handler.mark_as_uploaded(entry.entry_id)
+                continue
+
+            self.driver = drivers.get()
             with yaspin(text="Uploading file", color="yellow") as spinner:
                 spinner.write(f"Uploading file: {entry.file_path}")
                 self.current_metadata = entry.metadata